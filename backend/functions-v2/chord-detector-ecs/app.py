@@ -5,22 +5,144 @@ Uses Librosa's chromagram-based chord detection
 """
 
 import json
-import boto3
 import os
 import logging
+import signal
 import sys
+import threading
+import time
+import uuid
 import numpy as np
+from collections import namedtuple
 from decimal import Decimal
 
+from audio_decoder import load_audio
+from checkpoint import INTERRUPTED, Interrupted, JobCheckpoint
+from job_guard import BUSY, LeaseKeeper, claim_job, find_existing_result, is_condition_failure, release_job, result_guard
+from progress import ProgressReporter
+from timing import NullTimer, StageTimer
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger()
 
-s3_client = boto3.client('s3')
-dynamodb = boto3.resource('dynamodb')
-lambda_client = boto3.client('lambda')
+# boto3 clients, created on first use (importing boto3 and building a client
+# costs ~0.1 s each; see get_s3_client and friends)
+s3_client = None
+dynamodb = None
+lambda_client = None
 
 JOBS_TABLE = os.environ['DYNAMODB_JOBS_TABLE']
 PDF_GENERATOR_FUNCTION = os.environ.get('PDF_GENERATOR_FUNCTION', '')
+# The chord-detector trigger Lambda: an interrupted single-shot or batch job is
+# handed back to it, which starts a task (or queues the job) that resumes the checkpoint
+CHORD_TRIGGER_FUNCTION = os.environ.get('CHORD_TRIGGER_FUNCTION', '')
+
+# Bump when detection changes enough that stored results should be recomputed
+ENGINE_VERSION = os.environ.get('ENGINE_VERSION', '2')
+# A run's lease on a job; a duplicate run waits this long before taking over a silent one
+# (a live run renews it, see job_guard.LeaseKeeper)
+CLAIM_LEASE_SECONDS = int(os.environ.get('CLAIM_LEASE_SECONDS', '1800'))
+leases = LeaseKeeper(CLAIM_LEASE_SECONDS)
+
+# How chordsData is stored: 'binary' (compressed chordsBin attribute) or 'map' (nested maps)
+CHORDS_ENCODING = os.environ.get('CHORDS_ENCODING', 'binary')
+# Results larger than this (bytes, as encoded) are stored in S3 behind a chordsRef pointer (0 = never)
+RESULT_OFFLOAD_BYTES = int(os.environ.get('RESULT_OFFLOAD_BYTES', '16384'))
+# Bucket for offloaded results, under results/ (must not expire them; the job's audio bucket,
+# the fallback, deletes objects after a day and would leave chordsRef dangling)
+RESULTS_BUCKET = os.environ.get('RESULTS_BUCKET', '')
+
+# Tracks longer than this (seconds) are analyzed in streaming blocks
+STREAM_THRESHOLD_SECONDS = float(os.environ.get('STREAM_THRESHOLD_SECONDS', '900'))
+STREAM_BLOCK_SECONDS = float(os.environ.get('STREAM_BLOCK_SECONDS', '60'))
+# On SIGTERM (Fargate Spot), save a streamed analysis to S3 and resume it on relaunch (see checkpoint.py)
+CHECKPOINTS = os.environ.get('CHECKPOINTS', 'true').lower() == 'true'
+# Set by SIGTERM: a streamed analysis checkpoints and stops at its next block
+interrupt = threading.Event()
+# Decode the S3 body as it downloads instead of copying it to /tmp first
+S3_STREAMING = os.environ.get('S3_STREAMING', 'true').lower() == 'true'
+# Objects at least this large are fetched with parallel ranged GETs (see s3_fetch.py)
+S3_PARALLEL_FETCH_MB = float(os.environ.get('S3_PARALLEL_FETCH_MB', '64'))
+# Keep fetched audio in memory (per ETag) for reuse without another fetch (0 = off)
+HOT_AUDIO_CACHE_MB = int(os.environ.get('HOT_AUDIO_CACHE_MB', '128'))
+hot_audio = None
+
+# Worker mode: SQS queue URL (or file:///dir for local runs)
+JOB_QUEUE_URL = os.environ.get('JOB_QUEUE_URL', '')
+WORKER_VISIBILITY_TIMEOUT = int(os.environ.get('WORKER_VISIBILITY_TIMEOUT', '300'))
+# Exit after this many idle seconds (0 = run until stopped)
+WORKER_IDLE_SECONDS = float(os.environ.get('WORKER_IDLE_SECONDS', '0'))
+
+# Batch mode: several jobs in one task, as comma-separated JOB_IDS (with
+# matching AUDIO_KEYS) or a JSON manifest in S3 (JOB_MANIFEST, see load_batch_jobs)
+JOB_IDS = os.environ.get('JOB_IDS', '')
+JOB_MANIFEST = os.environ.get('JOB_MANIFEST', '')
+# DSP processes for a batch (0 = one per available core)
+BATCH_DSP_WORKERS = int(os.environ.get('BATCH_DSP_WORKERS', '0'))
+# Threads for a batch's downloads and DynamoDB writes
+BATCH_IO_THREADS = int(os.environ.get('BATCH_IO_THREADS', '4'))
+# Jobs downloaded ahead of a free DSP process
+BATCH_PREFETCH = int(os.environ.get('BATCH_PREFETCH', '2'))
+# Longest a batch waits on its running stages before checking for SIGTERM
+BATCH_POLL_SECONDS = 1.0
+# After SIGTERM, how long running analyses get to finish or checkpoint before
+# they're stopped and handed back (keep under the task's StopTimeout)
+BATCH_STOP_SECONDS = float(os.environ.get('BATCH_STOP_SECONDS', '90'))
+
+# Warm the analysis path at container start, overlapped with the first job's I/O (see warmup.py)
+WARMUP_ON_START = os.environ.get('WARMUP_ON_START', 'true').lower() == 'true'
+warm_up_thread = None
+
+# Chromagram cache: local LRU directory, optionally backed by S3
+FEATURE_CACHE_ENABLED = os.environ.get('FEATURE_CACHE_ENABLED', 'true').lower() == 'true'
+FEATURE_CACHE_DIR = os.environ.get('FEATURE_CACHE_DIR', '/tmp/feature-cache')
+FEATURE_CACHE_MAX_MB = int(os.environ.get('FEATURE_CACHE_MAX_MB', '512'))
+FEATURE_CACHE_BUCKET = os.environ.get('FEATURE_CACHE_BUCKET', '')
+feature_cache = None
+
+# Optional HMM (Viterbi) smoothing between template matching and segmentation
+HMM_SMOOTHING = os.environ.get('HMM_SMOOTHING', 'false').lower() == 'true'
+HMM_SELF_TRANSITION = float(os.environ.get('HMM_SELF_TRANSITION', '0.99'))
+# Log-emission = scale * template score; higher trusts single frames more
+HMM_EMISSION_SCALE = 10.0
+
+# Also store the per-stage timings on the job item as a `timings` map
+STORE_TIMINGS = os.environ.get('STORE_TIMINGS', 'false').lower() == 'true'
+# Add tracemalloc peaks to the timings (slower; for debugging only)
+TIMINGS_TRACEMALLOC = os.environ.get('TIMINGS_TRACEMALLOC', 'false').lower() == 'true'
+
+# Publish interim chords while long tracks are analyzed: the CQT runs in
+# time order over PROGRESS_INTERVAL_SECONDS windows of audio, and at most one
+# interim write is made per PROGRESS_MIN_WRITE_SECONDS of wall time
+PROGRESS_UPDATES = os.environ.get('PROGRESS_UPDATES', 'true').lower() == 'true'
+PROGRESS_INTERVAL_SECONDS = float(os.environ.get('PROGRESS_INTERVAL_SECONDS', '60'))
+PROGRESS_MIN_WRITE_SECONDS = float(os.environ.get('PROGRESS_MIN_WRITE_SECONDS', '5'))
+
+# Skip the CQT over silent edges and long quiet gaps (RMS more than
+# SILENCE_TOP_DB below the loudest frame); gaps shorter than
+# MIN_SILENCE_SECONDS plus the CQT context on both sides are still analyzed
+SILENCE_GATING = os.environ.get('SILENCE_GATING', 'true').lower() == 'true'
+SILENCE_TOP_DB = float(os.environ.get('SILENCE_TOP_DB', '60'))
+MIN_SILENCE_SECONDS = float(os.environ.get('MIN_SILENCE_SECONDS', '1.0'))
+
+# Processes for the chroma CQT (0 = one per available core)
+CQT_WORKERS = int(os.environ.get('CQT_WORKERS', '0'))
+
+# 'frame' scores every hop; 'beat' aggregates chroma per tracked beat first
+ANALYSIS_MODE = os.environ.get('ANALYSIS_MODE', 'frame').lower()
+
+SAMPLE_RATE = 22050
+HOP_LENGTH = 512
+
+# Named analysis profiles, trading accuracy for throughput. `hmm` None
+# follows HMM_SMOOTHING; 'balanced' is the original configuration.
+ANALYSIS_PROFILES = {
+    'fast': {'sampleRate': 11025, 'hopLength': 1024, 'chroma': 'stft', 'nFft': 4096, 'hmm': False},
+    'balanced': {'sampleRate': SAMPLE_RATE, 'hopLength': HOP_LENGTH, 'chroma': 'cqt', 'hmm': None},
+    'accurate': {'sampleRate': 22050, 'hopLength': 256, 'chroma': 'cqt', 'hmm': True},
+}
+# Default profile; a job can override it with a `profile` attribute
+ANALYSIS_PROFILE = os.environ.get('ANALYSIS_PROFILE', 'balanced')
 
 # Import Librosa
 try:
@@ -37,6 +159,66 @@ CHORD_LABELS = [
     'Cm', 'C#m', 'Dm', 'D#m', 'Em', 'Fm', 'F#m', 'Gm', 'G#m', 'Am', 'A#m', 'Bm'  # Minor
 ]
 
+NOTE_NAMES = ['C', 'C#', 'D', 'D#', 'E', 'F', 'F#', 'G', 'G#', 'A', 'A#', 'B']
+
+# Extended vocabulary: the chord types of chord-detector-ml's CHORD_TEMPLATES
+# as (label suffix, semitones above the root), 15 qualities x 12 roots
+CHORD_QUALITIES = [
+    ('', [0, 4, 7]),
+    ('m', [0, 3, 7]),
+    ('dim', [0, 3, 6]),
+    ('aug', [0, 4, 8]),
+    ('sus2', [0, 2, 7]),
+    ('sus4', [0, 5, 7]),
+    ('7', [0, 4, 7, 10]),
+    ('maj7', [0, 4, 7, 11]),
+    ('m7', [0, 3, 7, 10]),
+    ('dim7', [0, 3, 6, 9]),
+    ('m7b5', [0, 3, 6, 10]),
+    ('6', [0, 4, 7, 9]),
+    ('m6', [0, 3, 7, 9]),
+    ('9', [0, 4, 7, 10, 14]),
+    ('add9', [0, 4, 7, 14]),
+]
+# Krumhansl-Kessler key profiles (tonic first), as in chord-detector-ml's chord_utils
+MAJOR_KEY_PROFILE = [6.35, 2.23, 3.48, 2.33, 4.38, 4.09, 2.52, 5.19, 2.39, 3.66, 2.29, 2.88]
+MINOR_KEY_PROFILE = [6.33, 2.68, 3.52, 5.38, 2.60, 3.53, 2.54, 4.75, 3.98, 2.69, 3.34, 3.17]
+
+# Template weight of each chord tone, by position in the interval list:
+# root and third define the chord, the fifth is often omitted, extensions
+# are weakest. Rows are then scaled to a triad's L2 norm so larger chords
+# don't win just by covering more bins.
+CHORD_TONE_WEIGHTS = [1.0, 1.0, 0.8, 0.6, 0.5]
+
+# 'majmin' (24 binary triad templates) or 'extended' (180 weighted templates)
+CHORD_VOCABULARY = os.environ.get('CHORD_VOCABULARY', 'majmin')
+
+# Index used for 'N' (no chord) in array-backed sequences
+NO_CHORD = -1
+
+# Frames whose best template score is below this are labelled 'N'
+MIN_CHORD_SCORE = 0.3
+
+# Segments shorter than this (seconds) are treated as noise
+MIN_SEGMENT_DURATION = 0.5
+
+# Chord sequence kept as parallel arrays (one entry per frame, or per beat);
+# `scores` holds the full (n_chords, n_columns) template scores for smoothing,
+# `end_time` closes the last column (defaults to the last column's time) and
+# `beats` is the beat index of each column in beat-synchronous mode
+ChordSequence = namedtuple(
+    'ChordSequence',
+    ['labels', 'chord_idx', 'confidence', 'times', 'scores', 'end_time', 'beats'],
+    defaults=(None, None, None)
+)
+
+# Run-length encoded chord segments (one entry per segment)
+ChordSegments = namedtuple('ChordSegments', ['labels', 'chord_idx', 'start', 'end', 'beat'], defaults=(None,))
+
+# Chord templates stacked for matching: labels in template order and the
+# read-only (n_chords, 12) float32 matrix
+TemplateMatrix = namedtuple('TemplateMatrix', ['labels', 'matrix'])
+
 def convert_to_decimal(obj):
     """Convert floats to Decimal for DynamoDB compatibility"""
     if isinstance(obj, float):
@@ -50,6 +232,17 @@ def convert_to_decimal(obj):
 def main():
     """Main entry point for ECS task"""
     
+    if WARMUP_ON_START:
+        start_warm_up()
+    
+    # Long-running worker: pull jobs from a queue until told to stop
+    if JOB_QUEUE_URL:
+        sys.exit(run_worker(JOB_QUEUE_URL))
+    
+    # Batch: several jobs pipelined through one task
+    if JOB_IDS or JOB_MANIFEST:
+        sys.exit(run_batch(load_batch_jobs()))
+    
     # Get parameters from environment (passed from Lambda)
     job_id = os.environ.get('JOB_ID')
     bucket = os.environ.get('AUDIO_BUCKET')
@@ -59,124 +252,1164 @@ def main():
         logger.error(f"Missing required environment variables. JOB_ID={job_id}, AUDIO_BUCKET={bucket}, AUDIO_KEY={key}")
         sys.exit(1)
     
+    # Spot interruption: checkpoint a long analysis instead of dying mid-CQT
+    signal.signal(signal.SIGTERM, request_interrupt)
+    
+    try:
+        profile = os.environ.get('JOB_PROFILE')
+        outcome = process_job(job_id, bucket, key, profile)
+        # Nothing relaunches a stopped task: an interrupted job is handed back to the trigger
+        if outcome == INTERRUPTED and not resubmit_job({'jobId': job_id, 'bucket': bucket, 'key': key, 'profile': profile}):
+            sys.exit(1)
+        sys.exit(0)
+    except Exception:
+        sys.exit(1)
+
+def request_interrupt(signum, frame):
+    logger.info(f"Received signal {signum}, checkpointing at the next analysis block")
+    interrupt.set()
+
+def process_job(job_id, bucket, key, profile=None):
+    """
+    Run one chord detection job end to end
+    `profile` names an ANALYSIS_PROFILES entry (defaults to ANALYSIS_PROFILE)
+    Retried or duplicate runs are cut short (see job_guard.py): returns 'done',
+    'skipped' (a result for this audio and engine is already stored), 'busy'
+    (another live run holds the job) or 'interrupted' (SIGTERM: a streamed
+    analysis was checkpointed and the job released; the caller hands it on
+    with resubmit_job, or a worker returns it to its queue)
+    On failure the job is marked FAILED and the exception re-raised
+    Every stage is timed; the spans are logged as one record per job
+    Audio is opened by open_job_audio (streamed, fetched in parallel or downloaded)
+    """
     logger.info(f"Processing job {job_id}: {bucket}/{key}")
     logger.info(f"Using DynamoDB table: {JOBS_TABLE}")
     
+    audio_path = f'/tmp/{job_id}.mp3'
+    audio = None
+    timer = StageTimer(trace_python_memory=TIMINGS_TRACEMALLOC)
+    table = get_dynamodb().Table(JOBS_TABLE)
+    run_id = uuid.uuid4().hex
+    engine = engine_version(profile)
+    
     try:
-        # Update status
-        update_job_status(job_id, 'DETECTING_CHORDS', 70)
+        outcome, etag, _ = start_job(table, job_id, bucket, key, run_id, engine, timer)
+        if outcome:
+            return outcome
         
-        # Download audio from S3
-        audio_path = f'/tmp/{job_id}.mp3'
-        logger.info(f"Downloading from S3: {bucket}/{key}")
-        s3_client.download_file(bucket, key, audio_path)
+        # A relaunch after an interruption resumes a checkpoint of the same audio and engine
+        checkpoint = job_checkpoint(job_id, bucket, etag, engine)
+        
+        # Open (or download) audio from S3
+        audio_source, audio = open_job_audio(bucket, key, audio_path, timer)
         
-        # Detect chords (using mock for now)
+        # Detect chords
         logger.info("Running chord detection...")
-        chords_data = detect_chords(audio_path)
+        with timer.span('warmUpWait'):
+            wait_for_warm_up()
+        with timer.span('detectChords'):
+            chords_data = detect_chords(
+                audio_source, timer=timer, profile=profile, progress=job_progress_reporter(job_id), checkpoint=checkpoint
+            )
         
-        # Convert floats to Decimal for DynamoDB
-        chords_data = convert_to_decimal(chords_data)
-        
-        # Update job with chords
-        table = dynamodb.Table(JOBS_TABLE)
-        table.update_item(
-            Key={'jobId': job_id},
-            UpdateExpression='SET chordsData = :chords, #status = :status, progress = :progress, updatedAt = :updated',
-            ExpressionAttributeNames={'#status': 'status'},
-            ExpressionAttributeValues={
-                ':chords': chords_data,
-                ':status': 'CHORDS_DETECTED',
-                ':progress': 85,
-                ':updated': 'ecs-task'
-            }
-        )
+        if not store_result(table, job_id, bucket, run_id, etag, engine, chords_data, timer):
+            return BUSY
         
         logger.info("Chord detection complete!")
+        if checkpoint is not None and checkpoint.found:
+            checkpoint.delete()
         
-        # Trigger PDF generation
-        if PDF_GENERATOR_FUNCTION:
-            try:
-                logger.info(f"Triggering PDF generation: {PDF_GENERATOR_FUNCTION}")
-                lambda_client.invoke(
-                    FunctionName=PDF_GENERATOR_FUNCTION,
-                    InvocationType='Event',  # Async invocation
-                    Payload=json.dumps({'jobId': job_id})
-                )
-                logger.info("PDF generation triggered successfully")
-            except Exception as e:
-                logger.error(f"Failed to trigger PDF generation: {str(e)}")
-                # Don't fail the whole task if PDF trigger fails
-        else:
-            logger.warning("PDF_GENERATOR_FUNCTION not set, skipping PDF generation trigger")
-        
-        # Clean up
-        if os.path.exists(audio_path):
-            os.remove(audio_path)
+        trigger_pdf_generation(job_id, timer)
+        return 'done'
         
-        sys.exit(0)
+    except Interrupted:
+        # Leave the status as is; the caller hands the job on and the next run claims it straight away
+        logger.info(f"Job {job_id} interrupted, checkpoint saved; releasing it for a retry")
+        release_job(table, job_id, run_id)
+        return INTERRUPTED
         
     except Exception as e:
         logger.error(f"Error: {str(e)}")
         update_job_status(job_id, 'FAILED', 0, str(e))
-        sys.exit(1)
+        raise
+    
+    finally:
+        leases.remove(job_id)
+        # Clean up (a warm worker must not accumulate audio in /tmp)
+        if audio is not None:
+            audio.stream.close()
+        if os.path.exists(audio_path):
+            os.remove(audio_path)
+        timer.log(job_id)
+
+def job_checkpoint(job_id, bucket, etag, engine):
+    """The job's JobCheckpoint for this audio and engine (None when CHECKPOINTS is off or there's no ETag)"""
+    if not CHECKPOINTS or not etag:
+        return None
+    return JobCheckpoint(get_s3_client(), RESULTS_BUCKET or bucket, job_id, {
+        'etag': etag, 'engine': engine, 'streamBlockSeconds': STREAM_BLOCK_SECONDS
+    })
+
+def start_job(table, job_id, bucket, key, run_id, engine, timer):
+    """
+    Skip or claim a job before any audio is read
+    Returns (outcome, etag, size): outcome is 'skipped' or BUSY when this run
+    should stop there, None once the job is claimed
+    """
+    # Skip work a previous run already finished for this audio and engine
+    with timer.span('idempotencyCheck'):
+        head = get_s3_client().head_object(Bucket=bucket, Key=key)
+        etag = head.get('ETag', '').strip('"')
+        existing = find_existing_result(table, job_id, etag, engine)
+    if existing:
+        logger.info(f"Job {job_id} already has {engine} chords for etag {etag}, skipping analysis")
+        if existing.get('status') == 'CHORDS_DETECTED':
+            # The earlier run may have stopped before handing over to the PDF step
+            trigger_pdf_generation(job_id, timer)
+        return 'skipped', etag, head.get('ContentLength')
+    
+    # Update status (and take the job's lease, unless a live duplicate holds it)
+    with timer.span('statusUpdate'):
+        if claim_job(table, job_id, run_id, CLAIM_LEASE_SECONDS, 'DETECTING_CHORDS', 70, 'ecs-task') == BUSY:
+            return BUSY, etag, head.get('ContentLength')
+    # Held until the job is done with (process_job / cleanup_batch_job let it go)
+    leases.add(table, job_id, run_id)
+    return None, etag, head.get('ContentLength')
+
+def job_progress_reporter(job_id):
+    """Interim chord writer for a job (None when PROGRESS_UPDATES is off)"""
+    if not PROGRESS_UPDATES:
+        return None
+    return ProgressReporter(
+        lambda chords, progress, analyzed: write_partial_chords(job_id, chords, progress, analyzed),
+        PROGRESS_MIN_WRITE_SECONDS
+    )
+
+def store_result(table, job_id, bucket, run_id, etag, engine, chords_data, timer):
+    """
+    Write the chords to the job (replacing any interim chords in the same write),
+    tagged with the audio etag/engine and only while this run holds the lease
+    Returns False when the lease was lost and the other run's result is kept
+    """
+    result_attrs, stale_attrs = chord_result_attributes(job_id, bucket, chords_data, timer)
+    
+    guard_set, guard_remove, guard_condition, guard_values = result_guard(run_id, etag, engine)
+    update_expr = 'SET #status = :status, progress = :progress, updatedAt = :updated, ' + guard_set
+    expr_values = {
+        ':status': 'CHORDS_DETECTED',
+        ':progress': 85,
+        ':updated': 'ecs-task',
+        **guard_values
+    }
+    for name, value in result_attrs.items():
+        update_expr += f', {name} = :{name}'
+        expr_values[f':{name}'] = value
+    if STORE_TIMINGS:
+        update_expr += ', timings = :timings'
+        expr_values[':timings'] = convert_to_decimal(timer.summary())
+    update_expr += ' REMOVE ' + ', '.join(['partialChords', 'partialChordsBin', 'analyzedSeconds'] + stale_attrs + guard_remove)
+    
+    with timer.span('dynamodbWrite'):
+        try:
+            table.update_item(
+                Key={'jobId': job_id},
+                UpdateExpression=update_expr,
+                ConditionExpression=guard_condition,
+                ExpressionAttributeNames={'#status': 'status'},
+                ExpressionAttributeValues=expr_values
+            )
+        except Exception as e:
+            if not is_condition_failure(e):
+                raise
+            logger.warning(f"Lost the lease on job {job_id}; keeping the other run's result")
+            return False
+    return True
+
+def start_warm_up():
+    """Warm the default profile in a background thread; the first job waits for it before analysing"""
+    global warm_up_thread
+    from warmup import warm_up
+    
+    # app runs as __main__, so hand warm_up this module rather than a second import of app
+    warm_up_thread = threading.Thread(
+        target=warm_up, args=(sys.modules[__name__], [ANALYSIS_PROFILE]), name='warm-up', daemon=True
+    )
+    warm_up_thread.start()
+
+def wait_for_warm_up():
+    """Block until a start-up warm-up (if any) has finished, so it never competes with a job for CPU"""
+    if warm_up_thread is not None:
+        warm_up_thread.join()
+
+def trigger_pdf_generation(job_id, timer):
+    """Start the PDF generator asynchronously; failures are logged, not raised"""
+    if not PDF_GENERATOR_FUNCTION:
+        logger.warning("PDF_GENERATOR_FUNCTION not set, skipping PDF generation trigger")
+        return
+    try:
+        logger.info(f"Triggering PDF generation: {PDF_GENERATOR_FUNCTION}")
+        with timer.span('pdfTrigger'):
+            get_lambda_client().invoke(
+                FunctionName=PDF_GENERATOR_FUNCTION,
+                InvocationType='Event',  # Async invocation
+                Payload=json.dumps({'jobId': job_id})
+            )
+        logger.info("PDF generation triggered successfully")
+    except Exception as e:
+        logger.error(f"Failed to trigger PDF generation: {str(e)}")
+        # Don't fail the whole task if PDF trigger fails
+
+def resubmit_job(job):
+    """
+    Hand an interrupted job back to CHORD_TRIGGER_FUNCTION so another run
+    resumes its checkpoint; returns True once it's handed on
+    Without a trigger (or if the invoke fails) the job is marked FAILED
+    instead of sitting in DETECTING_CHORDS: claim_job takes over FAILED
+    jobs, so a retry still resumes from the checkpoint.
+    """
+    job_id = job['jobId']
+    if CHORD_TRIGGER_FUNCTION:
+        try:
+            payload = {'jobId': job_id, 'bucket': job['bucket'], 'key': job['key']}
+            if job.get('profile'):
+                payload['profile'] = job['profile']
+            get_lambda_client().invoke(
+                FunctionName=CHORD_TRIGGER_FUNCTION,
+                InvocationType='Event',  # Async invocation
+                Payload=json.dumps(payload)
+            )
+            logger.info(f"Job {job_id} handed back to {CHORD_TRIGGER_FUNCTION}")
+            return True
+        except Exception as e:
+            logger.error(f"Failed to resubmit job {job_id}: {str(e)}")
+    else:
+        logger.warning("CHORD_TRIGGER_FUNCTION not set, cannot resubmit an interrupted job")
+    update_job_status(job_id, 'FAILED', 0, 'Chord detection was interrupted; retry to resume it')
+    return False
+
+def chord_result_attributes(job_id, bucket, chords_data, timer):
+    """
+    Job item attributes for a finished chordsData; returns ({attribute: value}, [attributes to remove])
+    The result is one compact chordsBin attribute (see chord_codec.py) or nested
+    maps with floats as Decimal (CHORDS_ENCODING). Results over
+    RESULT_OFFLOAD_BYTES go to S3 instead (see result_store.py), leaving a
+    chordsRef pointer and a chordsSummary in the item.
+    """
+    if CHORDS_ENCODING == 'binary':
+        from chord_codec import encode_chords
+        with timer.span('encodeChords'):
+            body = encode_chords(chords_data)
+        inline = {'chordsBin': body}
+        encoding = 'chordsBin'
+        size = len(body)
+    else:
+        with timer.span('convertToDecimal'):
+            inline = {'chordsData': convert_to_decimal(chords_data)}
+        body = None
+        encoding = 'json.gz'
+        size = len(json.dumps(chords_data, separators=(',', ':')))
+    
+    attributes = inline
+    if RESULT_OFFLOAD_BYTES and size > RESULT_OFFLOAD_BYTES:
+        from result_store import encode_json_result, offload_result, summarize_chords
+        try:
+            with timer.span('resultOffload'):
+                if body is None:
+                    body = encode_json_result(chords_data)
+                pointer = offload_result(get_s3_client(), RESULTS_BUCKET or bucket, job_id, 'chords', body, encoding)
+            attributes = {'chordsRef': pointer, 'chordsSummary': convert_to_decimal(summarize_chords(chords_data))}
+        except Exception as e:
+            # An inline result still fits the item unless it is huge; better than failing the job
+            logger.warning(f"Result offload failed, storing inline ({size} bytes): {e}")
+    
+    stale = [name for name in ('chordsBin', 'chordsData', 'chordsRef', 'chordsSummary') if name not in attributes]
+    return attributes, stale
+
+def open_job_audio(bucket, key, audio_path, timer):
+    """
+    Get a job's audio ready for detect_chords; returns (audio source, S3AudioObject to close or None)
+    With S3_STREAMING the object body is decoded as it arrives, except:
+    - objects of S3_PARALLEL_FETCH_MB or more are fetched with parallel ranged
+      GETs into one buffer (kept in the hot audio cache for reuse)
+    - containers that need seeking (m4a/mp4) go to a file at `audio_path`
+    """
+    if not S3_STREAMING:
+        logger.info(f"Downloading from S3: {bucket}/{key}")
+        with timer.span('s3Download'):
+            get_s3_client().download_file(bucket, key, audio_path)
+        return audio_path, None
+    
+    from s3_stream import PeekableStream, S3AudioObject, needs_seekable_input, open_audio_object, spool_to_file
+    
+    logger.info(f"Streaming from S3: {bucket}/{key}")
+    with timer.span('s3Open'):
+        audio = open_audio_object(get_s3_client(), bucket, key)
+    seekable_only = needs_seekable_input(audio)
+    
+    cache = get_hot_audio()
+    fetched = cache.get(bucket, key, audio.etag) if cache and audio.etag else None
+    if fetched is None and (audio.size or 0) < S3_PARALLEL_FETCH_MB * 1024 * 1024:
+        if seekable_only:
+            logger.info("Container needs seekable input, spooling to /tmp")
+            with timer.span('s3Download'):
+                spool_to_file(audio, audio_path)
+            return audio_path, audio
+        return audio, audio
+    
+    # Large (or already fetched) object: the single body isn't needed
+    audio.stream.close()
+    if fetched is None:
+        from s3_fetch import fetch_object
+        with timer.span('s3Fetch'):
+            fetched = fetch_object(
+                get_s3_client(), bucket, key, size=audio.size, etag=audio.etag,
+                path=audio_path if seekable_only else None
+            )
+        if cache:
+            cache.put(bucket, key, fetched)
+    else:
+        logger.info(f"Reusing fetched audio for {key} (etag {audio.etag})")
+    
+    if seekable_only:
+        if not fetched.path:
+            with open(audio_path, 'wb') as f:
+                f.write(fetched.buffer)
+        return audio_path, None
+    
+    from s3_fetch import BufferReader
+    return S3AudioObject(PeekableStream(BufferReader(fetched.buffer)), fetched.size, fetched.etag, key), None
+
+def get_hot_audio():
+    """Process-wide s3_fetch.HotObjectCache (None when HOT_AUDIO_CACHE_MB is 0)"""
+    global hot_audio
+    if hot_audio is None and HOT_AUDIO_CACHE_MB > 0:
+        from s3_fetch import HotObjectCache
+        hot_audio = HotObjectCache(HOT_AUDIO_CACHE_MB * 1024 * 1024)
+    return hot_audio
+
+def run_worker(queue_url):
+    """
+    Process queued jobs back to back in this (warm) interpreter
+    Each job is leased with a visibility timeout that a heartbeat keeps
+    extending; SIGTERM/SIGINT finish the current job and then exit cleanly
+    (a streamed analysis checkpoints instead, and its message is released
+    for another worker to resume).
+    Returns the process exit code.
+    """
+    from job_queue import queue_from_url
+    
+    queue = queue_from_url(queue_url, visibility_timeout=WORKER_VISIBILITY_TIMEOUT)
+    stopping = threading.Event()
+    
+    def request_stop(signum, frame):
+        logger.info(f"Received signal {signum}, finishing current job before exit")
+        stopping.set()
+        interrupt.set()
+    
+    signal.signal(signal.SIGTERM, request_stop)
+    signal.signal(signal.SIGINT, request_stop)
+    
+    logger.info(f"Worker started, polling {queue_url}")
+    processed = failed = 0
+    idle_since = time.monotonic()
+    
+    while not stopping.is_set():
+        lease = queue.receive()
+        if lease is None:
+            if WORKER_IDLE_SECONDS and time.monotonic() - idle_since > WORKER_IDLE_SECONDS:
+                logger.info(f"Idle for {WORKER_IDLE_SECONDS:.0f}s, shutting down")
+                break
+            continue
+        
+        job = lease.job
+        heartbeat_done = threading.Event()
+        
+        def heartbeat():
+            # Keep the lease alive at half the visibility timeout
+            while not heartbeat_done.wait(WORKER_VISIBILITY_TIMEOUT / 2):
+                try:
+                    queue.extend(lease, WORKER_VISIBILITY_TIMEOUT)
+                except Exception as e:
+                    logger.error(f"Failed to extend lease for {job.get('jobId')}: {e}")
+        
+        heartbeat_thread = threading.Thread(target=heartbeat, daemon=True)
+        heartbeat_thread.start()
+        outcome = None
+        try:
+            outcome = process_job(job['jobId'], job['bucket'], job['key'], job.get('profile'))
+            processed += 1
+        except Exception as e:
+            # Job is already marked FAILED, same as a failed single-shot task
+            logger.error(f"Job {job.get('jobId')} failed: {e}")
+            failed += 1
+        finally:
+            heartbeat_done.set()
+            heartbeat_thread.join()
+        
+        # A job another run holds comes back after the visibility timeout, by
+        # when it is either finished (and skipped) or its lease has lapsed
+        if outcome == INTERRUPTED:
+            queue.release(lease)
+        elif outcome != BUSY:
+            queue.ack(lease)
+        idle_since = time.monotonic()
+    
+    logger.info(f"Worker stopped: processed={processed}, failed={failed}")
+    return 0
+
+def load_batch_jobs():
+    """
+    The jobs of a batch task as [{'jobId', 'bucket', 'key', 'profile'}]
+    JOB_IDS/AUDIO_KEYS pair up in order and share AUDIO_BUCKET and JOB_PROFILE.
+    JOB_MANIFEST is s3://bucket/key (or a key in AUDIO_BUCKET) of a JSON list
+    of {"jobId", "key", "bucket"?, "profile"?}, or of {"jobs": [...]}
+    """
+    bucket = os.environ.get('AUDIO_BUCKET')
+    profile = os.environ.get('JOB_PROFILE')
+    
+    if JOB_MANIFEST:
+        manifest_bucket, manifest_key = bucket, JOB_MANIFEST
+        if JOB_MANIFEST.startswith('s3://'):
+            manifest_bucket, _, manifest_key = JOB_MANIFEST[len('s3://'):].partition('/')
+        body = get_s3_client().get_object(Bucket=manifest_bucket, Key=manifest_key)['Body'].read()
+        entries = json.loads(body)
+        if isinstance(entries, dict):
+            entries = entries['jobs']
+        jobs = [{
+            'jobId': entry['jobId'],
+            'bucket': entry.get('bucket') or bucket,
+            'key': entry['key'],
+            'profile': entry.get('profile') or profile
+        } for entry in entries]
+    else:
+        job_ids = [job_id.strip() for job_id in JOB_IDS.split(',') if job_id.strip()]
+        keys = [key.strip() for key in os.environ.get('AUDIO_KEYS', '').split(',') if key.strip()]
+        if len(keys) != len(job_ids):
+            raise ValueError(f"JOB_IDS has {len(job_ids)} jobs but AUDIO_KEYS has {len(keys)} keys")
+        jobs = [{'jobId': job_id, 'bucket': bucket, 'key': key, 'profile': profile}
+                for job_id, key in zip(job_ids, keys)]
+    
+    missing = [job.get('jobId') for job in jobs if not job['bucket']]
+    if missing:
+        raise ValueError(f"No bucket for jobs {missing} (set AUDIO_BUCKET or give one in the manifest)")
+    return jobs
+
+def run_batch(jobs):
+    """
+    Process a batch of jobs in one task, pipelined:
+    - a thread pool claims each job and fetches its audio to /tmp, and
+      writes results and status (BATCH_IO_THREADS)
+    - a process pool runs the analysis, one job per process
+      (BATCH_DSP_WORKERS, default one per core)
+    Up to BATCH_PREFETCH jobs are fetched ahead of a free process, so DSP
+    doesn't wait on S3. Each job has process_job's outcomes: a failure marks
+    only that job FAILED and the batch carries on. A crashed DSP process
+    breaks the whole pool, so the jobs it was running are retried one at a
+    time in a single-process pool, and only a job that crashes that one
+    fails. SIGTERM stops new jobs from starting and is passed on to the DSP
+    processes, where streamed analyses checkpoint; analyses still running
+    BATCH_STOP_SECONDS later are stopped. Every job left unfinished is
+    released and, with the jobs never started, handed back to the trigger
+    (resubmit_job).
+    Logs one chord_batch_summary record (throughput) and returns the exit
+    code: 1 if any job failed or couldn't be handed back.
+    """
+    import multiprocessing
+    from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+    from concurrent.futures.process import BrokenProcessPool
+    from parallel_chroma import available_cpus
+    
+    # The DSP processes ignore signals and watch this instead
+    worker_interrupt = multiprocessing.Event()
+    
+    def forward_interrupt(signum, frame):
+        request_interrupt(signum, frame)
+        worker_interrupt.set()
+    
+    signal.signal(signal.SIGTERM, forward_interrupt)
+    
+    dsp_workers = BATCH_DSP_WORKERS or available_cpus()
+    logger.info(f"Batch of {len(jobs)} jobs: {dsp_workers} DSP processes, {BATCH_IO_THREADS} I/O threads")
+    
+    # Forked DSP processes inherit the warmed-up interpreter
+    wait_for_warm_up()
+    
+    def new_dsp_pool(workers=dsp_workers):
+        return ProcessPoolExecutor(max_workers=workers, initializer=_init_batch_worker, initargs=(worker_interrupt,))
+    
+    io_pool = ThreadPoolExecutor(max_workers=BATCH_IO_THREADS)
+    dsp_pool = new_dsp_pool()
+    # Single-process pool where jobs caught in a crashed pool are retried alone
+    isolation_pool = None
+    table = get_dynamodb().Table(JOBS_TABLE)
+    
+    outcomes = {}
+    audio_seconds = 0.0
+    # Set when a DSP process died; the pool is replaced once its jobs are back
+    pool_broken = False
+    pending = list(reversed(jobs))
+    # Jobs fetched and waiting for a DSP process
+    ready = []
+    # Jobs that were in a pool when one of its processes died, to retry alone
+    suspects = []
+    # future -> (stage, job state)
+    running = {}
+    # When running analyses are given up on, once SIGTERM has arrived
+    stop_deadline = None
+    start = time.perf_counter()
+    
+    def fail(state, error, stage):
+        # Same as a failed single-job task: this job is FAILED, the others carry on
+        job_id = state['job']['jobId']
+        logger.error(f"Job {job_id} failed: {error}")
+        update_job_status(job_id, 'FAILED', 0, str(error))
+        outcomes[job_id] = 'failed'
+        cleanup_batch_job(state)
+        if stage != 'finish':
+            state['timer'].log(job_id)
+    
+    def hand_back(state):
+        # Unfinished: give up the lease so the resubmitted job is claimed straight away
+        job_id = state['job']['jobId']
+        release_job(table, job_id, state['runId'])
+        outcomes[job_id] = INTERRUPTED
+        cleanup_batch_job(state)
+        state['timer'].log(job_id)
+    
+    def submit_dsp(pool, state, stage):
+        job = state['job']
+        future = pool.submit(
+            _detect_in_worker, job['jobId'], job['bucket'], state['path'], job['profile'], state['etag'], state['engine']
+        )
+        running[future] = (stage, state)
+    
+    def stage_count(name):
+        return sum(1 for stage, _ in running.values() if stage == name)
+    
+    try:
+        while pending or ready or suspects or running:
+            if pool_broken and not stage_count('dsp'):
+                dsp_pool.shutdown(wait=False)
+                dsp_pool = new_dsp_pool()
+                pool_broken = False
+            
+            # Keep every DSP process busy (suspects first, one at a time) and
+            # at most BATCH_PREFETCH jobs fetched ahead
+            dsp_running = stage_count('dsp') + stage_count('isolated')
+            if suspects and not stage_count('isolated') and dsp_running < dsp_workers and not interrupt.is_set():
+                isolation_pool = isolation_pool or new_dsp_pool(1)
+                submit_dsp(isolation_pool, suspects.pop(0), 'isolated')
+                dsp_running += 1
+            while ready and dsp_running < dsp_workers and not pool_broken and not interrupt.is_set():
+                submit_dsp(dsp_pool, ready.pop(0), 'dsp')
+                dsp_running += 1
+            preparing = stage_count('prepare')
+            while pending and not interrupt.is_set() and dsp_running + len(ready) + preparing < dsp_workers + BATCH_PREFETCH:
+                # I/O stages of several jobs share this process: their spans carry no
+                # memory peaks (the analysis, one job per DSP process, still does)
+                state = {'job': pending.pop(), 'runId': uuid.uuid4().hex, 'timer': StageTimer(process_memory=False)}
+                running[io_pool.submit(prepare_batch_job, table, state)] = ('prepare', state)
+                preparing += 1
+            
+            if interrupt.is_set():
+                # Stop starting jobs: hand back the fetched ones, give the running ones until the deadline
+                for state in ready + suspects:
+                    hand_back(state)
+                ready = []
+                suspects = []
+                pending = []
+                if stop_deadline is None:
+                    stop_deadline = time.monotonic() + BATCH_STOP_SECONDS
+                elif time.monotonic() > stop_deadline and (stage_count('dsp') or stage_count('isolated')):
+                    # Hand the analyses back before the task is killed, then stop their processes
+                    for future, (stage, state) in list(running.items()):
+                        if stage in ('dsp', 'isolated'):
+                            logger.warning(f"Job {state['job']['jobId']} still analysing at the stop deadline, handing it back")
+                            del running[future]
+                            hand_back(state)
+                    for process in multiprocessing.active_children():
+                        process.terminate()
+                if not running:
+                    break
+            
+            # Wake up regularly so SIGTERM is acted on while long analyses run
+            done, _ = wait(running, timeout=BATCH_POLL_SECONDS, return_when=FIRST_COMPLETED)
+            for future in done:
+                stage, state = running.pop(future)
+                job_id = state['job']['jobId']
+                try:
+                    result = future.result()
+                except BrokenProcessPool as e:
+                    if stage == 'isolated':
+                        # Crashed on its own: this job is the cause
+                        isolation_pool.shutdown(wait=False)
+                        isolation_pool = None
+                        fail(state, e, stage)
+                    else:
+                        # A DSP process died (e.g. out of memory), taking the pool's other
+                        # jobs with it; which one caused it isn't known yet
+                        pool_broken = True
+                        logger.warning(f"DSP pool crashed while running job {job_id}, retrying it alone")
+                        suspects.append(state)
+                    continue
+                except Exception as e:
+                    fail(state, e, stage)
+                    continue
+                
+                if stage == 'prepare':
+                    if result:
+                        outcomes[job_id] = result
+                        state['timer'].log(job_id)
+                    else:
+                        ready.append(state)
+                elif stage in ('dsp', 'isolated'):
+                    chords_data, stages, state['checkpointFound'] = result
+                    state['timer'].merge(stages)
+                    if chords_data == INTERRUPTED:
+                        # Checkpointed after SIGTERM
+                        hand_back(state)
+                        continue
+                    audio_seconds += chords_data.get('duration', 0)
+                    running[io_pool.submit(finish_batch_job, table, state, chords_data)] = ('finish', state)
+                else:
+                    outcomes[job_id] = result
+    finally:
+        io_pool.shutdown(wait=True)
+        dsp_pool.shutdown(wait=True)
+        if isolation_pool:
+            isolation_pool.shutdown(wait=True)
+    
+    wall = time.perf_counter() - start
+    counts = {}
+    for outcome in outcomes.values():
+        counts[outcome] = counts.get(outcome, 0) + 1
+    unprocessed = len(jobs) - len(outcomes)
+    logger.info(json.dumps({
+        'event': 'chord_batch_summary',
+        'jobs': len(jobs),
+        'outcomes': counts,
+        'unprocessed': unprocessed,
+        'wallSeconds': round(wall, 3),
+        'jobsPerMinute': round(60 * counts.get('done', 0) / wall, 2) if wall else 0,
+        'audioSecondsPerSecond': round(audio_seconds / wall, 2) if wall else 0,
+        'dspWorkers': dsp_workers,
+        'ioThreads': BATCH_IO_THREADS
+    }))
+    
+    # Interrupted and never-started jobs would otherwise wait for a relaunch that never comes
+    unfinished = [job for job in jobs if outcomes.get(job['jobId'], INTERRUPTED) == INTERRUPTED]
+    resubmitted = [resubmit_job(job) for job in unfinished]
+    return 1 if counts.get('failed') or not all(resubmitted) else 0
+
+def batch_audio_path(job):
+    """Where a batch job's audio is fetched to (keeps the extension for the decoder)"""
+    return f"/tmp/{job['jobId']}{os.path.splitext(job['key'])[1] or '.audio'}"
+
+def prepare_batch_job(table, state):
+    """
+    Batch I/O stage: skip or claim the job, then fetch its audio to a file
+    Returns 'skipped' or BUSY when there is nothing to analyse, else None
+    """
+    job = state['job']
+    timer = state['timer']
+    engine = engine_version(job['profile'])
+    logger.info(f"Preparing job {job['jobId']}: {job['bucket']}/{job['key']}")
+    outcome, etag, size = start_job(table, job['jobId'], job['bucket'], job['key'], state['runId'], engine, timer)
+    if outcome:
+        return outcome
+    state['etag'] = etag
+    state['engine'] = engine
+    state['path'] = batch_audio_path(job)
+    
+    from s3_fetch import fetch_object
+    with timer.span('s3Fetch'):
+        fetch_object(get_s3_client(), job['bucket'], job['key'], size=size, etag=etag, path=state['path'])
+    return None
+
+def finish_batch_job(table, state, chords_data):
+    """Batch I/O stage: store the result and hand over to the PDF step; returns 'done' or BUSY"""
+    job = state['job']
+    timer = state['timer']
+    try:
+        if not store_result(table, job['jobId'], job['bucket'], state['runId'], state['etag'], state['engine'],
+                            chords_data, timer):
+            return BUSY
+        if state.get('checkpointFound'):
+            job_checkpoint(job['jobId'], job['bucket'], state['etag'], state['engine']).delete()
+        trigger_pdf_generation(job['jobId'], timer)
+        return 'done'
+    finally:
+        cleanup_batch_job(state)
+        timer.log(job['jobId'])
+
+def cleanup_batch_job(state):
+    """Stop renewing a batch job's lease and remove its fetched audio"""
+    leases.remove(state['job']['jobId'])
+    path = state.get('path')
+    if path and os.path.exists(path):
+        os.remove(path)
+
+def _init_batch_worker(stop_event):
+    """
+    DSP process setup: boto3 clients aren't fork-safe, so each process makes
+    its own; one CQT process per job (the batch already fills the cores);
+    signals are left to the parent, which coordinates the stop and sets
+    `stop_event` (a multiprocessing.Event) in place of `interrupt`
+    """
+    global s3_client, dynamodb, lambda_client, CQT_WORKERS, interrupt
+    s3_client = dynamodb = lambda_client = None
+    CQT_WORKERS = 1
+    interrupt = stop_event
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
 
-def detect_chords(audio_path):
+def _detect_in_worker(job_id, bucket, audio_path, profile, etag, engine):
+    """
+    Batch DSP stage (in a pool process): returns (chords_data, timer stages,
+    whether a checkpoint was found); chords_data is INTERRUPTED when a
+    streamed analysis checkpointed after SIGTERM
+    """
+    timer = StageTimer(trace_python_memory=TIMINGS_TRACEMALLOC)
+    checkpoint = job_checkpoint(job_id, bucket, etag, engine)
+    try:
+        with timer.span('detectChords'):
+            chords_data = detect_chords(
+                audio_path, timer=timer, profile=profile, progress=job_progress_reporter(job_id), checkpoint=checkpoint
+            )
+    except Interrupted:
+        logger.info(f"Job {job_id} interrupted, checkpoint saved")
+        chords_data = INTERRUPTED
+    return chords_data, timer.stages, checkpoint is not None and checkpoint.found
+
+def detect_chords(audio_source, timer=None, profile=None, progress=None, checkpoint=None):
     """
     Detect chords using Librosa's chromagram analysis
     Uses chroma features to identify chord progressions
+    `audio_source` is a local path or an s3_stream.S3AudioObject
+    `profile` picks the analysis settings (see ANALYSIS_PROFILES)
+    Stages are recorded on `timer` (a timing.StageTimer) when given
+    Interim chords of the audio analyzed so far go to `progress` (a
+    progress.ProgressReporter) whenever it is due
+    A streamed analysis resumes from `checkpoint` (a checkpoint.JobCheckpoint)
+    and saves to it when interrupted
     """
     
     if not LIBROSA_AVAILABLE:
         logger.error("Librosa not available, cannot detect chords")
         raise Exception("Librosa library not installed")
     
+    timer = timer or NullTimer()
+    profile, settings = resolve_profile(profile)
+    hmm_smoothing = HMM_SMOOTHING if settings['hmm'] is None else settings['hmm']
+    hop_length = settings['hopLength']
+    
+    # Define chord templates (major/minor triads, or the extended vocabulary)
+    chord_templates = chord_template_matrix()
+    
+    on_progress = None
+    if progress is not None:
+        def on_progress(partial_chromagram, analyzed_seconds, total_seconds):
+            if not progress.due():
+                return
+            with timer.span('partialResults'):
+                partial = partial_chord_segments(partial_chromagram, chord_templates, hop_length, settings['sampleRate'])
+                progress.publish(partial, analyzed_seconds, total_seconds)
+    
     try:
-        logger.info(f"Loading audio file with Librosa: {audio_path}")
-        
-        # Load audio file
-        y, sr = librosa.load(audio_path, sr=22050)
-        duration = librosa.get_duration(y=y, sr=sr)
-        
-        logger.info(f"Audio loaded: duration={duration:.2f}s, sample_rate={sr}Hz")
-        
-        # Extract chroma features (pitch class profiles)
-        hop_length = 512
-        chromagram = librosa.feature.chroma_cqt(y=y, sr=sr, hop_length=hop_length)
-        
-        logger.info(f"Chromagram shape: {chromagram.shape}")
+        beat_sync = ANALYSIS_MODE == 'beat'
+        chromagram, onset_env, sr, duration = compute_chromagram(
+            audio_source, settings['sampleRate'], hop_length, with_onsets=beat_sync, timer=timer,
+            chroma=settings['chroma'], n_fft=settings.get('nFft'), on_progress=on_progress, checkpoint=checkpoint
+        )
         
-        # Define chord templates (major and minor triads)
-        chord_templates = create_chord_templates()
+        logger.info(f"Chromagram shape: {chromagram.shape} (profile: {profile})")
         
-        # Match chromagram to chord templates
-        chord_sequence = match_chords_to_templates(chromagram, chord_templates, hop_length, sr)
+        with timer.span('templateMatching'):
+            if beat_sync:
+                # Match one aggregated chroma column per beat
+                chord_sequence = match_chords_per_beat(chromagram, onset_env, chord_templates, hop_length, sr)
+            else:
+                # Match chromagram to chord templates
+                chord_sequence = match_chords_to_templates(chromagram, chord_templates, hop_length, sr)
         
-        # Group consecutive same chords into segments
-        chord_segments = group_chord_segments(chord_sequence)
+        # Optionally decode the most likely chord path with an HMM
+        if hmm_smoothing:
+            with timer.span('hmmSmoothing'):
+                chord_sequence = smooth_chord_sequence(chord_sequence, HMM_SELF_TRANSITION)
         
-        # Filter out very short segments (likely noise)
-        chord_segments = [s for s in chord_segments if s['duration'] >= 0.5]
+        with timer.span('segmentation'):
+            # Group consecutive same chords into segments
+            segments = group_chord_segments(chord_sequence)
+            
+            # Filter out very short segments (likely noise)
+            segments = filter_short_segments(segments, MIN_SEGMENT_DURATION)
+            chord_segments = segments_to_dicts(segments)
         
         # Detect key
-        key = detect_key(chord_segments)
+        with timer.span('keyDetection'):
+            key, key_confidence, runner_up, runner_up_confidence = detect_key(chromagram)
         
-        logger.info(f"Detected {len(chord_segments)} chord segments, key: {key}, duration: {duration:.2f}s")
+        logger.info(f"Detected {len(chord_segments)} chord segments, key: {key} ({key_confidence:.2f}, runner-up {runner_up}), duration: {duration:.2f}s")
         
         return {
             'chords': chord_segments,
             'key': key,
-            'model': 'librosa-chromagram',
+            'keyConfidence': round(key_confidence, 3),
+            'keyRunnerUp': {'key': runner_up, 'confidence': round(runner_up_confidence, 3)},
+            'model': model_name(profile),
             'totalChords': len(chord_segments),
             'duration': round(duration, 2)
         }
         
+    except Interrupted:
+        raise
     except Exception as e:
         logger.error(f"Librosa chord detection failed: {str(e)}", exc_info=True)
         raise
 
-def create_chord_templates():
-    """Create chord templates for major and minor triads"""
+def model_name(profile=None):
+    """Name of the detector configuration a profile runs (stored as chordsData.model)"""
+    profile, settings = resolve_profile(profile)
+    hmm_smoothing = HMM_SMOOTHING if settings['hmm'] is None else settings['hmm']
+    return (f'librosa-chromagram-{profile}' + ('-beat' if ANALYSIS_MODE == 'beat' else '')
+            + ('-hmm' if hmm_smoothing else '') + ('-extended' if CHORD_VOCABULARY == 'extended' else ''))
+
+def engine_version(profile=None):
+    """Identity of the results a run would produce; a stored result is reused only on a match"""
+    return f'{model_name(profile)}@{ENGINE_VERSION}'
+
+def partial_chord_segments(chromagram, templates, hop_length, sr):
+    """Frame-level chords of a partial chromagram (no beat sync or smoothing: interim only)"""
+    sequence = match_chords_to_templates(chromagram, templates, hop_length, sr)
+    segments = filter_short_segments(group_chord_segments(sequence), MIN_SEGMENT_DURATION)
+    return segments_to_dicts(segments)
+
+def write_partial_chords(job_id, chord_segments, progress, analyzed_seconds):
+    """
+    Store interim chords on the job while it is still DETECTING_CHORDS
+    The list is rewritten whole on every write, so with CHORDS_ENCODING
+    'binary' it goes in one compact partialChordsBin attribute (chord_codec.py)
+    The condition keeps a late interim write from landing on a finished job
+    """
+    table = get_dynamodb().Table(JOBS_TABLE)
+    attribute = 'partialChords'
+    chords = chord_segments
+    if CHORDS_ENCODING == 'binary':
+        from chord_codec import encode_chords
+        attribute = 'partialChordsBin'
+        chords = encode_chords({'chords': chord_segments})
+    table.update_item(
+        Key={'jobId': job_id},
+        UpdateExpression=f'SET {attribute} = :chords, progress = :progress, analyzedSeconds = :analyzed, updatedAt = :updated',
+        ConditionExpression='#status = :detecting',
+        ExpressionAttributeNames={'#status': 'status'},
+        ExpressionAttributeValues=convert_to_decimal({
+            ':chords': chords,
+            ':progress': progress,
+            ':analyzed': analyzed_seconds,
+            ':detecting': 'DETECTING_CHORDS',
+            ':updated': 'ecs-task'
+        })
+    )
+
+def resolve_profile(profile=None):
+    """Return (name, settings) for a profile name; unknown names fall back to ANALYSIS_PROFILE"""
+    name = profile or ANALYSIS_PROFILE
+    if name not in ANALYSIS_PROFILES:
+        logger.warning(f"Unknown analysis profile '{name}', using '{ANALYSIS_PROFILE}'")
+        name = ANALYSIS_PROFILE
+    return name, ANALYSIS_PROFILES[name]
+
+def get_s3_client():
+    """Shared S3 client"""
+    global s3_client
+    if s3_client is None:
+        import boto3
+        s3_client = boto3.client('s3')
+    return s3_client
+
+def get_dynamodb():
+    """Shared DynamoDB resource"""
+    global dynamodb
+    if dynamodb is None:
+        import boto3
+        dynamodb = boto3.resource('dynamodb')
+    return dynamodb
+
+def get_lambda_client():
+    """Shared Lambda client"""
+    global lambda_client
+    if lambda_client is None:
+        import boto3
+        lambda_client = boto3.client('lambda')
+    return lambda_client
+
+def get_feature_cache():
+    """Process-wide chromagram cache (None when disabled)"""
+    global feature_cache
+    if feature_cache is None and FEATURE_CACHE_ENABLED:
+        from feature_cache import FeatureCache
+        feature_cache = FeatureCache(
+            FEATURE_CACHE_DIR,
+            FEATURE_CACHE_MAX_MB * 1024 * 1024,
+            s3_bucket=FEATURE_CACHE_BUCKET,
+            s3_client=get_s3_client()
+        )
+    return feature_cache
+
+def cqt_workers():
+    """Processes for chroma extraction: CQT_WORKERS, or every available core when 0"""
+    if CQT_WORKERS > 0:
+        return CQT_WORKERS
+    from parallel_chroma import available_cpus
+    return available_cpus()
+
+def compute_chromagram(audio_source, sr, hop_length, with_onsets=False, timer=None, chroma='cqt', n_fft=None, on_progress=None,
+                       checkpoint=None):
+    """
+    Load audio and extract chroma features (pitch class profiles)
+    `audio_source` is a local path or an s3_stream.S3AudioObject, which is
+    decoded straight from the GetObject body
+    `chroma` is 'cqt' (chroma_cqt) or 'stft' (chroma_stft with `n_fft`)
+    Long CQT tracks are streamed in overlapping blocks to bound peak memory;
+    otherwise the CQT is split across a process pool when there are spare cores
+    Chromagrams are cached by audio content + feature params
+    With `with_onsets`, the onset strength envelope (for beat tracking) is
+    computed alongside on the same frame grid
+    `on_progress(partial chromagram, analyzed seconds, total seconds)` is
+    called as the CQT advances through a long track in time order
+    Streamed tracks resume from / save to `checkpoint` (shorter ones run whole)
+    Returns (chromagram, onset envelope or None, sr, duration)
+    """
+    from feature_cache import cache_key, file_digest, pcm_digest
+    from streaming import iter_audio_blocks
+    
+    timer = timer or NullTimer()
+    cache = get_feature_cache()
+    params = {'sr': sr, 'hopLength': hop_length, 'chroma': chroma, 'onsets': with_onsets}
+    if chroma == 'stft':
+        params['nFft'] = n_fft
+    # Silence gating only runs on a CQT of the whole signal in memory
+    # (chromagram_from_pcm); streamed features never gate and are keyed without it
+    whole_params = params
+    if chroma == 'cqt' and SILENCE_GATING:
+        whole_params = dict(params, gate=[SILENCE_TOP_DB, MIN_SILENCE_SECONDS])
+    
+    def progress_hook(total_seconds):
+        """on_window callback for time-ordered CQT windows; total_seconds(analyzed) gives the track length"""
+        def on_window(chromagram_so_far, end_frame):
+            analyzed = end_frame * hop_length / sr
+            on_progress(chromagram_so_far[:, :end_frame], analyzed, total_seconds(analyzed))
+        return on_window
+    
+    def wants_progress(duration):
+        # Windows only pay off on tracks long enough to report on
+        return on_progress is not None and duration >= 2 * PROGRESS_INTERVAL_SECONDS
+    
+    # STFT chroma is cheap enough in memory (and at its lower rate) to run whole
+    stream_samples = STREAM_THRESHOLD_SECONDS * sr if chroma == 'cqt' else None
+    block_samples = max(1, int(STREAM_BLOCK_SECONDS * sr / hop_length)) * hop_length
+    key = cached = y = blocks = on_window = None
+    
+    if isinstance(audio_source, str):
+        try:
+            track_duration = librosa.get_duration(path=audio_source)
+        except Exception as e:
+            logger.warning(f"Could not read duration up front: {e}")
+            track_duration = 0
+        
+        if stream_samples is not None and track_duration > STREAM_THRESHOLD_SECONDS:
+            # PCM is never held whole when streaming, so key on the source bytes
+            if cache:
+                with timer.span('cacheLookup'):
+                    key = cache_key(file_digest(audio_source), params)
+                    cached = cache.get(key)
+            if cached is None:
+                logger.info(f"Streaming audio file in {STREAM_BLOCK_SECONDS:.0f}s blocks: {audio_source}")
+                blocks = iter_audio_blocks(audio_source, sr, block_samples)
+                if wants_progress(track_duration):
+                    on_window = progress_hook(lambda analyzed: track_duration)
+        else:
+            logger.info(f"Loading audio file: {audio_source}")
+            
+            # Decode straight to mono PCM at the analysis rate (ffmpeg pipe, librosa fallback)
+            with timer.span('decode'):
+                y, sr = load_audio(audio_source, sr=sr)
+    else:
+        # S3 body: the ETag identifies the content without reading it
+        etag = f'etag:{audio_source.etag}'
+        if cache and audio_source.etag:
+            with timer.span('cacheLookup'):
+                if whole_params is params:
+                    cached = cache.get(cache_key(etag, params))
+                else:
+                    # Whether this run would stream (and so not gate) is only known
+                    # once decoded: take an entry made by the path its length implies
+                    for streamed, candidate_params in ((False, whole_params), (True, params)):
+                        hit = cache.get(cache_key(etag, candidate_params))
+                        if hit is not None and (hit[1] > STREAM_THRESHOLD_SECONDS) == streamed:
+                            cached = hit
+                            break
+        if cached is None:
+            logger.info(f"Decoding s3 object as it downloads: {audio_source.key} ({audio_source.size} bytes)")
+            
+            # The length is only known once decoded: hold up to the streaming
+            # threshold in memory, and switch to block streaming past it
+            with timer.span('decode'):
+                head, rest = read_pcm_head(iter_audio_blocks(audio_source.stream, sr, block_samples), stream_samples)
+            if cache and audio_source.etag:
+                key = cache_key(etag, whole_params if rest is None else params)
+            if rest is None:
+                y = np.concatenate(head) if head else np.zeros(0, dtype=np.float32)
+            else:
+                logger.info(f"Longer than {STREAM_THRESHOLD_SECONDS:.0f}s, streaming in {STREAM_BLOCK_SECONDS:.0f}s blocks")
+                decoded = [sum(len(block) for block in head)]
+                
+                def counted(blocks):
+                    for block in blocks:
+                        decoded[0] += len(block)
+                        yield block
+                
+                # The head list is emptied as it is consumed, so its blocks can be
+                # freed once analysed rather than held for the whole stream
+                blocks = drain_head(head, counted(rest))
+                if on_progress is not None and audio_source.size:
+                    # Estimate the length from the share of the body decoded so far
+                    stream = audio_source.stream
+                    on_window = progress_hook(lambda analyzed: decoded[0] / sr * audio_source.size / max(stream.tell(), 1))
+    
+    if cached is not None:
+        chromagram, duration, onset_env = cached
+    elif blocks is not None:
+        # Decode and CQT are interleaved block by block
+        with timer.span('streamingChroma'):
+            chromagram, onset_env, duration = compute_chromagram_streaming(
+                blocks, sr, hop_length, with_onsets, on_window=on_window, checkpoint=checkpoint
+            )
+    else:
+        duration = librosa.get_duration(y=y, sr=sr)
+        logger.info(f"Audio loaded: duration={duration:.2f}s, sample_rate={sr}Hz")
+        
+        if cache and key is None:
+            with timer.span('cacheLookup'):
+                key = cache_key(pcm_digest(y), whole_params)
+                cached = cache.get(key)
+        if cached is not None:
+            chromagram, _, onset_env = cached
+        else:
+            on_window = progress_hook(lambda analyzed: duration) if wants_progress(duration) else None
+            chromagram, onset_env = chromagram_from_pcm(y, sr, hop_length, with_onsets, timer, chroma, n_fft, on_window)
+    
+    if cache:
+        if cached is None:
+            with timer.span('cacheStore'):
+                cache.put(key, chromagram, duration, onset_env)
+        logger.info(f"Feature cache stats: {json.dumps(cache.stats)}")
+    
+    return chromagram, onset_env, sr, duration
+
+def read_pcm_head(blocks, max_samples):
+    """
+    Pull blocks until more than `max_samples` have arrived (None: read everything)
+    Returns (blocks read, the rest of the iterator or None if it ran out)
+    """
+    head = []
+    total = 0
+    for block in blocks:
+        head.append(block)
+        total += len(block)
+        if max_samples is not None and total > max_samples:
+            return head, blocks
+    return head, None
+
+def drain_head(head, rest):
+    """Yield the blocks of `head`, removing each from the list, then those of `rest`"""
+    head.reverse()
+    while head:
+        yield head.pop()
+    yield from rest
+
+def chromagram_from_pcm(y, sr, hop_length, with_onsets, timer, chroma='cqt', n_fft=None, on_window=None):
+    """Chroma (and onset envelope) of an in-memory signal; returns (chromagram, onset or None)"""
+    if chroma == 'stft':
+        with timer.span('chromaStft'):
+            chromagram = librosa.feature.chroma_stft(y=y, sr=sr, hop_length=hop_length, n_fft=n_fft)
+            onset_env = librosa.onset.onset_strength(y=y, sr=sr, hop_length=hop_length) if with_onsets else None
+        return chromagram, onset_env
+    
+    spans = None
+    if SILENCE_GATING:
+        with timer.span('energyGate'):
+            spans = silence_gate_spans(y, sr, hop_length)
+    with timer.span('chromaCqt'):
+        if spans is not None or on_window is not None or cqt_workers() > 1:
+            from parallel_chroma import parallel_chromagram
+            window_frames = int(PROGRESS_INTERVAL_SECONDS * sr / hop_length) if on_window is not None else None
+            return parallel_chromagram(
+                y, sr, hop_length, cqt_workers(), with_onset=with_onsets, spans=spans,
+                window_frames=window_frames, on_window=on_window
+            )
+        chromagram = librosa.feature.chroma_cqt(y=y, sr=sr, hop_length=hop_length)
+        onset_env = librosa.onset.onset_strength(y=y, sr=sr, hop_length=hop_length) if with_onsets else None
+    return chromagram, onset_env
+
+def silence_gate_spans(y, sr, hop_length):
+    """Active frame spans for the CQT, or None when gating would skip (almost) nothing"""
+    from energy_gate import active_spans, gated_fraction
+    from streaming import cqt_context_samples
+    
+    min_gap = int(MIN_SILENCE_SECONDS * sr) + 2 * cqt_context_samples(sr, hop_length)
+    spans = active_spans(y, sr, hop_length, SILENCE_TOP_DB, min_gap)
+    skipped = gated_fraction(spans, 1 + len(y) // hop_length)
+    logger.info(f"Energy gate: {len(spans)} active spans, skipping {skipped:.1%} of frames")
+    return spans if skipped >= 0.01 else None
+
+def compute_chromagram_streaming(blocks, sr, hop_length, with_onsets=False, on_window=None, checkpoint=None):
+    """
+    Extract chroma block by block from an iterator of PCM chunks; only the
+    (small) 12-bin chromagram is kept whole
+    `on_window(chromagram so far, end frame)` is called after each block
+    With a `checkpoint`, a saved run is resumed, and once `interrupt` is set
+    the chroma so far is saved to it at the next block and Interrupted raised
+    Returns (chromagram, onset envelope or None, duration)
+    """
+    from streaming import stream_chromagram
+    
+    block_frames = max(1, int(STREAM_BLOCK_SECONDS * sr / hop_length))
+    
+    chroma_blocks = []
+    onset_blocks = []
+    total_samples = 0
+    resume = checkpoint.load() if checkpoint is not None else None
+    if resume is not None:
+        saved_chroma, saved_onset, resume = resume
+        chroma_blocks.append(saved_chroma)
+        onset_blocks.append(saved_onset)
+        total_samples = resume.total_samples
+    
+    stream = stream_chromagram(blocks, sr, hop_length, block_frames, with_onset=with_onsets, resume=resume)
+    for chroma, onset, total_samples, position in stream:
+        chroma_blocks.append(chroma)
+        onset_blocks.append(onset)
+        if on_window:
+            chromagram = np.concatenate(chroma_blocks, axis=1)
+            on_window(chromagram, chromagram.shape[1])
+        if checkpoint is not None and interrupt.is_set():
+            onset_env = np.concatenate(onset_blocks) if with_onsets else None
+            checkpoint.save(np.concatenate(chroma_blocks, axis=1), onset_env, position)
+            raise Interrupted(f"Stopped at {position.total_samples / sr:.1f}s of audio")
+    
+    duration = total_samples / sr
+    logger.info(f"Audio streamed: duration={duration:.2f}s, sample_rate={sr}Hz, blocks={len(chroma_blocks)}")
+    
+    onset_env = np.concatenate(onset_blocks) if with_onsets else None
+    return np.concatenate(chroma_blocks, axis=1), onset_env, duration
+
+def create_chord_templates(vocabulary=None):
+    """Create chord templates for the configured vocabulary (label -> 12-bin template)"""
+    if (vocabulary or CHORD_VOCABULARY) == 'extended':
+        return create_extended_chord_templates()
+    
     templates = {}
     
     # Major chord template: root, major third, perfect fifth (0, 4, 7 semitones)
@@ -197,115 +1430,272 @@ def create_chord_templates():
     
     return templates
 
-def match_chords_to_templates(chromagram, templates, hop_length, sr):
-    """Match each frame of chromagram to best matching chord template"""
-    chord_sequence = []
+def create_extended_chord_templates():
+    """
+    Weighted templates for every CHORD_QUALITIES type on every root
+    Ordered quality-major (all 12 major triads first, as in the triad
+    vocabulary), so argmax ties still favour the simpler chord
+    """
+    triad_norm = np.sqrt(3.0)
+    templates = {}
+    for suffix, intervals in CHORD_QUALITIES:
+        base = np.zeros(12)
+        for interval, weight in zip(intervals, CHORD_TONE_WEIGHTS):
+            base[interval % 12] = max(base[interval % 12], weight)
+        base *= triad_norm / np.linalg.norm(base)
+        for root in range(12):
+            templates[NOTE_NAMES[root] + suffix] = np.roll(base, root)
+    return templates
+
+def build_template_matrix(templates):
+    """Stack chord templates into a (n_chords, 12) matrix, preserving label order"""
+    labels = list(templates.keys())
+    matrix = np.vstack([templates[label] for label in labels]).astype(np.float32)
+    return labels, matrix
+
+# Template matrices by vocabulary, built on first use and shared by every job
+_template_matrices = {}
+
+def chord_template_matrix(vocabulary=None):
+    """The TemplateMatrix of a vocabulary (default CHORD_VOCABULARY), built once per process"""
+    vocabulary = vocabulary or CHORD_VOCABULARY
+    if vocabulary not in _template_matrices:
+        labels, matrix = build_template_matrix(create_chord_templates(vocabulary))
+        matrix.setflags(write=False)
+        _template_matrices[vocabulary] = TemplateMatrix(labels, matrix)
+    return _template_matrices[vocabulary]
+
+def score_templates(chromagram, template_matrix):
+    """Score every chromagram frame against every template: (n_chords, n_frames)"""
+    # Normalize each frame to unit sum (silent frames stay all-zero)
+    frame_sums = chromagram.sum(axis=0, keepdims=True)
+    normalized = np.divide(chromagram, frame_sums, out=np.zeros_like(chromagram), where=frame_sums > 0)
     
-    for frame_idx in range(chromagram.shape[1]):
-        chroma_frame = chromagram[:, frame_idx]
-        
-        # Normalize chroma frame
-        if np.sum(chroma_frame) > 0:
-            chroma_frame = chroma_frame / np.sum(chroma_frame)
-        
-        # Find best matching chord template
-        best_chord = 'N'
-        best_score = 0
-        
-        for chord_name, template in templates.items():
-            # Compute correlation between chroma frame and template
-            score = np.dot(chroma_frame, template)
-            
-            if score > best_score:
-                best_score = score
-                best_chord = chord_name
-        
-        # Only accept chord if confidence is high enough
-        if best_score < 0.3:
-            best_chord = 'N'
-        
-        # Calculate timestamp
-        time = librosa.frames_to_time(frame_idx, sr=sr, hop_length=hop_length)
-        
-        chord_sequence.append({
-            'time': time,
-            'chord': best_chord,
-            'confidence': best_score
-        })
+    # (n_chords, 12) @ (12, n_frames) -> (n_chords, n_frames)
+    return template_matrix @ normalized
+
+def match_chords_to_templates(chromagram, templates, hop_length, sr, frames=None):
+    """
+    Match each frame of chromagram to best matching chord template
+    `frames` gives the starting frame of each column when the chromagram
+    has been aggregated (e.g. per beat); by default column i is frame i
+    `templates` is a TemplateMatrix, or a label -> template dict to stack here
+    """
+    if not isinstance(templates, TemplateMatrix):
+        templates = TemplateMatrix(*build_template_matrix(templates))
+    labels, template_matrix = templates
+    scores = score_templates(chromagram, template_matrix)
     
-    return chord_sequence
+    # argmax keeps the first template on ties, matching template dict order
+    best_idx = np.argmax(scores, axis=0)
+    best_scores = scores[best_idx, np.arange(scores.shape[1])]
+    
+    # Only accept chord if confidence is high enough
+    chord_idx = np.where(best_scores >= MIN_CHORD_SCORE, best_idx, NO_CHORD)
+    if frames is None:
+        frames = np.arange(chromagram.shape[1])
+    times = librosa.frames_to_time(frames, sr=sr, hop_length=hop_length)
+    
+    return ChordSequence(labels, chord_idx, best_scores, times, scores)
 
-def group_chord_segments(chord_sequence):
-    """Group consecutive same chords into segments"""
-    if not chord_sequence:
-        return []
+def match_chords_per_beat(chromagram, onset_env, templates, hop_length, sr):
+    """
+    Beat-synchronous matching: track beats once, take the median chroma
+    between consecutive beats and match one column per beat
+    Column 0 is the lead-in before the first tracked beat (if any)
+    """
+    n_frames = chromagram.shape[1]
+    tempo, beat_frames = librosa.beat.beat_track(onset_envelope=onset_env, sr=sr, hop_length=hop_length)
     
-    segments = []
-    current_chord = chord_sequence[0]['chord']
-    start_time = chord_sequence[0]['time']
+    # Column boundaries: track start, every beat, track end
+    boundaries = librosa.util.fix_frames(beat_frames, x_min=0, x_max=n_frames)
+    beat_chroma = librosa.util.sync(chromagram, boundaries, aggregate=np.median, pad=False)
     
-    for i in range(1, len(chord_sequence)):
-        chord = chord_sequence[i]['chord']
-        time = chord_sequence[i]['time']
-        
-        if chord != current_chord:
-            # Save previous segment (skip 'N' chords)
-            if current_chord != 'N':
-                segments.append({
-                    'chord': current_chord,
-                    'start': round(start_time, 2),
-                    'end': round(time, 2),
-                    'duration': round(time - start_time, 2)
-                })
-            
-            current_chord = chord
-            start_time = time
-    
-    # Add final segment
-    if current_chord != 'N':
-        end_time = chord_sequence[-1]['time']
-        segments.append({
-            'chord': current_chord,
-            'start': round(start_time, 2),
-            'end': round(end_time, 2),
-            'duration': round(end_time - start_time, 2)
-        })
+    logger.info(f"Beat-synchronous analysis: tempo={float(np.atleast_1d(tempo)[0]):.1f} BPM, "
+                f"{beat_chroma.shape[1]} beats from {n_frames} frames")
+    
+    starts = boundaries[:-1]
+    chord_sequence = match_chords_to_templates(beat_chroma, templates, hop_length, sr, frames=starts)
+    end_time = float(librosa.frames_to_time(boundaries[-1], sr=sr, hop_length=hop_length))
+    
+    return chord_sequence._replace(end_time=end_time, beats=np.arange(len(starts)))
+
+def viterbi_decode(log_emissions, log_self, log_switch, log_initial):
+    """
+    Most likely state path through an HMM, in log space
+    
+    log_emissions: (K, N) per-state log-likelihood of each frame
+    log_self: log P(staying in a state); log_switch: log P(moving to any one
+    other state), the same for every pair
+    log_initial: (K,) log prior of the first state
+    
+    With uniform off-diagonal transitions the best predecessor of state j is
+    either j itself or the best state overall, so each frame is a handful of
+    O(K) vector ops instead of a (K, K) add and column max: O(N*K) time, plus
+    O(N*K) memory for backpointers. The path, ties included, is the one the
+    dense recursion finds (see benchmarks/bench_hmm_smoothing.py).
+    """
+    n_states, n_frames = log_emissions.shape
+    # Frame-major, so each frame's emissions are contiguous
+    emissions = np.ascontiguousarray(log_emissions.T)
+    backpointers = np.empty((n_frames, n_states), dtype=np.int32)
+    state_range = np.arange(n_states)
+    # Only when switching is likelier than staying can the best state be
+    # entered from another one (the runner-up)
+    switch_favoured = log_switch > log_self
+    
+    delta = log_initial + emissions[0]
+    for t in range(1, n_frames):
+        best = delta.argmax()
+        switch = delta[best] + log_switch
+        stay = delta + log_self
+        # Ties go to the lower state index, as the dense argmax would
+        keep = np.where(state_range < best, stay >= switch, stay > switch)
+        prev = np.where(keep, state_range, best)
+        new_delta = np.maximum(stay, switch)
+        if switch_favoured:
+            rest = delta.copy()
+            rest[best] = -np.inf
+            runner_up = rest.argmax()
+            enter = delta[runner_up] + log_switch
+            if enter > stay[best] or (enter == stay[best] and runner_up < best):
+                prev[best], new_delta[best] = runner_up, enter
+            else:
+                new_delta[best] = stay[best]
+        backpointers[t] = prev
+        delta = new_delta
+        delta += emissions[t]
+    
+    path = np.empty(n_frames, dtype=np.int32)
+    path[-1] = np.argmax(delta)
+    for t in range(n_frames - 1, 0, -1):
+        path[t - 1] = backpointers[t, path[t]]
+    return path
+
+def smooth_chord_sequence(chord_sequence, self_transition):
+    """
+    Re-label frames with the Viterbi path over the chord states plus 'N'
+    Emissions are scaled template scores ('N' scores MIN_CHORD_SCORE, so with
+    no transition prior this reduces to argmax + threshold); transitions are a
+    self-loop with probability `self_transition`, the rest spread evenly.
+    """
+    scores = chord_sequence.scores
+    n_chords, n_frames = scores.shape
+    if n_frames == 0:
+        return chord_sequence
+    
+    # Extra last state is 'N'
+    n_states = n_chords + 1
+    log_emissions = HMM_EMISSION_SCALE * np.vstack((scores, np.full((1, n_frames), MIN_CHORD_SCORE, dtype=scores.dtype)))
     
-    return segments
+    switch = (1.0 - self_transition) / (n_states - 1)
+    log_initial = np.full(n_states, -np.log(n_states))
+    
+    path = viterbi_decode(log_emissions, np.log(self_transition), np.log(switch), log_initial)
+    
+    chord_idx = np.where(path == n_chords, NO_CHORD, path)
+    confidence = log_emissions[path, np.arange(n_frames)] / HMM_EMISSION_SCALE
+    return chord_sequence._replace(chord_idx=chord_idx, confidence=confidence)
 
-def detect_key(chord_segments):
-    """Detect musical key based on chord frequency and duration"""
+def group_chord_segments(chord_sequence):
+    """
+    Group consecutive same chords into segments via run-length encoding
+    Each segment ends where the next begins; the last one ends at the final frame
+    """
+    chord_idx = chord_sequence.chord_idx
+    times = chord_sequence.times
     
-    # Count chord occurrences weighted by duration
-    chord_weights = {}
+    if len(chord_idx) == 0:
+        return ChordSegments(chord_sequence.labels, np.array([], dtype=int), np.array([]), np.array([]))
     
-    for segment in chord_segments:
-        chord = segment['chord']
-        if chord != 'N':
-            # Remove minor suffix for root note
-            root = chord.replace('m', '')
-            duration = segment['duration']
-            chord_weights[root] = chord_weights.get(root, 0) + duration
+    # Column index where each run starts
+    run_starts = np.concatenate(([0], np.flatnonzero(np.diff(chord_idx)) + 1))
+    run_ends = np.append(run_starts[1:], len(chord_idx) - 1)
     
-    if not chord_weights:
-        return 'C'  # Default
+    # Skip 'N' runs
+    keep = chord_idx[run_starts] != NO_CHORD
     
-    # Most common root is likely the key
-    key = max(chord_weights, key=chord_weights.get)
+    end = times[run_ends]
+    if chord_sequence.end_time is not None:
+        end = end.copy()
+        end[-1] = chord_sequence.end_time
     
-    # Check if it's minor key (if minor chords dominate)
-    minor_duration = sum(s['duration'] for s in chord_segments if 'm' in s['chord'])
-    major_duration = sum(s['duration'] for s in chord_segments if s['chord'] != 'N' and 'm' not in s['chord'])
+    beat = chord_sequence.beats[run_starts][keep] if chord_sequence.beats is not None else None
     
-    if minor_duration > major_duration:
-        key += 'm'
+    return ChordSegments(
+        chord_sequence.labels,
+        chord_idx[run_starts][keep],
+        times[run_starts][keep],
+        end[keep],
+        beat
+    )
+
+def filter_short_segments(segments, min_duration):
+    """Drop segments whose (rounded) duration is below min_duration"""
+    durations = np.round(segments.end - segments.start, 2)
+    keep = durations >= min_duration
+    return segments._replace(
+        chord_idx=segments.chord_idx[keep],
+        start=segments.start[keep],
+        end=segments.end[keep],
+        beat=segments.beat[keep] if segments.beat is not None else None
+    )
+
+def segments_to_dicts(segments):
+    """
+    Materialize segment arrays as the {chord,start,end,duration} dicts stored in DynamoDB
+    Beat-synchronous segments also carry the `beat` index they start on
+    """
+    chord_segments = []
+    for idx, start, end in zip(segments.chord_idx.tolist(), segments.start.tolist(), segments.end.tolist()):
+        chord_segments.append({
+            'chord': segments.labels[idx],
+            'start': round(start, 2),
+            'end': round(end, 2),
+            'duration': round(end - start, 2)
+        })
+    if segments.beat is not None:
+        for segment, beat in zip(chord_segments, segments.beat.tolist()):
+            segment['beat'] = beat
+    return chord_segments
+
+def build_key_profiles():
+    """
+    The 24 Krumhansl-Kessler profiles rotated to every tonic, standardized
+    (zero mean, unit variance) so one matrix product gives Pearson correlations
+    Returns (key labels, (24, 12) matrix): the 12 major keys, then the 12 minor
+    """
+    labels = NOTE_NAMES + [note + 'm' for note in NOTE_NAMES]
+    rows = [np.roll(profile, tonic) for profile in (MAJOR_KEY_PROFILE, MINOR_KEY_PROFILE) for tonic in range(12)]
+    matrix = np.array(rows)
+    matrix = (matrix - matrix.mean(axis=1, keepdims=True)) / matrix.std(axis=1, keepdims=True)
+    return labels, matrix
+
+KEY_LABELS, KEY_PROFILE_MATRIX = build_key_profiles()
+
+def detect_key(chromagram):
+    """
+    Estimate the key from the chroma energy of the whole track
+    (Krumhansl-Schmuckler): the duration-summed chromagram is correlated
+    with all 24 key profiles at once, so the cost doesn't grow with the
+    number of chord segments
+    Returns (key, confidence, runner-up key, runner-up confidence), the
+    confidences being Pearson correlations; silence gives ('C', 0.0, None, 0.0)
+    """
+    pitch_classes = chromagram.sum(axis=1, dtype=np.float64)
+    spread = pitch_classes.std()
+    if not spread > 0:
+        return 'C', 0.0, None, 0.0
     
-    return key
+    # (24, 12) @ (12,) -> correlation with every key
+    correlations = KEY_PROFILE_MATRIX @ ((pitch_classes - pitch_classes.mean()) / spread) / 12
+    runner_up, best = np.argsort(correlations)[-2:]
+    return KEY_LABELS[best], float(correlations[best]), KEY_LABELS[runner_up], float(correlations[runner_up])
 
 def update_job_status(job_id, status, progress, error=None):
     """Update job status in DynamoDB"""
     try:
-        table = dynamodb.Table(JOBS_TABLE)
+        table = get_dynamodb().Table(JOBS_TABLE)
         update_expr = 'SET #status = :status, progress = :progress, updatedAt = :updated'
         expr_values = {
             ':status': status,
@@ -0,0 +1,137 @@
+"""
+Benchmark: a batch of jobs in one task, back to back vs pipelined
+
+Runs the same synthetic jobs through (stand-in) S3 and DynamoDB twice:
+  sequential  process_job per job, as a worker or one task per job would
+  batch       run_batch: claims, fetches and result writes on threads, the
+              analysis on a process pool, fetching ahead of the DSP
+One job's audio is corrupt, to check it alone ends FAILED in both runs.
+S3 reads are throttled (--bandwidth, --latency) and every DynamoDB call
+waits --db-latency, so the I/O overlap shows up in the timings; with more
+cores the process pool adds to it.
+
+Usage: python benchmarks/bench_batch.py [--jobs 8] [--duration 60] [--bandwidth 4] [--workers 0]
+Exits 1 if the two runs disagree on any job's outcome or chords.
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+
+BUCKET = 'audio-bucket'
+# Rotated per job so the tracks differ
+PROGRESSION = ['C', 'Am', 'F', 'G']
+
+class StandinTable:
+    """
+    Stand-in for a boto3 DynamoDB Table (and its resource): no stored
+    items, so every job is new; records the status each job was last set to
+    """
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.status = {}
+        self.chords = {}
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def Table(self, name):
+        return self
+
+    def get_item(self, **kwargs):
+        time.sleep(self.latency)
+        with self._lock:
+            self.calls += 1
+        return {}
+
+    def update_item(self, Key, ExpressionAttributeValues=None, **kwargs):
+        time.sleep(self.latency)
+        values = ExpressionAttributeValues or {}
+        with self._lock:
+            self.calls += 1
+            if ':status' in values:
+                self.status[Key['jobId']] = values[':status']
+            for name in (':chordsBin', ':chordsData'):
+                if name in values:
+                    self.chords[Key['jobId']] = values[name]
+        return {}
+
+def run(label, jobs, root, args, batch):
+    """Process `jobs` one way; returns ({jobId: status}, {jobId: stored chords}, seconds)"""
+    import app
+    from s3_standin import LocalS3
+
+    table = StandinTable(args.db_latency / 1000)
+    app.s3_client = LocalS3(root, bandwidth=args.bandwidth * 1024 * 1024, first_byte_latency=args.latency / 1000)
+    app.dynamodb = table
+    app.hot_audio = None
+
+    start = time.perf_counter()
+    if batch:
+        app.run_batch(jobs)
+    else:
+        for job in jobs:
+            try:
+                app.process_job(job['jobId'], job['bucket'], job['key'], job['profile'])
+            except Exception:
+                pass
+    seconds = time.perf_counter() - start
+    done = sum(1 for status in table.status.values() if status == 'CHORDS_DETECTED')
+    print(f"{label:>10}: {seconds:7.2f}s, {done}/{len(jobs)} done, "
+          f"{60 * done / seconds:6.1f} jobs/min, {args.duration * done / seconds:6.1f} audio s/s, "
+          f"{table.calls} DynamoDB calls")
+    return table.status, table.chords, seconds
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--jobs', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=60.0, help='Seconds of audio per job')
+    parser.add_argument('--bandwidth', type=float, default=4.0, help='S3 MB/s per connection')
+    parser.add_argument('--latency', type=float, default=30.0, help='S3 first-byte latency, ms')
+    parser.add_argument('--db-latency', type=float, default=15.0, help='DynamoDB call latency, ms')
+    parser.add_argument('--workers', type=int, default=0, help='BATCH_DSP_WORKERS (0 = one per core)')
+    args = parser.parse_args()
+
+    os.environ.update(PROGRESS_UPDATES='false', WARMUP_ON_START='false', CHECKPOINTS='false',
+                      BATCH_DSP_WORKERS=str(args.workers))
+
+    import numpy as np
+    from synth import synth_progression, write_wav
+    import app
+
+    with tempfile.TemporaryDirectory() as root:
+        os.makedirs(os.path.join(root, BUCKET))
+        jobs = []
+        for i in range(args.jobs):
+            key = f'track-{i}.wav'
+            if i == 1:
+                # Not audio: this job must fail on its own
+                with open(os.path.join(root, BUCKET, key), 'wb') as f:
+                    f.write(np.random.default_rng(i).bytes(4096))
+            else:
+                progression = PROGRESSION[i % 4:] + PROGRESSION[:i % 4]
+                y, _ = synth_progression(args.duration, sr=44100, progression=progression)
+                write_wav(os.path.join(root, BUCKET, key), y, 44100)
+            jobs.append({'jobId': f'batch-bench-{i}', 'bucket': BUCKET, 'key': key, 'profile': None})
+
+        # Compile librosa's kernels before timing either run
+        from warmup import warm_up
+        warm_up(app, [app.ANALYSIS_PROFILE])
+
+        print(f"{args.jobs} jobs x {args.duration:.0f}s audio, S3 {args.bandwidth:g} MB/s + {args.latency:g} ms, "
+              f"DynamoDB {args.db_latency:g} ms, {app.BATCH_DSP_WORKERS or 'all'} DSP workers")
+        sequential_status, sequential_chords, sequential_seconds = run('sequential', jobs, root, args, batch=False)
+        batch_status, batch_chords, batch_seconds = run('batch', jobs, root, args, batch=True)
+        print(f"speed-up: {sequential_seconds / batch_seconds:.2f}x")
+
+        same = sequential_status == batch_status and sequential_chords == batch_chords
+        print(f"statuses: {json.dumps(batch_status)}")
+        print(f"identical outcomes and chords: {same}")
+        sys.exit(0 if same else 1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+"""
+Benchmark: frame-level vs beat-synchronous chord matching
+
+Reports matching workload (columns scored), stage times, segment counts and
+time-weighted accuracy against the synthesized chord progression.
+
+Usage: python benchmarks/bench_beat_sync.py [--duration 300] [--bpm 120]
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from synth import label_accuracy, synth_progression
+
+import app
+
+def segments_for(sequence):
+    segments = app.filter_short_segments(app.group_chord_segments(sequence), app.MIN_SEGMENT_DURATION)
+    return app.segments_to_dicts(segments)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--duration', type=float, default=300.0)
+    parser.add_argument('--bpm', type=float, default=120.0, help='tempo; chords change every 4 beats')
+    args = parser.parse_args()
+    
+    sr, hop_length = app.SAMPLE_RATE, app.HOP_LENGTH
+    beat = 60.0 / args.bpm
+    y, reference = synth_progression(args.duration, sr=sr, chord_duration=4 * beat, note_duration=beat)
+    
+    chromagram = app.librosa.feature.chroma_cqt(y=y, sr=sr, hop_length=hop_length)
+    onset_env = app.librosa.onset.onset_strength(y=y, sr=sr, hop_length=hop_length)
+    templates = app.create_chord_templates()
+    
+    start = time.perf_counter()
+    frame_sequence = app.match_chords_to_templates(chromagram, templates, hop_length, sr)
+    frame_chords = segments_for(frame_sequence)
+    frame_time = time.perf_counter() - start
+    
+    # First call pays numba JIT compilation; keep it out of the timings
+    app.librosa.beat.beat_track(onset_envelope=onset_env[:1000], sr=sr, hop_length=hop_length)
+    
+    start = time.perf_counter()
+    app.librosa.beat.beat_track(onset_envelope=onset_env, sr=sr, hop_length=hop_length)
+    tracking_time = time.perf_counter() - start
+    
+    start = time.perf_counter()
+    beat_sequence = app.match_chords_per_beat(chromagram, onset_env, templates, hop_length, sr)
+    beat_chords = segments_for(beat_sequence)
+    beat_time = time.perf_counter() - start - tracking_time
+    
+    n_frames, n_beats = len(frame_sequence.chord_idx), len(beat_sequence.chord_idx)
+    print(f"columns scored: {n_frames} frames vs {n_beats} beats ({n_frames / n_beats:.0f}x fewer)")
+    print(f"frame mode: {frame_time * 1000:7.1f} ms, {len(frame_chords)} segments, "
+          f"accuracy {label_accuracy(frame_chords, reference, args.duration):.1%}")
+    print(f"beat mode:  {beat_time * 1000:7.1f} ms + {tracking_time * 1000:.0f} ms beat tracking, {len(beat_chords)} segments, "
+          f"accuracy {label_accuracy(beat_chords, reference, args.duration):.1%}")
+    
+    # How far chord boundaries sit from the true (on-beat) changes
+    true_changes = np.array([seg['start'] for seg in reference[1:]])
+    for name, chords in (('frame', frame_chords), ('beat', beat_chords)):
+        starts = np.array([seg['start'] for seg in chords[1:]])
+        if len(starts):
+            err = np.abs(starts[:, None] - true_changes[None, :]).min(axis=1)
+            print(f"{name} boundary error: median {np.median(err) * 1000:.0f} ms")
+
+if __name__ == '__main__':
+    main()
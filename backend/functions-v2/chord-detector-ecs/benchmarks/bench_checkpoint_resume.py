@@ -0,0 +1,140 @@
+"""
+Benchmark: SIGTERM checkpoint and resume of a streamed chord analysis
+
+Runs detect_chords on a long synthetic track in child processes, the way a
+Fargate Spot task would see it:
+  reference    one uninterrupted run
+  interrupted  SIGTERM part-way through the CQT; the child saves a checkpoint
+               to (stand-in) S3 and exits
+  resumed      a fresh process picks the checkpoint up and finishes
+Checks the resumed chords and chromagram are identical to the reference and
+reports how much analysis the resume skipped. STREAM_THRESHOLD_SECONDS and
+STREAM_BLOCK_SECONDS are lowered so a few minutes of audio streams in blocks.
+
+Usage: python benchmarks/bench_checkpoint_resume.py [--duration 300] [--kill-at 0.6] [--mode frame|beat]
+Exits 1 if the resumed output differs.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_DIR = os.path.dirname(BENCH_DIR)
+
+BUCKET = 'audio-bucket'
+KEY = 'track.wav'
+JOB_ID = 'checkpoint-bench'
+
+# Exit code of a child stopped at a checkpoint
+EXIT_INTERRUPTED = 3
+
+def child(root):
+    """One task run: prints 'ready', then the outcome as JSON"""
+    import synth  # noqa: F401 (puts the task modules on sys.path)
+    import app
+    from checkpoint import INTERRUPTED, Interrupted, JobCheckpoint
+    from s3_standin import LocalS3
+
+    s3 = LocalS3(root)
+    etag = s3.head_object(Bucket=BUCKET, Key=KEY)['ETag'].strip('"')
+    # Same identity process_job uses
+    checkpoint = JobCheckpoint(s3, BUCKET, JOB_ID, {
+        'etag': etag, 'engine': app.engine_version(), 'streamBlockSeconds': app.STREAM_BLOCK_SECONDS
+    })
+
+    digests = {}
+    compute_chromagram = app.compute_chromagram
+
+    def digesting(*args, **kwargs):
+        chromagram, onset_env, sr, duration = compute_chromagram(*args, **kwargs)
+        digests['chromagram'] = hashlib.sha256(chromagram.tobytes()).hexdigest()
+        digests['onset'] = hashlib.sha256(onset_env.tobytes()).hexdigest() if onset_env is not None else None
+        return chromagram, onset_env, sr, duration
+
+    app.compute_chromagram = digesting
+    signal.signal(signal.SIGTERM, app.request_interrupt)
+    print('ready', flush=True)
+
+    start = time.perf_counter()
+    try:
+        result = app.detect_chords(os.path.join(root, BUCKET, KEY), checkpoint=checkpoint)
+    except Interrupted as e:
+        print(json.dumps({'outcome': INTERRUPTED, 'seconds': time.perf_counter() - start, 'detail': str(e)}), flush=True)
+        sys.exit(EXIT_INTERRUPTED)
+    print(json.dumps({
+        'outcome': 'done', 'seconds': time.perf_counter() - start, 'resumed': checkpoint.found,
+        'chords': result, **digests
+    }), flush=True)
+
+def run_child(root, env, kill_after=None):
+    """Start a child; SIGTERM it `kill_after` seconds into the analysis. Returns (exit code, outcome)"""
+    proc = subprocess.Popen(
+        [sys.executable, os.path.abspath(__file__), '--child', root],
+        cwd=APP_DIR, env=env, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True
+    )
+    assert proc.stdout.readline().strip() == 'ready'
+    if kill_after is not None:
+        time.sleep(kill_after)
+        proc.send_signal(signal.SIGTERM)
+    out = proc.stdout.read()
+    proc.wait()
+    return proc.returncode, json.loads(out.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--duration', type=float, default=300.0)
+    parser.add_argument('--kill-at', type=float, default=0.6, help='Fraction of the reference analysis time')
+    parser.add_argument('--mode', choices=['frame', 'beat'], default='frame')
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child)
+        return
+
+    import numpy as np
+    from synth import synth_progression, write_wav
+
+    with tempfile.TemporaryDirectory() as root:
+        y, _ = synth_progression(args.duration, sr=44100)
+        # A little noise so no two blocks are alike
+        y = y + 0.01 * np.random.default_rng(0).standard_normal(len(y)).astype(np.float32)
+        os.makedirs(os.path.join(root, BUCKET))
+        write_wav(os.path.join(root, BUCKET, KEY), y, 44100)
+        checkpoint_path = os.path.join(root, BUCKET, 'checkpoints', f'{JOB_ID}.npz')
+
+        env = dict(os.environ, STREAM_THRESHOLD_SECONDS='60', STREAM_BLOCK_SECONDS='20', ANALYSIS_MODE=args.mode,
+                   FEATURE_CACHE_ENABLED='false', PROGRESS_UPDATES='false')
+
+        code, reference = run_child(root, env)
+        assert code == 0 and not reference['resumed'], reference
+        print(f"reference:   {reference['seconds']:.2f}s, {reference['chords']['totalChords']} chords")
+
+        kill_after = args.kill_at * reference['seconds']
+        code, interrupted = run_child(root, env, kill_after=kill_after)
+        if code != EXIT_INTERRUPTED:
+            print(f"FAIL: run was not interrupted (exit {code}: {interrupted['outcome']}); try a smaller --kill-at")
+            sys.exit(1)
+        size = os.path.getsize(checkpoint_path)
+        print(f"interrupted: SIGTERM at {kill_after:.2f}s, stopped at {interrupted['seconds']:.2f}s "
+              f"({interrupted['detail']}), checkpoint {size / 1024:.0f} KB")
+
+        code, resumed = run_child(root, env)
+        assert code == 0 and resumed['resumed'], resumed
+        print(f"resumed:     {resumed['seconds']:.2f}s "
+              f"({1 - resumed['seconds'] / reference['seconds']:.0%} less than starting over)")
+
+        same_chords = resumed['chords'] == reference['chords']
+        same_chroma = resumed['chromagram'] == reference['chromagram'] and resumed['onset'] == reference['onset']
+        print(f"identical chords: {same_chords}, identical chromagram: {same_chroma}")
+        sys.exit(0 if same_chords and same_chroma else 1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+"""
+Benchmark: chordsData as nested DynamoDB maps vs the compact binary codec
+
+Builds chord timelines for 3-minute and 60-minute tracks (a chord every
+0.5-2 s, extended vocabulary, optional per-segment confidence) and compares:
+  map     convert_to_decimal + boto3's TypeSerializer (what Table.update_item
+          does before sending) and the DynamoDB item size it produces
+  binary  chord_codec.encode_chords, and decode_chords for the API side
+Write units are DynamoDB's 1 KB per WCU; items are capped at 400 KB.
+
+Usage: python benchmarks/bench_chords_codec.py [--minutes 3 60] [--repeat 5]
+"""
+
+import argparse
+import math
+import time
+from decimal import Decimal
+
+import numpy as np
+from boto3.dynamodb.types import Binary, TypeSerializer
+
+import synth  # noqa: F401 (puts the task modules on sys.path)
+
+import app
+from chord_codec import decode_chords, encode_chords
+
+ITEM_LIMIT_BYTES = 400 * 1024
+
+def chord_timeline(minutes, confidence, seed=0):
+    """chordsData shaped like detect_chords output"""
+    rng = np.random.default_rng(seed)
+    labels = [f'{root}{suffix}' for suffix, _ in app.CHORD_QUALITIES for root in app.NOTE_NAMES]
+    segments = []
+    t = 0.0
+    while t < minutes * 60:
+        end = round(min(minutes * 60, t + rng.uniform(0.5, 2.0)), 2)
+        segment = {'chord': labels[rng.integers(len(labels))], 'start': t, 'end': end, 'duration': round(end - t, 2)}
+        if confidence:
+            segment['confidence'] = round(float(rng.uniform(0.3, 1.0)), 3)
+        segments.append(segment)
+        t = end
+    return {
+        'chords': segments, 'key': 'C major', 'model': 'librosa-chromagram-balanced-extended',
+        'totalChords': len(segments), 'duration': round(t, 2)
+    }
+
+def dynamodb_size(value):
+    """Approximate DynamoDB attribute value size (AWS item size rules)"""
+    if isinstance(value, str):
+        return len(value.encode())
+    if isinstance(value, (bytes, bytearray, Binary)):
+        return len(bytes(value))
+    if isinstance(value, bool) or value is None:
+        return 1
+    if isinstance(value, (int, Decimal)):
+        digits = len(str(abs(value)).replace('.', '').lstrip('0')) or 1
+        return 1 + math.ceil(digits / 2)
+    if isinstance(value, dict):
+        return 3 + sum(len(k.encode()) + 1 + dynamodb_size(v) for k, v in value.items())
+    if isinstance(value, list):
+        return 3 + sum(1 + dynamodb_size(v) for v in value)
+    raise TypeError(type(value))
+
+def best_of(fn, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return result, best
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--minutes', type=float, nargs='+', default=[3.0, 60.0])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    serializer = TypeSerializer()
+    print(f"{'track':>6} {'conf':>5} {'segments':>8} {'encoding':>8} {'bytes':>9} {'WCU':>5} {'<400KB':>7} "
+          f"{'encode ms':>10} {'decode ms':>10}")
+    for minutes in args.minutes:
+        for confidence in (False, True):
+            chords_data = chord_timeline(minutes, confidence)
+            n = len(chords_data['chords'])
+
+            def to_map():
+                return serializer.serialize(app.convert_to_decimal(chords_data))
+
+            _, map_encode = best_of(to_map, args.repeat)
+            map_bytes = dynamodb_size(app.convert_to_decimal(chords_data)) + len('chordsData')
+
+            blob, bin_encode = best_of(lambda: encode_chords(chords_data), args.repeat)
+            decoded, bin_decode = best_of(lambda: decode_chords(blob), args.repeat)
+            bin_bytes = len(blob) + len('chordsBin')
+
+            # Round trip holds to the millisecond
+            for original, restored in zip(chords_data['chords'], decoded['chords']):
+                assert original['chord'] == restored['chord']
+                assert abs(original['start'] - restored['start']) < 1e-3 and abs(original['end'] - restored['end']) < 1e-3
+                if confidence:
+                    assert abs(original['confidence'] - restored['confidence']) <= 0.5 / 255 + 1e-3
+
+            label = f'{minutes:.0f}m'
+            conf = 'yes' if confidence else 'no'
+            for encoding, size, encode_s, decode_s in (('map', map_bytes, map_encode, None), ('binary', bin_bytes, bin_encode, bin_decode)):
+                decode_ms = f'{decode_s * 1000:>10.2f}' if decode_s is not None else f"{'-':>10}"
+                fits = 'yes' if size <= ITEM_LIMIT_BYTES else 'NO'
+                print(f"{label:>6} {conf:>5} {n:>8} {encoding:>8} {size:>9} {math.ceil(size / 1024):>5} {fits:>7} "
+                      f"{encode_s * 1000:>10.2f} {decode_ms}")
+
+if __name__ == '__main__':
+    main()
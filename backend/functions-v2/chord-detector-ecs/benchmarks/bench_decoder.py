@@ -0,0 +1,78 @@
+"""
+Benchmark: librosa.load vs the ffmpeg-pipe decoder on mp3/m4a/webm
+
+Encodes a synthetic track into the formats the youtube-downloader variants
+produce (requires ffmpeg), then decodes each with both paths and compares
+wall time and frame-level chord labels.
+
+Usage: python benchmarks/bench_decoder.py [--duration 180]
+"""
+
+import argparse
+import os
+import subprocess
+import tempfile
+import time
+
+import numpy as np
+
+from synth import synth_progression, write_wav
+
+import app
+import audio_decoder
+
+FORMATS = {
+    'mp3': ['-c:a', 'libmp3lame', '-b:a', '192k'],
+    'm4a': ['-c:a', 'aac', '-b:a', '128k'],
+    'webm': ['-c:a', 'libopus', '-b:a', '128k'],
+}
+
+def encode(wav_path, fmt, out_dir):
+    out_path = os.path.join(out_dir, f'track.{fmt}')
+    subprocess.run(
+        [audio_decoder.ffmpeg_binary(), '-y', '-loglevel', 'error', '-i', wav_path, *FORMATS[fmt], out_path],
+        check=True
+    )
+    return out_path
+
+def frame_labels(y, sr):
+    chromagram = app.librosa.feature.chroma_cqt(y=y, sr=sr, hop_length=app.HOP_LENGTH)
+    sequence = app.match_chords_to_templates(chromagram, app.create_chord_templates(), app.HOP_LENGTH, sr)
+    return sequence.chord_idx
+
+def timed(fn, repeats):
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--duration', type=float, default=180.0)
+    parser.add_argument('--repeats', type=int, default=3)
+    args = parser.parse_args()
+    
+    if not audio_decoder.ffmpeg_binary():
+        raise SystemExit("ffmpeg is required to encode the benchmark inputs")
+    
+    sr = app.SAMPLE_RATE
+    y, _ = synth_progression(args.duration, sr=44100)
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        wav_path = write_wav(os.path.join(tmp, 'track.wav'), y, 44100)
+        print(f"{'format':>6} {'librosa.load':>13} {'ffmpeg pipe':>12} {'speedup':>8}  label agreement")
+        for fmt in FORMATS:
+            path = encode(wav_path, fmt, tmp)
+            librosa_time, (y_ref, _) = timed(lambda: app.librosa.load(path, sr=sr), args.repeats)
+            ffmpeg_time, (y_new, _) = timed(lambda: audio_decoder.load_audio(path, sr=sr), args.repeats)
+            
+            ref, new = frame_labels(y_ref, sr), frame_labels(y_new, sr)
+            n = min(len(ref), len(new))
+            agreement = np.mean(ref[:n] == new[:n])
+            print(f"{fmt:>6} {librosa_time:>12.2f}s {ffmpeg_time:>11.2f}s {librosa_time / ffmpeg_time:>7.1f}x  "
+                  f"{agreement:.1%} ({len(y_ref)} vs {len(y_new)} samples)")
+
+if __name__ == '__main__':
+    main()
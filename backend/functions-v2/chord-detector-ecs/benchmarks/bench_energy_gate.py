@@ -0,0 +1,60 @@
+"""
+Benchmark: chroma extraction with and without the energy gate
+
+Builds a track of music with silent stretches (intro, outro and gaps in
+between, `--silence` of the total), then times compute_chromagram with
+SILENCE_GATING off and on and checks that the chord labels agree.
+
+Usage: python benchmarks/bench_energy_gate.py [--duration 600] [--silence 0.3 0.5]
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from synth import label_accuracy, synth_progression, write_wav
+
+import app
+
+def track_with_silence(duration, sr, silence, n_gaps=4):
+    """`duration` seconds where `silence` of the time is split into intro, outro and gaps"""
+    music_seconds = duration * (1 - silence)
+    y, _ = synth_progression(music_seconds, sr=sr)
+    gap = np.zeros(int(duration * silence / (n_gaps + 2) * sr), dtype=np.float32)
+    pieces = [gap]
+    for part in np.array_split(y, n_gaps + 1):
+        pieces += [part, gap]
+    return np.concatenate(pieces)
+
+def run(path, gated):
+    app.SILENCE_GATING = gated
+    start = time.process_time()
+    result = app.detect_chords(path)
+    return result, time.process_time() - start
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--duration', type=float, default=600.0)
+    parser.add_argument('--silence', type=float, nargs='+', default=[0.1, 0.3, 0.5])
+    args = parser.parse_args()
+
+    sr = app.SAMPLE_RATE
+    with tempfile.TemporaryDirectory() as tmp:
+        warmup = write_wav(os.path.join(tmp, 'warmup.wav'), track_with_silence(30, sr, 0.5), sr)
+        run(warmup, False)
+        run(warmup, True)
+
+        print(f"track: {args.duration:.0f}s")
+        print(f"{'silence':>8} {'ungated s':>10} {'gated s':>8} {'speedup':>8} {'label agreement':>16}")
+        for silence in args.silence:
+            path = write_wav(os.path.join(tmp, 'track.wav'), track_with_silence(args.duration, sr, silence), sr)
+            full, full_time = run(path, False)
+            gated, gated_time = run(path, True)
+            agreement = label_accuracy(gated['chords'], full['chords'], full['duration'])
+            print(f"{silence:>7.0%} {full_time:>10.2f} {gated_time:>8.2f} {full_time / gated_time:>7.2f}x {agreement:>16.3f}")
+
+if __name__ == '__main__':
+    main()
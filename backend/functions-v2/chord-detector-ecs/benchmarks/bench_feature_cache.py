@@ -0,0 +1,45 @@
+"""
+Benchmark: chord detection with a cold vs warm chromagram cache
+
+Usage: python benchmarks/bench_feature_cache.py [--duration 180]
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+from synth import synth_progression, write_wav
+
+import app
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--duration', type=float, default=180.0)
+    args = parser.parse_args()
+    
+    y, _ = synth_progression(args.duration, sr=44100)
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        path = write_wav(os.path.join(tmp, 'track.wav'), y, 44100)
+        app.FEATURE_CACHE_ENABLED = True
+        app.FEATURE_CACHE_DIR = os.path.join(tmp, 'cache')
+        app.FEATURE_CACHE_BUCKET = ''
+        app.feature_cache = None
+        
+        timings = []
+        results = []
+        for label in ('miss', 'hit'):
+            start = time.perf_counter()
+            results.append(app.detect_chords(path))
+            timings.append(time.perf_counter() - start)
+            print(f"{label}: {timings[-1]:.2f}s")
+        
+        entry_bytes = sum(os.path.getsize(os.path.join(app.FEATURE_CACHE_DIR, f))
+                          for f in os.listdir(app.FEATURE_CACHE_DIR))
+        print(f"speedup on hit: {timings[0] / timings[1]:.1f}x, entry size: {entry_bytes / 1024:.0f} KB")
+        print(f"same chords: {results[0]['chords'] == results[1]['chords']}")
+        print(f"stats: {app.feature_cache.stats}")
+
+if __name__ == '__main__':
+    main()
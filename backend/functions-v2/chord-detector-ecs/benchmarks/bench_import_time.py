@@ -0,0 +1,96 @@
+"""
+Benchmark: import-time budget for the Python chord handlers
+
+Imports each handler module in a fresh interpreter under `python -X importtime`
+(best of --repeat runs) and fails when its cumulative import time is over
+budget, or when a module that should load on first use (boto3, TensorFlow,
+librosa's scipy/numba kernels) is imported eagerly again. A bad request
+should not pay for any of them.
+
+Usage: python benchmarks/bench_import_time.py [--repeat 5] [--budget chord-detector-ml=50]
+Exits 1 on a regression, so it can gate CI.
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FUNCTIONS_DIR = os.path.dirname(os.path.dirname(APP_DIR))
+
+# Handler: (directory, module, budget ms, modules that must not load at import)
+HANDLERS = {
+    'chord-detector-ecs': (APP_DIR, 'app', 250, ('boto3', 'botocore', 'scipy', 'numba')),
+    'chord-detector-ml': (os.path.join(FUNCTIONS_DIR, 'functions', 'chord-detector-ml'), 'handler', 50,
+                          ('boto3', 'botocore', 'basic_pitch', 'tensorflow', 'numpy')),
+    'chord-detector-madmom': (os.path.join(FUNCTIONS_DIR, 'functions-v2', 'chord-detector-madmom'), 'handler', 150,
+                              ('boto3', 'botocore', 'librosa')),
+}
+
+# Environment the handlers read at import time; the modules shared/sync.sh
+# copies into a handler are found in shared/ when they haven't been synced
+HANDLER_ENV = {'DYNAMODB_JOBS_TABLE': 'benchmark-jobs', 'AWS_DEFAULT_REGION': 'us-east-1', 'WARMUP_ON_START': 'false',
+               'PYTHONPATH': os.path.join(FUNCTIONS_DIR, 'functions-v2', 'shared')}
+
+def import_profile(directory, module):
+    """One fresh-interpreter import: (cumulative us, {module: cumulative us} for the modules it imported)"""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=directory, env=dict(os.environ, **HANDLER_ENV), capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed in {directory}:\n{result.stderr[-2000:]}")
+
+    imported = {}
+    total = None
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = (part.strip() for part in line[len('import time:'):].split('|'))
+        imported[name] = int(cumulative)
+        if name == module:
+            total = int(cumulative)
+    return total, imported
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--budget', action='append', default=[], metavar='HANDLER=MS', help='Override a budget')
+    parser.add_argument('--top', type=int, default=5, help='Heaviest imports to list per handler')
+    args = parser.parse_args()
+
+    budgets = {name: budget for name, (_, _, budget, _) in HANDLERS.items()}
+    for override in args.budget:
+        name, ms = override.split('=')
+        budgets[name] = float(ms)
+
+    failures = []
+    for name, (directory, module, _, deferred) in HANDLERS.items():
+        try:
+            runs = [import_profile(directory, module) for _ in range(args.repeat)]
+        except RuntimeError as e:
+            print(f"{name}: FAIL")
+            failures.append(str(e))
+            continue
+        total, imported = min(runs, key=lambda run: run[0])
+        total_ms = total / 1000
+        eager = sorted({root for root in deferred for run in runs
+                        if any(mod == root or mod.startswith(root + '.') for mod in run[1])})
+
+        ok = total_ms <= budgets[name] and not eager
+        print(f"{name}: import {module} {total_ms:.1f} ms (budget {budgets[name]:.0f} ms) {'ok' if ok else 'FAIL'}")
+        heaviest = sorted(((us, mod) for mod, us in imported.items() if mod != module and '.' not in mod), reverse=True)
+        for us, mod in heaviest[:args.top]:
+            print(f"    {mod:<24} {us / 1000:>7.1f} ms")
+        if total_ms > budgets[name]:
+            failures.append(f"{name} imports in {total_ms:.1f} ms, over its {budgets[name]:.0f} ms budget")
+        if eager:
+            failures.append(f"{name} imports {', '.join(eager)} at import time; they should load on first use")
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+if __name__ == '__main__':
+    main()
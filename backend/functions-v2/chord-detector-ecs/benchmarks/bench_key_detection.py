@@ -0,0 +1,96 @@
+"""
+Benchmark: chord-duration key guess vs Krumhansl profiles on the chromagram
+
+Accuracy over all 24 keys (a diatonic progression rendered in each, with
+the chord segments detect_chords finds for it), then the cost of each
+detector as the number of chord segments grows.
+
+Usage: python benchmarks/bench_key_detection.py [--duration 40]
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from synth import chord_root, synth_progression
+
+import app
+
+# Scale degrees (semitones above the tonic, chord suffix) of the test progressions
+MAJOR_PROGRESSION = [(0, ''), (9, 'm'), (5, ''), (7, ''), (2, 'm'), (7, ''), (0, '')]
+MINOR_PROGRESSION = [(0, 'm'), (5, 'm'), (7, ''), (0, 'm'), (8, ''), (3, ''), (7, ''), (0, 'm')]
+
+def legacy_detect_key(chord_segments):
+    """The original chord-duration heuristic, kept here as the reference"""
+    chord_weights = {}
+    for segment in chord_segments:
+        chord = segment['chord']
+        if chord != 'N':
+            root = chord_root(chord)
+            chord_weights[root] = chord_weights.get(root, 0) + segment['duration']
+    if not chord_weights:
+        return 'C'
+    key = max(chord_weights, key=chord_weights.get)
+    minor = {'m', 'dim', 'm7', 'dim7', 'm7b5', 'm6'}
+    minor_duration = sum(s['duration'] for s in chord_segments
+                         if s['chord'] != 'N' and s['chord'][len(chord_root(s['chord'])):] in minor)
+    major_duration = sum(s['duration'] for s in chord_segments
+                         if s['chord'] != 'N' and s['chord'][len(chord_root(s['chord'])):] not in minor)
+    if minor_duration > major_duration:
+        key += 'm'
+    return key
+
+def analyse(y):
+    """(chromagram, chord segments) the way detect_chords gets them"""
+    hop_length = app.HOP_LENGTH
+    chromagram = app.librosa.feature.chroma_cqt(y=y, sr=app.SAMPLE_RATE, hop_length=hop_length)
+    sequence = app.match_chords_to_templates(chromagram, app.create_chord_templates(), hop_length, app.SAMPLE_RATE)
+    segments = app.filter_short_segments(app.group_chord_segments(sequence), app.MIN_SEGMENT_DURATION)
+    return chromagram, app.segments_to_dicts(segments)
+
+def best_of(fn, repeat=20):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--duration', type=float, default=40.0)
+    args = parser.parse_args()
+
+    legacy_hits = profile_hits = 0
+    confidences = []
+    for tonic in range(12):
+        for progression, suffix in ((MAJOR_PROGRESSION, ''), (MINOR_PROGRESSION, 'm')):
+            key = app.NOTE_NAMES[tonic] + suffix
+            chords = [app.NOTE_NAMES[(tonic + degree) % 12] + quality for degree, quality in progression]
+            y, _ = synth_progression(args.duration, sr=app.SAMPLE_RATE, progression=chords)
+            chromagram, segments = analyse(y)
+            legacy = legacy_detect_key(segments)
+            detected, confidence, runner_up, _ = app.detect_key(chromagram)
+            legacy_hits += legacy == key
+            profile_hits += detected == key
+            confidences.append(confidence)
+            if legacy != key or detected != key:
+                print(f"  {key:>3}: legacy {legacy:>3}, profiles {detected:>3} ({confidence:.2f}, runner-up {runner_up})")
+    print(f"accuracy over 24 keys: legacy {legacy_hits}/24, profiles {profile_hits}/24 "
+          f"(median confidence {np.median(confidences):.2f})")
+
+    # Cost vs segment count, for a 5 minute chromagram
+    n_frames = int(300 * app.SAMPLE_RATE / app.HOP_LENGTH)
+    chromagram = np.random.default_rng(0).random((12, n_frames)).astype(np.float32)
+    print(f"{'segments':>9} {'legacy':>10} {'profiles':>10}")
+    for n_segments in (50, 500, 5000):
+        labels = app.CHORD_LABELS
+        segments = [{'chord': labels[i % len(labels)], 'start': i * 0.5, 'end': i * 0.5 + 0.5, 'duration': 0.5}
+                    for i in range(n_segments)]
+        legacy = best_of(lambda: legacy_detect_key(segments))
+        profiles = best_of(lambda: app.detect_key(chromagram))
+        print(f"{n_segments:>9} {legacy * 1e6:>8.0f}us {profiles * 1e6:>8.0f}us")
+
+if __name__ == '__main__':
+    main()
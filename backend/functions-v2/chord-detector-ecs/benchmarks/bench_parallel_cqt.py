@@ -0,0 +1,51 @@
+"""
+Benchmark: chroma_cqt scaling across 1, 2, 4 and 8 worker processes
+
+Checks every parallel chromagram against a single chroma_cqt call.
+Speedups are bounded by the cores this process can use (reported first).
+
+Usage: python benchmarks/bench_parallel_cqt.py [--duration 300] [--workers 1 2 4 8]
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from synth import synth_progression
+
+import app
+import parallel_chroma
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--duration', type=float, default=300.0)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8])
+    args = parser.parse_args()
+    
+    sr, hop_length = app.SAMPLE_RATE, app.HOP_LENGTH
+    y, _ = synth_progression(args.duration, sr=sr)
+    print(f"available CPUs: {parallel_chroma.available_cpus()}, track: {args.duration:.0f}s")
+    
+    # Pay first-call filter construction/JIT outside the timing
+    app.librosa.feature.chroma_cqt(y=y[:sr * 30], sr=sr, hop_length=hop_length)
+    
+    start = time.perf_counter()
+    reference = app.librosa.feature.chroma_cqt(y=y, sr=sr, hop_length=hop_length)
+    serial_time = time.perf_counter() - start
+    print(f"{'serial':>8}: {serial_time:6.2f}s")
+    
+    for n_workers in args.workers:
+        # Warm the pool (process start + librosa import) outside the timing
+        parallel_chroma.parallel_chromagram(y[:sr * 30], sr, hop_length, n_workers)
+        
+        start = time.perf_counter()
+        chroma, _ = parallel_chroma.parallel_chromagram(y, sr, hop_length, n_workers)
+        elapsed = time.perf_counter() - start
+        
+        max_err = np.abs(chroma - reference).max() if chroma.shape == reference.shape else float('nan')
+        print(f"{n_workers:>2} workers: {elapsed:6.2f}s  speedup {serial_time / elapsed:4.2f}x  "
+              f"max |diff| {max_err:.2e}  shape {chroma.shape}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,210 @@
+"""
+Benchmark suite: every chord engine, stage by stage, on synthetic tracks
+
+Engines:
+  ecs       chord-detector-ecs/app.py detect_chords (as configured by env)
+  madmom    chord-detector-madmom/handler.py detect_chords (librosa path)
+  ml-utils  chord-detector-ml/chord_utils.py extract_chords_from_midi, fed
+            the note events of the synthetic progression (Basic Pitch
+            inference itself needs the TF model and is not covered)
+
+Each engine/duration pair runs in a fresh subprocess after a short warm-up,
+so peak memory is that run's own high-water mark. Throughput is seconds of
+audio per CPU-second of the whole detection. Results go to a JSON baseline;
+pass --compare with an older baseline to print the change.
+
+Usage: python benchmarks/bench_pipeline.py [--durations 30 180 600 3600]
+           [--engines ecs madmom ml-utils] [--output baseline.json] [--compare old.json]
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+
+from synth import APP_DIR, DEFAULT_PROGRESSION, chord_pitch_classes, label_accuracy, synth_progression, write_wav
+
+FUNCTIONS_V2_DIR = os.path.dirname(APP_DIR)
+MADMOM_DIR = os.path.join(FUNCTIONS_V2_DIR, 'chord-detector-madmom')
+ML_DIR = os.path.join(os.path.dirname(FUNCTIONS_V2_DIR), 'functions', 'chord-detector-ml')
+
+ENGINES = ['ecs', 'madmom', 'ml-utils']
+SAMPLE_RATE = 44100
+CHORD_DURATION = 2.0
+NOTE_DURATION = 0.5
+WARMUP_SECONDS = 10
+
+def timed(timer, name, fn):
+    """Wrap `fn` so every call is recorded as span `name`"""
+    def wrapper(*args, **kwargs):
+        with timer.span(name):
+            return fn(*args, **kwargs)
+    return wrapper
+
+def run_ecs(path, duration, timer):
+    import app
+    app.detect_chords(path.replace('.wav', '-warmup.wav'))
+    with timer.span('detectChords'):
+        return app.detect_chords(path, timer=timer)
+
+def run_madmom(path, duration, timer):
+    sys.path.insert(0, MADMOM_DIR)
+    import handler
+    # The handler pins itself to mock mode; benchmark the librosa path it ships
+    handler.LIBROSA_AVAILABLE = True
+    handler.detect_chords(path.replace('.wav', '-warmup.wav'))
+
+    handler.load_audio = timed(timer, 'decode', handler.load_audio)
+    handler.librosa.feature.chroma_cqt = timed(timer, 'chromaCqt', handler.librosa.feature.chroma_cqt)
+    handler.detect_key = timed(timer, 'keyDetection', handler.detect_key)
+    with timer.span('detectChords'):
+        result = handler.detect_chords(path)
+    if result['model'] == 'mock':
+        raise RuntimeError('madmom handler fell back to mock chords')
+    return result
+
+def synthetic_midi(duration):
+    """pretty_midi-shaped note events for the benchmark progression (middle-C triads)"""
+    notes = []
+    for seg in synth_reference(duration):
+        strike = seg['start']
+        while strike < seg['end']:
+            for pc in chord_pitch_classes(seg['chord']):
+                notes.append(SimpleNamespace(pitch=60 + pc, start=strike, end=strike + NOTE_DURATION))
+            strike += NOTE_DURATION
+    instrument = SimpleNamespace(is_drum=False, notes=notes)
+    return SimpleNamespace(instruments=[instrument], get_end_time=lambda: duration)
+
+def synth_reference(duration):
+    """Reference segments of the benchmark progression without rendering audio"""
+    n_chords = int(-(-duration // CHORD_DURATION))
+    return [
+        {'chord': DEFAULT_PROGRESSION[i % len(DEFAULT_PROGRESSION)],
+         'start': i * CHORD_DURATION, 'end': min((i + 1) * CHORD_DURATION, duration)}
+        for i in range(n_chords)
+    ]
+
+def run_ml_utils(path, duration, timer):
+    sys.path.insert(0, ML_DIR)
+    import chord_utils
+    chord_utils.extract_chords_from_midi(synthetic_midi(WARMUP_SECONDS))
+
+    with timer.span('noteEvents'):
+        midi = synthetic_midi(duration)
+    chord_utils.detect_key = timed(timer, 'keyDetection', chord_utils.detect_key)
+    chord_utils.match_chord = timed(timer, 'chordMatching', chord_utils.match_chord)
+    with timer.span('detectChords'):
+        result = chord_utils.extract_chords_from_midi(midi)
+    # Same shape as the audio engines so accuracy is comparable
+    chords = [
+        {'chord': c['name'], 'start': c['timestamp'], 'end': c['timestamp'] + c['duration']}
+        for c in result['chords']
+    ]
+    return {'chords': chords, 'key': result['key']}
+
+RUNNERS = {'ecs': run_ecs, 'madmom': run_madmom, 'ml-utils': run_ml_utils}
+
+def run_worker(engine, path, duration):
+    """Run one engine on one track in this process and print a JSON result line"""
+    from timing import StageTimer, read_peak_rss_kb
+    timer = StageTimer()
+    result = RUNNERS[engine](path, duration, timer)
+    stages = timer.summary()['stages']
+    total = stages['detectChords']
+    print(json.dumps({
+        'wallSeconds': round(total['wallMs'] / 1000, 3),
+        'cpuSeconds': round(total['cpuMs'] / 1000, 3),
+        'audioSecondsPerCpuSecond': round(duration / max(total['cpuMs'] / 1000, 1e-9), 1),
+        'peakRssMb': round(read_peak_rss_kb() / 1024, 1),
+        'accuracy': round(label_accuracy(result['chords'], synth_reference(duration), duration), 3),
+        'segments': len(result['chords']),
+        'stages': stages
+    }))
+
+def measure(engine, path, duration):
+    proc = subprocess.run(
+        [sys.executable, __file__, '--worker', engine, path, str(duration)],
+        capture_output=True, text=True
+    )
+    if proc.returncode != 0:
+        return {'error': proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else f'exit {proc.returncode}'}
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+def environment():
+    import librosa
+    import numpy as np
+    return {
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'librosa': librosa.__version__,
+        'machine': platform.machine(),
+        'cpus': len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else os.cpu_count()
+    }
+
+def print_comparison(baseline, old):
+    """Throughput and peak memory change against an older baseline"""
+    print(f"\nvs {old.get('createdAt', 'previous baseline')}:")
+    for engine, runs in baseline['results'].items():
+        for duration, run in runs.items():
+            before = old.get('results', {}).get(engine, {}).get(duration)
+            if not before or 'error' in run or 'error' in before:
+                continue
+            speed = run['audioSecondsPerCpuSecond'] / before['audioSecondsPerCpuSecond']
+            memory = run['peakRssMb'] - before['peakRssMb']
+            print(f"{engine:>9} {float(duration):>6.0f}s  throughput x{speed:5.2f}  peak {memory:+8.1f} MB  "
+                  f"accuracy {run['accuracy'] - before['accuracy']:+.3f}")
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--durations', type=float, nargs='+', default=[30, 180, 600, 3600])
+    parser.add_argument('--engines', nargs='+', choices=ENGINES, default=ENGINES)
+    parser.add_argument('--output', default='pipeline-baseline.json')
+    parser.add_argument('--compare')
+    parser.add_argument('--worker', nargs=3, metavar=('ENGINE', 'PATH', 'DURATION'))
+    args = parser.parse_args()
+
+    if args.worker:
+        engine, path, duration = args.worker
+        run_worker(engine, path, float(duration))
+        return
+
+    baseline = {
+        'createdAt': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'environment': environment(),
+        'results': {engine: {} for engine in args.engines}
+    }
+    print(f"{'engine':>9} {'audio':>7} {'wall s':>8} {'cpu s':>8} {'audio s/cpu s':>14} {'peak MB':>8} {'accuracy':>9}")
+    with tempfile.TemporaryDirectory() as tmp:
+        warmup, _ = synth_progression(WARMUP_SECONDS, sr=SAMPLE_RATE)
+        for duration in args.durations:
+            path = os.path.join(tmp, f'track-{duration:.0f}.wav')
+            y, _ = synth_progression(duration, sr=SAMPLE_RATE, chord_duration=CHORD_DURATION, note_duration=NOTE_DURATION)
+            write_wav(path, y, SAMPLE_RATE)
+            write_wav(path.replace('.wav', '-warmup.wav'), warmup, SAMPLE_RATE)
+            del y
+
+            for engine in args.engines:
+                run = measure(engine, path, duration)
+                baseline['results'][engine][str(duration)] = run
+                if 'error' in run:
+                    print(f"{engine:>9} {duration:>6.0f}s  failed: {run['error']}")
+                    continue
+                print(f"{engine:>9} {duration:>6.0f}s {run['wallSeconds']:>8.2f} {run['cpuSeconds']:>8.2f} "
+                      f"{run['audioSecondsPerCpuSecond']:>14.1f} {run['peakRssMb']:>8.0f} {run['accuracy']:>9.3f}")
+            os.remove(path)
+
+    with open(args.output, 'w') as f:
+        json.dump(baseline, f, indent=2)
+    print(f"\nBaseline written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            print_comparison(baseline, json.load(f))
+
+if __name__ == '__main__':
+    main()
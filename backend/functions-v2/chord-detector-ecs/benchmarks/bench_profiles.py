@@ -0,0 +1,57 @@
+"""
+Benchmark: fast / balanced / accurate analysis profiles
+
+Times detect_chords under each profile and reports how often its labels
+agree with the 'accurate' profile (and with the synthetic reference).
+A little noise is mixed in so the profiles have something to disagree on.
+
+Usage: python benchmarks/bench_profiles.py [--duration 600] [--noise 0.01]
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from synth import label_accuracy, synth_progression, write_wav
+
+import app
+
+def run(path, profile):
+    start = time.process_time()
+    result = app.detect_chords(path, profile=profile)
+    return result, time.process_time() - start
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--duration', type=float, default=600.0)
+    parser.add_argument('--noise', type=float, default=0.01)
+    args = parser.parse_args()
+
+    sr = 44100
+    y, reference = synth_progression(args.duration, sr=sr, note_duration=0.5)
+    y = y + args.noise * np.random.default_rng(0).standard_normal(len(y)).astype(np.float32)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = write_wav(os.path.join(tmp, 'track.wav'), y, sr)
+        warmup = write_wav(os.path.join(tmp, 'warmup.wav'), y[:sr * 10], sr)
+        del y
+
+        results = {}
+        for profile in app.ANALYSIS_PROFILES:
+            # First call per profile pays filter construction and JIT
+            app.detect_chords(warmup, profile=profile)
+            results[profile] = run(path, profile)
+
+    accurate, accurate_time = results['accurate']
+    print(f"track: {args.duration:.0f}s, noise {args.noise}")
+    print(f"{'profile':>9} {'cpu s':>7} {'speedup':>8} {'agree w/ accurate':>18} {'vs reference':>13}  model")
+    for profile, (result, elapsed) in results.items():
+        agreement = label_accuracy(result['chords'], accurate['chords'], args.duration)
+        truth = label_accuracy(result['chords'], reference, args.duration)
+        print(f"{profile:>9} {elapsed:>7.2f} {accurate_time / elapsed:>7.2f}x {agreement:>18.3f} {truth:>13.3f}  {result['model']}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+"""
+Benchmark: parallel ranged GETs vs a single-stream download
+
+Serves random objects from the local S3 stand-in (s3_standin.py) with a
+per-request bandwidth cap and first-byte latency, like individual S3
+connections, and times:
+  download_file   one GET streamed to a file (the old chord detector path)
+  fetch cN/pM     s3_fetch.fetch_object, N concurrent M MB ranges, in memory
+  fetch mmap      the same into a memory-mapped file
+  hot reuse       a second stage asking for the same object (HotObjectCache)
+Every fetched buffer is checked byte for byte against the object.
+
+Usage: python benchmarks/bench_s3_fetch.py [--sizes 32 128] [--mbps 400] [--latency 0.05]
+"""
+
+import argparse
+import hashlib
+import os
+import tempfile
+import time
+
+import numpy as np
+
+import synth  # noqa: F401 (puts the task modules on sys.path)
+from s3_standin import LocalS3
+
+from s3_fetch import HotObjectCache, fetch_object
+
+BUCKET = 'uploads'
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', type=int, nargs='+', default=[32, 128], help='object sizes in MB')
+    parser.add_argument('--mbps', type=float, default=400.0, help='per-connection bandwidth, Mbit/s')
+    parser.add_argument('--latency', type=float, nargs='+', default=[0.02, 0.1], help='first-byte latency per request, s')
+    parser.add_argument('--parts', type=float, nargs='+', default=[8.0, 16.0], help='part sizes in MB')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[4, 8, 16])
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    with tempfile.TemporaryDirectory() as tmp:
+        root = os.path.join(tmp, 's3')
+        os.makedirs(os.path.join(root, BUCKET))
+        digests = {}
+        for size_mb in args.sizes:
+            key = f'{size_mb}mb.bin'
+            data = rng.integers(0, 256, size_mb * 1024 * 1024, dtype=np.uint8).tobytes()
+            with open(os.path.join(root, BUCKET, key), 'wb') as f:
+                f.write(data)
+            digests[key] = hashlib.md5(data).hexdigest()
+        del data
+
+        def check(key, buffer):
+            return 'ok' if hashlib.md5(buffer).hexdigest() == digests[key] else 'MISMATCH'
+
+        print(f"per-connection bandwidth {args.mbps:.0f} Mbit/s")
+        print(f"{'object':>9} {'latency':>8} {'method':>16} {'GETs':>5} {'s':>7} {'MB/s':>7} {'speedup':>8}  bytes")
+        for latency in args.latency:
+            s3 = LocalS3(root, bandwidth=args.mbps * 1e6 / 8, first_byte_latency=latency)
+            for key in digests:
+                size = os.path.getsize(os.path.join(root, BUCKET, key))
+                path = os.path.join(tmp, 'download.bin')
+
+                def row(method, gets, seconds, ok, baseline):
+                    print(f"{key:>9} {latency * 1000:>6.0f}ms {method:>16} {gets:>5} {seconds:>7.2f} "
+                          f"{size / seconds / 1e6:>7.0f} {baseline / seconds:>7.2f}x  {ok}")
+
+                s3.get_calls = 0
+                _, baseline = timed(lambda: s3.download_file(BUCKET, key, path))
+                with open(path, 'rb') as f:
+                    row('download_file', s3.get_calls, baseline, check(key, f.read()), baseline)
+                os.remove(path)
+
+                fetched = None
+                for part_mb in args.parts:
+                    for concurrency in args.concurrency:
+                        s3.get_calls = 0
+                        fetched, seconds = timed(lambda: fetch_object(
+                            s3, BUCKET, key, part_size=int(part_mb * 1024 * 1024), concurrency=concurrency
+                        ))
+                        row(f'fetch c{concurrency}/p{part_mb:.0f}', s3.get_calls, seconds, check(key, fetched.buffer), baseline)
+
+                s3.get_calls = 0
+                mapped, seconds = timed(lambda: fetch_object(
+                    s3, BUCKET, key, path=path, concurrency=max(args.concurrency)
+                ))
+                row('fetch mmap', s3.get_calls, seconds, check(key, mapped.buffer), baseline)
+                del mapped
+                os.remove(path)
+
+                cache = HotObjectCache(max(args.sizes) * 1024 * 1024)
+                cache.put(BUCKET, key, fetched)
+                s3.get_calls = 0
+                etag = s3.head_object(Bucket=BUCKET, Key=key)['ETag'].strip('"')
+                reused, seconds = timed(lambda: cache.get(BUCKET, key, etag))
+                print(f"{key:>9} {latency * 1000:>6.0f}ms {'hot reuse':>16} {s3.get_calls:>5} {seconds:>7.4f} "
+                      f"{'-':>7} {'-':>8}  {check(key, reused.buffer)}")
+
+if __name__ == '__main__':
+    main()
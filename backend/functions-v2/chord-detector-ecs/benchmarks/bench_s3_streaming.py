@@ -0,0 +1,111 @@
+"""
+Benchmark: download-then-load vs decoding the S3 body as it arrives
+
+Serves encoded tracks from a throttled local S3 stand-in (s3_standin.py) and
+times, per format and bandwidth:
+  download  s3.download_file to /tmp, then load_audio(path)
+  stream    get_object, then load_audio on the body (no temp file)
+Both must yield the same PCM, up to the encoder's tail padding. MP4-family
+files (m4a) can't be decoded from a pipe; the run shows they are detected
+and take the spool fallback.
+
+Usage: python benchmarks/bench_s3_streaming.py [--duration 120 600] [--mbps 20 100 0]
+(--mbps 0 = unthrottled)
+"""
+
+import argparse
+import os
+import subprocess
+import tempfile
+import time
+
+import numpy as np
+
+from s3_standin import LocalS3
+from synth import synth_progression, write_wav
+
+import app
+from audio_decoder import ffmpeg_binary, load_audio
+from s3_stream import needs_seekable_input, open_audio_object, spool_to_file
+
+BUCKET = 'uploads'
+FORMATS = {'mp3': ['-b:a', '192k'], 'webm': ['-c:a', 'libopus', '-b:a', '128k'], 'm4a': ['-c:a', 'aac', '-b:a', '192k']}
+
+def encode(wav_path, path, codec_args):
+    subprocess.run(
+        [ffmpeg_binary(), '-v', 'error', '-y', '-i', wav_path, *codec_args, path],
+        check=True
+    )
+    return path
+
+def download_then_load(s3, key, tmp_path):
+    start = time.perf_counter()
+    s3.download_file(BUCKET, key, tmp_path)
+    y, _ = load_audio(tmp_path, sr=app.SAMPLE_RATE)
+    elapsed = time.perf_counter() - start
+    os.remove(tmp_path)
+    return y, elapsed
+
+def stream_decode(s3, key, tmp_path):
+    """The process_job path: stream unless the container needs seeking"""
+    start = time.perf_counter()
+    audio = open_audio_object(s3, BUCKET, key)
+    try:
+        spooled = needs_seekable_input(audio)
+        source = spool_to_file(audio, tmp_path) if spooled else audio.stream
+        y, _ = load_audio(source, sr=app.SAMPLE_RATE)
+    finally:
+        audio.stream.close()
+    elapsed = time.perf_counter() - start
+    if spooled:
+        os.remove(tmp_path)
+    return y, elapsed, spooled
+
+def compare_pcm(y, reference):
+    """
+    Streams can keep the encoder's trailing padding (a few ms; ffmpeg trims it
+    only when it can seek to the end), which also shifts the resampler's last
+    samples, so compare the common prefix short of the final 50 ms
+    """
+    n = min(len(y), len(reference)) - int(0.05 * app.SAMPLE_RATE)
+    if not np.array_equal(y[:n], reference[:n]):
+        return f'DIFFERS (max {np.max(np.abs(y[:n] - reference[:n])):.2e})'
+    extra = len(y) - len(reference)
+    return 'identical' if not extra else f'identical, {extra / app.SAMPLE_RATE * 1000:+.0f} ms tail'
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--duration', type=float, nargs='+', default=[120.0, 600.0])
+    parser.add_argument('--mbps', type=float, nargs='+', default=[20.0, 100.0, 0.0])
+    args = parser.parse_args()
+
+    if not ffmpeg_binary():
+        raise SystemExit("ffmpeg is required to encode the test tracks")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = os.path.join(tmp, 's3')
+        os.makedirs(os.path.join(root, BUCKET))
+        sizes = {}
+        for duration in args.duration:
+            y, _ = synth_progression(duration, sr=44100)
+            wav = write_wav(os.path.join(tmp, 'track.wav'), y, 44100)
+            for fmt, codec_args in FORMATS.items():
+                key = f'{duration:.0f}s.{fmt}'
+                encode(wav, os.path.join(root, BUCKET, key), codec_args)
+                sizes[key] = os.path.getsize(os.path.join(root, BUCKET, key))
+
+        tmp_path = os.path.join(tmp, 'job.audio')
+        print(f"{'object':>10} {'MB':>6} {'Mbit/s':>7} {'download s':>11} {'stream s':>9} {'saved':>7}  pcm")
+        for mbps in args.mbps:
+            s3 = LocalS3(root, bandwidth=mbps * 1e6 / 8 if mbps else None, first_byte_latency=0.03)
+            for key, size in sizes.items():
+                reference, download_time = download_then_load(s3, key, tmp_path)
+                y, stream_time, spooled = stream_decode(s3, key, tmp_path)
+                same = compare_pcm(y, reference)
+                note = ' (spooled: needs seekable input)' if spooled else ''
+                rate = f'{mbps:.0f}' if mbps else 'max'
+                print(f"{key:>10} {size / 1e6:>6.1f} {rate:>7} {download_time:>11.2f} {stream_time:>9.2f} "
+                      f"{1 - stream_time / download_time:>6.0%}  {same}{note}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+"""
+Benchmark: dict-per-frame segment grouping vs run-length encoded arrays
+
+Usage: python benchmarks/bench_segmentation.py [--duration 5400]
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+import synth  # noqa: F401  (sets up sys.path for app)
+import app
+
+def legacy_group(chord_sequence):
+    """The original dict-walking grouping + duration filter"""
+    segments = []
+    current_chord = chord_sequence[0]['chord']
+    start_time = chord_sequence[0]['time']
+    for i in range(1, len(chord_sequence)):
+        chord = chord_sequence[i]['chord']
+        t = chord_sequence[i]['time']
+        if chord != current_chord:
+            if current_chord != 'N':
+                segments.append({'chord': current_chord, 'start': round(start_time, 2),
+                                 'end': round(t, 2), 'duration': round(t - start_time, 2)})
+            current_chord = chord
+            start_time = t
+    if current_chord != 'N':
+        end_time = chord_sequence[-1]['time']
+        segments.append({'chord': current_chord, 'start': round(start_time, 2),
+                         'end': round(end_time, 2), 'duration': round(end_time - start_time, 2)})
+    return [s for s in segments if s['duration'] >= 0.5]
+
+def random_sequence(n_frames, sr=22050, hop_length=512, seed=0):
+    """Noisy frame labels with realistic run lengths (~1.5 s chords, short blips)"""
+    rng = np.random.default_rng(seed)
+    run_lengths = rng.integers(1, 120, size=n_frames // 30 + 1)
+    values = rng.integers(-1, 24, size=len(run_lengths))
+    chord_idx = np.repeat(values, run_lengths)[:n_frames]
+    confidence = rng.random(n_frames).astype(np.float32)
+    times = app.librosa.frames_to_time(np.arange(n_frames), sr=sr, hop_length=hop_length)
+    return app.ChordSequence(app.CHORD_LABELS, chord_idx, confidence, times)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--duration', type=float, default=5400.0, help='seconds of audio (default: 90 min)')
+    args = parser.parse_args()
+    
+    n_frames = int(args.duration * 22050 / 512)
+    sequence = random_sequence(n_frames)
+    
+    # What the old match_chords_to_templates allocated
+    start = time.perf_counter()
+    frame_dicts = [
+        {'time': t, 'chord': app.CHORD_LABELS[i] if i != app.NO_CHORD else 'N', 'confidence': c}
+        for t, i, c in zip(sequence.times.tolist(), sequence.chord_idx.tolist(), sequence.confidence.tolist())
+    ]
+    legacy = legacy_group(frame_dicts)
+    legacy_time = time.perf_counter() - start
+    
+    start = time.perf_counter()
+    segments = app.filter_short_segments(app.group_chord_segments(sequence), app.MIN_SEGMENT_DURATION)
+    fast = app.segments_to_dicts(segments)
+    fast_time = time.perf_counter() - start
+    
+    print(f"{n_frames} frames -> {len(fast)} segments")
+    print(f"per-frame dicts: {legacy_time * 1000:.1f} ms")
+    print(f"run-length:      {fast_time * 1000:.1f} ms ({legacy_time / fast_time:.1f}x faster)")
+    print(f"identical output: {legacy == fast}")
+
+if __name__ == '__main__':
+    main()
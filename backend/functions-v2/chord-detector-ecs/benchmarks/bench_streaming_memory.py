@@ -0,0 +1,75 @@
+"""
+Benchmark: peak memory vs track duration, full load vs block streaming
+
+Each measurement runs in a fresh subprocess so the high-water mark reflects one mode only.
+
+Usage: python benchmarks/bench_streaming_memory.py [--durations 60 300 900]
+"""
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+from synth import synth_progression, write_wav
+
+def peak_rss_mb():
+    """Peak RSS of this process image (VmHWM resets on exec, unlike ru_maxrss)"""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def run_worker(mode, path):
+    """Analyze one file in this process and print a JSON result line"""
+    import app
+    if mode == 'stream':
+        app.STREAM_THRESHOLD_SECONDS = 0
+    else:
+        app.STREAM_THRESHOLD_SECONDS = float('inf')
+    start = time.perf_counter()
+    result = app.detect_chords(path)
+    elapsed = time.perf_counter() - start
+    peak_mb = peak_rss_mb()
+    print(json.dumps({'seconds': elapsed, 'peak_mb': peak_mb, 'chords': result['chords']}))
+
+def measure(mode, path):
+    out = subprocess.run(
+        [sys.executable, __file__, '--worker', mode, path],
+        check=True, capture_output=True, text=True
+    ).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--durations', type=float, nargs='+', default=[60, 300, 900])
+    parser.add_argument('--worker', nargs=2, metavar=('MODE', 'PATH'))
+    args = parser.parse_args()
+    
+    if args.worker:
+        run_worker(*args.worker)
+        return
+    
+    sr = 44100
+    print(f"{'duration':>9} {'full MB':>9} {'stream MB':>10} {'full s':>8} {'stream s':>9}  same segments")
+    for duration in args.durations:
+        y, _ = synth_progression(duration, sr=sr)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = write_wav(os.path.join(tmp, 'track.wav'), y, sr)
+            del y
+            full = measure('full', path)
+            stream = measure('stream', path)
+        same = full['chords'] == stream['chords']
+        print(f"{duration:>8.0f}s {full['peak_mb']:>9.0f} {stream['peak_mb']:>10.0f} "
+              f"{full['seconds']:>8.1f} {stream['seconds']:>9.1f}  {same}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+"""
+Benchmark: per-frame Python template loop vs matrix scoring engine
+
+Usage: python benchmarks/bench_template_matching.py [--duration 300]
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from synth import synth_progression
+
+import app
+
+def legacy_match(chromagram, templates, hop_length, sr):
+    """The original frame-by-frame loop, kept here as the reference"""
+    chord_sequence = []
+    for frame_idx in range(chromagram.shape[1]):
+        chroma_frame = chromagram[:, frame_idx]
+        if np.sum(chroma_frame) > 0:
+            chroma_frame = chroma_frame / np.sum(chroma_frame)
+        best_chord = 'N'
+        best_score = 0
+        for chord_name, template in templates.items():
+            score = np.dot(chroma_frame, template)
+            if score > best_score:
+                best_score = score
+                best_chord = chord_name
+        if best_score < 0.3:
+            best_chord = 'N'
+        t = app.librosa.frames_to_time(frame_idx, sr=sr, hop_length=hop_length)
+        chord_sequence.append({'time': t, 'chord': best_chord, 'confidence': best_score})
+    return chord_sequence
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--duration', type=float, default=300.0)
+    args = parser.parse_args()
+    
+    sr, hop_length = 22050, 512
+    y, _ = synth_progression(args.duration, sr=sr)
+    chromagram = app.librosa.feature.chroma_cqt(y=y, sr=sr, hop_length=hop_length)
+    templates = app.create_chord_templates()
+    print(f"Chromagram: {chromagram.shape[1]} frames x {len(templates)} templates")
+    
+    start = time.perf_counter()
+    legacy = legacy_match(chromagram, templates, hop_length, sr)
+    legacy_time = time.perf_counter() - start
+    
+    start = time.perf_counter()
+    fast = app.match_chords_to_templates(chromagram, templates, hop_length, sr)
+    fast_time = time.perf_counter() - start
+    
+    labels = [fast.labels[i] if i != app.NO_CHORD else 'N' for i in fast.chord_idx.tolist()]
+    agree = sum(a['chord'] == b for a, b in zip(legacy, labels))
+    print(f"legacy loop: {legacy_time * 1000:.1f} ms")
+    print(f"matrix:      {fast_time * 1000:.1f} ms ({legacy_time / fast_time:.1f}x faster)")
+    print(f"label agreement: {agree}/{len(legacy)}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+"""
+Benchmark: template matching cost and accuracy vs chord vocabulary size
+
+Matches one chromagram against growing prefixes of the extended vocabulary
+(24 triads up to all 180 classes). Each size is a single (K, 12) @ (12, N)
+matmul, so per-track cost should stay flat next to the CQT. Accuracy is
+reported for a triad progression and a seventh-chord progression.
+
+Usage: python benchmarks/bench_vocabulary.py [--duration 600] [--repeats 5]
+"""
+
+import argparse
+import time
+
+from synth import chord_root, label_accuracy, synth_progression
+
+import app
+
+SEVENTHS_PROGRESSION = ['Cmaj7', 'Am7', 'Dm7', 'G7']
+
+def vocabulary_prefix(n_qualities):
+    """The first `n_qualities` chord types of the extended vocabulary, on all 12 roots"""
+    templates = app.create_extended_chord_templates()
+    suffixes = [suffix for suffix, _ in app.CHORD_QUALITIES[:n_qualities]]
+    return {label: t for label, t in templates.items() if label[len(chord_root(label)):] in suffixes}
+
+def best_time(fn, repeats):
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def accuracy(chromagram, reference, templates, duration):
+    sequence = app.match_chords_to_templates(chromagram, templates, app.HOP_LENGTH, app.SAMPLE_RATE)
+    segments = app.filter_short_segments(app.group_chord_segments(sequence), app.MIN_SEGMENT_DURATION)
+    return label_accuracy(app.segments_to_dicts(segments), reference, duration)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--duration', type=float, default=600.0)
+    parser.add_argument('--repeats', type=int, default=5)
+    args = parser.parse_args()
+
+    sr, hop_length = app.SAMPLE_RATE, app.HOP_LENGTH
+    tracks = {}
+    for name, progression in (('triads', None), ('sevenths', SEVENTHS_PROGRESSION)):
+        y, reference = synth_progression(args.duration, sr=sr, progression=progression)
+        start = time.perf_counter()
+        chromagram = app.librosa.feature.chroma_cqt(y=y, sr=sr, hop_length=hop_length)
+        cqt_time = time.perf_counter() - start
+        tracks[name] = (chromagram, reference)
+
+    print(f"track: {args.duration:.0f}s, {chromagram.shape[1]} frames, chroma_cqt {cqt_time:.2f}s")
+    print(f"{'classes':>8} {'matching ms':>12} {'% of CQT':>9} {'triads acc':>11} {'sevenths acc':>13}")
+
+    vocabularies = [('majmin', app.create_chord_templates('majmin'))]
+    vocabularies += [(f'{n} types', vocabulary_prefix(n)) for n in (2, 4, 8, len(app.CHORD_QUALITIES))]
+    for name, templates in vocabularies:
+        chromagram = tracks['triads'][0]
+        elapsed = best_time(lambda: app.match_chords_to_templates(chromagram, templates, hop_length, sr), args.repeats)
+        triads = accuracy(*tracks['triads'], templates, args.duration)
+        sevenths = accuracy(*tracks['sevenths'], templates, args.duration)
+        print(f"{len(templates):>8} {elapsed * 1000:>12.1f} {100 * elapsed / cqt_time:>8.2f}% "
+              f"{triads:>11.3f} {sevenths:>13.3f}  ({name})")
+
+if __name__ == '__main__':
+    main()
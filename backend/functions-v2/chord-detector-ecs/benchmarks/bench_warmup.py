@@ -0,0 +1,91 @@
+"""
+Benchmark: first-job latency of a fresh container, cold vs warmed
+
+Each scenario runs in a new interpreter (as a new task would) and times
+`import app` and the first and second detect_chords on the same track:
+  cold         empty NUMBA_CACHE_DIR: librosa's kernels JIT-compile in the job
+  image        NUMBA_CACHE_DIR filled by `python warmup.py` (the image build step)
+  image+start  as image, plus the container-start warm-up before the job
+               (in app.main it overlaps the first job's S3/DynamoDB I/O)
+The image-build warm-up itself is timed once, as the one-off cost.
+
+Usage: python benchmarks/bench_warmup.py [--duration 60] [--profile balanced] [--cpu-name generic]
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_DIR = os.path.dirname(BENCH_DIR)
+
+def child(path, profile, start_warm_up):
+    """One fresh-container run; prints its timings as JSON"""
+    start = time.perf_counter()
+    import synth  # noqa: F401 (sets the env app.py needs)
+    import app
+    timings = {'import': time.perf_counter() - start}
+
+    if start_warm_up:
+        from warmup import warm_up
+        start = time.perf_counter()
+        warm_up(app, [profile])
+        timings['startWarmUp'] = time.perf_counter() - start
+
+    for label in ('firstJob', 'secondJob'):
+        start = time.perf_counter()
+        chords = app.detect_chords(path, profile=profile)
+        timings[label] = time.perf_counter() - start
+    timings['chords'] = len(chords['chords'])
+    print(json.dumps(timings))
+
+def run(args, env, *extra):
+    """Run `args` in a fresh interpreter; returns (wall seconds, last stdout line)"""
+    start = time.perf_counter()
+    out = subprocess.run([sys.executable, *args, *extra], env=env, cwd=APP_DIR, check=True,
+                         capture_output=True, text=True).stdout
+    return time.perf_counter() - start, out.strip().splitlines()[-1] if out.strip() else ''
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--duration', type=float, default=60.0)
+    parser.add_argument('--profile', default='balanced')
+    parser.add_argument('--cpu-name', default='generic', help="NUMBA_CPU_NAME ('' for the host CPU)")
+    parser.add_argument('--child', nargs=2, metavar=('PATH', 'START_WARM_UP'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child[0], args.profile, args.child[1] == '1')
+        return
+
+    from synth import synth_progression, write_wav
+
+    with tempfile.TemporaryDirectory() as tmp:
+        y, _ = synth_progression(args.duration, sr=44100)
+        path = write_wav(os.path.join(tmp, 'track.wav'), y, 44100)
+
+        env = dict(os.environ, FEATURE_CACHE_ENABLED='false', NUMBA_CPU_NAME=args.cpu_name,
+                   DYNAMODB_JOBS_TABLE='benchmark-jobs', AWS_DEFAULT_REGION='us-east-1')
+        if not args.cpu_name:
+            env.pop('NUMBA_CPU_NAME')
+        cold_env = dict(env, NUMBA_CACHE_DIR=os.path.join(tmp, 'numba-cold'))
+        image_env = dict(env, NUMBA_CACHE_DIR=os.path.join(tmp, 'numba-image'))
+
+        build_seconds, _ = run(['warmup.py'], image_env)
+        print(f"image build warm-up (all profiles): {build_seconds:.1f}s")
+
+        bench = os.path.join(BENCH_DIR, 'bench_warmup.py')
+        print(f"{'scenario':>12} {'process':>8} {'import':>7} {'start wu':>9} {'1st job':>8} {'2nd job':>8} {'to 1st result':>14}")
+        for label, scenario_env, warm in (('cold', cold_env, '0'), ('image', image_env, '0'), ('image+start', image_env, '1')):
+            wall, line = run([bench, '--profile', args.profile, '--child', path, warm], scenario_env)
+            t = json.loads(line)
+            start_wu = t.get('startWarmUp', 0.0)
+            print(f"{label:>12} {wall:>7.2f}s {t['import']:>6.2f}s {start_wu:>8.2f}s {t['firstJob']:>7.2f}s "
+                  f"{t['secondJob']:>7.2f}s {t['import'] + start_wu + t['firstJob']:>13.2f}s")
+
+if __name__ == '__main__':
+    main()
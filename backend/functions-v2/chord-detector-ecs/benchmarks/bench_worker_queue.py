@@ -0,0 +1,144 @@
+"""
+Benchmark: the long-running worker (run_worker) fed through a file:// queue
+
+A separate producer process sends jobs to a FileJobQueue directory the way
+the trigger sends them to SQS, while run_worker in this process leases,
+analyses and acks them against (stand-in) S3 and DynamoDB, and exits once
+the queue has been idle for WORKER_IDLE_SECONDS. Checked along the way:
+  - every job is processed exactly once, and its lease is still live when
+    it finishes: the visibility timeout is kept shorter than an analysis,
+    so only the worker's heartbeat keeps the job from being redelivered
+  - a job left leased by a crashed worker is redelivered and done
+  - a corrupt track ends FAILED and is acked, not redelivered
+  - statuses and chords match process_job run directly on the same jobs
+
+Usage: python benchmarks/bench_worker_queue.py [--jobs 6] [--duration 180] [--interval 0.5]
+Exits 1 if any check fails.
+"""
+
+import argparse
+import collections
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+BUCKET = 'audio-bucket'
+# Rotated per job so the tracks differ
+PROGRESSION = ['C', 'Am', 'F', 'G']
+
+PRODUCER = """
+import json, sys, time
+from job_queue import FileJobQueue
+queue = FileJobQueue(sys.argv[1])
+for job in json.loads(sys.argv[2]):
+    queue.send(job)
+    time.sleep(float(sys.argv[3]))
+"""
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--jobs', type=int, default=6)
+    parser.add_argument('--duration', type=float, default=180.0, help='Seconds of audio per job')
+    parser.add_argument('--interval', type=float, default=0.5, help='Seconds between sends')
+    parser.add_argument('--visibility', type=int, default=1, help='WORKER_VISIBILITY_TIMEOUT, seconds')
+    args = parser.parse_args()
+
+    os.environ.update(PROGRESS_UPDATES='false', WARMUP_ON_START='false', CHECKPOINTS='false',
+                      WORKER_VISIBILITY_TIMEOUT=str(args.visibility), WORKER_IDLE_SECONDS='3')
+
+    import numpy as np
+    from synth import APP_DIR, synth_progression, write_wav
+    from bench_batch import StandinTable
+    from s3_standin import LocalS3
+    import app
+
+    with tempfile.TemporaryDirectory() as root:
+        os.makedirs(os.path.join(root, BUCKET))
+        jobs = []
+        for i in range(args.jobs):
+            key = f'track-{i}.wav'
+            if i == 1:
+                # Not audio: this job must fail on its own
+                with open(os.path.join(root, BUCKET, key), 'wb') as f:
+                    f.write(np.random.default_rng(i).bytes(4096))
+            else:
+                progression = PROGRESSION[i % 4:] + PROGRESSION[:i % 4]
+                y, _ = synth_progression(args.duration, sr=44100, progression=progression)
+                write_wav(os.path.join(root, BUCKET, key), y, 44100)
+            jobs.append({'jobId': f'worker-bench-{i}', 'bucket': BUCKET, 'key': key})
+
+        from warmup import warm_up
+        warm_up(app, [app.ANALYSIS_PROFILE])
+        app.s3_client = LocalS3(root)
+
+        # Reference: the same jobs through process_job directly
+        reference = StandinTable()
+        app.dynamodb = reference
+        for job in jobs:
+            try:
+                app.process_job(job['jobId'], job['bucket'], job['key'])
+            except Exception:
+                pass
+
+        queue_dir = os.path.join(root, 'queue')
+        os.makedirs(queue_dir)
+        # The last job was leased by a worker that died: its lease ran out a minute ago
+        crashed = jobs[-1]
+        with open(os.path.join(queue_dir, f'0-crashed.json.lease.{time.time() - 60:.3f}'), 'w') as f:
+            json.dump(crashed, f)
+
+        table = StandinTable()
+        app.dynamodb = table
+        runs = collections.Counter()
+        # Seconds each job's lease had left when its analysis finished
+        lease_left = {}
+        process_job = app.process_job
+
+        def counting(job_id, *rest):
+            runs[job_id] += 1
+            started = time.perf_counter()
+            try:
+                return process_job(job_id, *rest)
+            finally:
+                deadlines = [float(name.split('.lease.')[1]) for name in os.listdir(queue_dir) if '.lease.' in name]
+                lease_left[job_id] = (min(deadlines) - time.time(), time.perf_counter() - started)
+
+        app.process_job = counting
+        producer = subprocess.Popen(
+            [sys.executable, '-c', PRODUCER, queue_dir, json.dumps(jobs[:-1]), str(args.interval)],
+            env={**os.environ, 'PYTHONPATH': APP_DIR}
+        )
+        start = time.perf_counter()
+        code = app.run_worker(f'file://{queue_dir}')
+        seconds = time.perf_counter() - start
+        producer.wait()
+
+        done = sum(1 for status in table.status.values() if status == 'CHORDS_DETECTED')
+        left = os.listdir(queue_dir)
+        # The worker waits WORKER_IDLE_SECONDS on an empty queue before exiting
+        busy = seconds - app.WORKER_IDLE_SECONDS
+        print(f"{args.jobs} jobs x {args.duration:.0f}s audio, one sent every {args.interval:g}s, "
+              f"visibility timeout {args.visibility}s")
+        print(f"worker: exit {code}, {busy:.2f}s busy, {done}/{args.jobs} done, {60 * done / busy:.1f} jobs/min")
+        print(f"runs per job: {dict(runs)}")
+        print("lease left / analysis seconds: " +
+              ', '.join(f"{job_id[-1]}: {left:.2f}/{took:.2f}" for job_id, (left, took) in lease_left.items()))
+        print(f"statuses: {json.dumps(table.status)}")
+
+        checks = {
+            'each job processed once': sorted(runs) == sorted(job['jobId'] for job in jobs) and set(runs.values()) == {1},
+            'leases kept alive': all(left > 0 for left, _ in lease_left.values()),
+            'crashed lease redelivered': table.status.get(crashed['jobId']) == 'CHORDS_DETECTED',
+            'corrupt job failed': table.status.get(jobs[1]['jobId']) == 'FAILED',
+            'queue drained': not left,
+            'same as process_job': table.status == reference.status and table.chords == reference.chords,
+        }
+        for name, ok in checks.items():
+            print(f"{name}: {ok}")
+        sys.exit(0 if code == 0 and all(checks.values()) else 1)
+
+if __name__ == '__main__':
+    main()
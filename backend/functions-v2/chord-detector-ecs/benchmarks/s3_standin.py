@@ -0,0 +1,129 @@
+"""
+Local S3 stand-in for benchmarks: a directory of objects behind the subset
+of the boto3 S3 client the chord detector uses (get_object with Range,
+head_object, download_file, put_object, delete_object)
+
+`bandwidth` (bytes/s, per request, like a single S3 connection) and
+`first_byte_latency` (s, per request) throttle reads so network overlap and
+request concurrency show up in timings.
+"""
+
+import hashlib
+import os
+import re
+import shutil
+import time
+
+class PreconditionFailed(Exception):
+    """Stand-in for the 412 ClientError of a failed IfMatch"""
+
+class NoSuchKey(Exception):
+    """Stand-in for the NoSuchKey ClientError (carries the same error code)"""
+
+    def __init__(self, key):
+        super().__init__(f"{key} does not exist")
+        self.response = {'Error': {'Code': 'NoSuchKey'}}
+
+class ThrottledBody:
+    """GetObject 'Body': reads a byte range of a file at a limited rate"""
+
+    def __init__(self, path, start, end, bandwidth=None, first_byte_latency=0.0):
+        self.f = open(path, 'rb')
+        self.f.seek(start)
+        self.remaining = end - start
+        self.bandwidth = bandwidth
+        self.first_byte_latency = first_byte_latency
+        self.started = None
+        self.sent = 0
+
+    def read(self, n=-1):
+        if self.started is None:
+            time.sleep(self.first_byte_latency)
+            self.started = time.monotonic()
+        if n is None or n < 0 or n > self.remaining:
+            n = self.remaining
+        data = self.f.read(n)
+        self.remaining -= len(data)
+        self.sent += len(data)
+        if self.bandwidth:
+            # Sleep until the bytes sent so far would have arrived
+            wait = self.started + self.sent / self.bandwidth - time.monotonic()
+            if wait > 0:
+                time.sleep(wait)
+        return data
+
+    def iter_chunks(self, chunk_size=1 << 16):
+        while True:
+            chunk = self.read(chunk_size)
+            if not chunk:
+                return
+            yield chunk
+
+    def close(self):
+        self.f.close()
+
+class LocalS3:
+    """Directory-backed stand-in for boto3.client('s3'); buckets are subdirectories of `root`"""
+
+    def __init__(self, root, bandwidth=None, first_byte_latency=0.0):
+        self.root = root
+        self.bandwidth = bandwidth
+        self.first_byte_latency = first_byte_latency
+        self.get_calls = 0
+        self._etags = {}
+
+    def _path(self, bucket, key):
+        return os.path.join(self.root, bucket, key)
+
+    def _etag(self, path):
+        stat = os.stat(path)
+        version = (stat.st_size, stat.st_mtime_ns)
+        if self._etags.get(path, (None,))[0] != version:
+            with open(path, 'rb') as f:
+                self._etags[path] = (version, '"' + hashlib.md5(f.read()).hexdigest() + '"')
+        return self._etags[path][1]
+
+    def put_object(self, Bucket, Key, Body, **kwargs):
+        path = self._path(Bucket, Key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(Body if isinstance(Body, bytes) else Body.read())
+        return {'ETag': self._etag(path)}
+
+    def head_object(self, Bucket, Key):
+        path = self._path(Bucket, Key)
+        return {'ContentLength': os.path.getsize(path), 'ETag': self._etag(path)}
+
+    def get_object(self, Bucket, Key, Range=None, IfMatch=None):
+        self.get_calls += 1
+        path = self._path(Bucket, Key)
+        if not os.path.exists(path):
+            raise NoSuchKey(Key)
+        if IfMatch and IfMatch != self._etag(path):
+            raise PreconditionFailed(f"{Bucket}/{Key} changed")
+        size = os.path.getsize(path)
+        start, end = 0, size
+        if Range:
+            match = re.fullmatch(r'bytes=(\d+)-(\d*)', Range)
+            start = int(match.group(1))
+            end = min(size, int(match.group(2)) + 1) if match.group(2) else size
+        return {
+            'Body': ThrottledBody(path, start, end, self.bandwidth, self.first_byte_latency),
+            'ContentLength': end - start,
+            'ContentRange': f'bytes {start}-{end - 1}/{size}',
+            'ETag': self._etag(path),
+        }
+
+    def delete_object(self, Bucket, Key):
+        path = self._path(Bucket, Key)
+        if os.path.exists(path):
+            os.remove(path)
+        return {}
+
+    def download_file(self, Bucket, Key, Filename):
+        body = self.get_object(Bucket, Key)['Body']
+        try:
+            with open(Filename, 'wb') as f:
+                shutil.copyfileobj(body, f, 1 << 20)
+        finally:
+            body.close()
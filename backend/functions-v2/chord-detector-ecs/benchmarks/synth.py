@@ -0,0 +1,107 @@
+"""
+Synthetic audio for chord detector benchmarks
+Renders known chord progressions with NumPy additive synthesis so the
+benchmarks run offline without any audio fixtures
+"""
+
+import os
+import sys
+
+import numpy as np
+
+# Make the task modules importable when running benchmarks from this folder,
+# including the ones shared/sync.sh copies in (read from shared/ itself, so
+# an edit there is benchmarked without a sync)
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SHARED_DIR = os.path.join(os.path.dirname(APP_DIR), 'shared')
+for path in (APP_DIR, SHARED_DIR):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+# app.py reads the table name at import time
+os.environ.setdefault('DYNAMODB_JOBS_TABLE', 'benchmark-jobs')
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+# Benchmarks measure the real work unless they opt into the cache
+os.environ.setdefault('FEATURE_CACHE_ENABLED', 'false')
+
+NOTE_NAMES = ['C', 'C#', 'D', 'D#', 'E', 'F', 'F#', 'G', 'G#', 'A', 'A#', 'B']
+
+# I-vi-IV-V in C, the progression every pop song reaches for
+DEFAULT_PROGRESSION = ['C', 'Am', 'F', 'G']
+
+def chord_root(label):
+    """Root note name of a chord label ('F#m7' -> 'F#')"""
+    return label[:2] if label[1:2] == '#' else label[:1]
+
+def chord_pitch_classes(chord):
+    """Return the pitch classes of a chord label (triads, or any extended-vocabulary chord)"""
+    if chord in NOTE_NAMES or chord.endswith('m') and chord[:-1] in NOTE_NAMES:
+        minor = chord.endswith('m')
+        root = NOTE_NAMES.index(chord[:-1] if minor else chord)
+        third = 3 if minor else 4
+        return [root, (root + third) % 12, (root + 7) % 12]
+    
+    # Only pull in app.py (and librosa) for the extended vocabulary
+    from app import CHORD_QUALITIES
+    root = chord_root(chord)
+    intervals = dict(CHORD_QUALITIES)[chord[len(root):]]
+    return [(NOTE_NAMES.index(root) + interval) % 12 for interval in intervals]
+
+def render_chord(chord, duration, sr, harmonics=4, note_duration=None):
+    """
+    Render one chord as a sum of decaying harmonic partials
+    With `note_duration`, the chord is re-struck every note_duration seconds
+    (gives the beat tracker something to follow)
+    """
+    t = np.arange(int(duration * sr)) / sr
+    y = np.zeros_like(t)
+    for pc in chord_pitch_classes(chord):
+        # Voice every chord tone around middle C
+        freq = 261.63 * 2 ** (pc / 12)
+        for h in range(1, harmonics + 1):
+            y += np.sin(2 * np.pi * freq * h * t) / h
+    if note_duration:
+        envelope = np.exp(-3.0 * (t % note_duration) / note_duration)
+    else:
+        envelope = np.exp(-1.5 * t / duration)
+    return y * envelope
+
+def synth_progression(duration, sr=22050, progression=None, chord_duration=2.0, note_duration=None):
+    """
+    Render `duration` seconds of audio cycling through a chord progression
+    Returns (signal, reference segments)
+    """
+    progression = progression or DEFAULT_PROGRESSION
+    n_chords = int(np.ceil(duration / chord_duration))
+    
+    # Render each distinct chord once and tile, so hour-long tracks stay cheap
+    rendered = {chord: render_chord(chord, chord_duration, sr, note_duration=note_duration) for chord in set(progression)}
+    
+    pieces = []
+    reference = []
+    for i in range(n_chords):
+        chord = progression[i % len(progression)]
+        pieces.append(rendered[chord])
+        reference.append({'chord': chord, 'start': i * chord_duration, 'end': (i + 1) * chord_duration})
+    
+    y = np.concatenate(pieces)[:int(duration * sr)]
+    y = (0.3 * y / np.max(np.abs(y))).astype(np.float32)
+    return y, reference
+
+def write_wav(path, y, sr):
+    """Write a float signal to a WAV file"""
+    import soundfile as sf
+    sf.write(path, y, sr)
+    return path
+
+def label_accuracy(chords, reference, duration, step=0.05):
+    """Fraction of time (sampled every `step` s) where the detected chord matches the reference"""
+    t = np.arange(0, duration, step)
+    
+    def labels_at(segments):
+        out = np.full(len(t), 'N', dtype=object)
+        for seg in segments:
+            out[(t >= seg['start']) & (t < seg['end'])] = seg['chord']
+        return out
+    
+    return float(np.mean(labels_at(chords) == labels_at(reference)))
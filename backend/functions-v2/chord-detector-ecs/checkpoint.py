@@ -0,0 +1,89 @@
+"""
+Checkpoint and resume for chord analyses stopped by SIGTERM (Fargate Spot)
+A streamed CQT runs block by block. When the task is told to stop, the
+chroma (and onset envelope) computed so far and the stream position reached
+are written to S3 at the next block boundary, and the run gives up its lease.
+A relaunched task for the same job, audio ETag and engine picks the
+checkpoint up: it re-decodes the audio up to that position (cheap next to
+the CQT), rebuilds the same rolling buffer and only analyses the rest, so
+the result matches an uninterrupted run.
+"""
+
+import io
+import json
+import logging
+
+import numpy as np
+
+from streaming import StreamPosition
+
+logger = logging.getLogger()
+
+# S3 key prefix for checkpoints (one object per job, overwritten in place)
+CHECKPOINT_PREFIX = 'checkpoints'
+
+# process_job outcome when a run stopped after saving a checkpoint
+INTERRUPTED = 'interrupted'
+
+class Interrupted(Exception):
+    """Raised out of the analysis once its checkpoint is saved"""
+
+def is_missing_object(error):
+    """True for S3's NoSuchKey / 404 (botocore ClientError)"""
+    response = getattr(error, 'response', None) or {}
+    return response.get('Error', {}).get('Code') in ('NoSuchKey', '404')
+
+class JobCheckpoint:
+    """
+    The checkpoint of one job, s3://bucket/checkpoints/{job_id}.npz
+    `identity` (audio ETag, engine, analysis settings) must match for a
+    saved checkpoint to be resumed; anything else is ignored and overwritten
+    """
+
+    def __init__(self, s3_client, bucket, job_id, identity):
+        self.s3_client = s3_client
+        self.bucket = bucket
+        self.key = f'{CHECKPOINT_PREFIX}/{job_id}.npz'
+        # Normalised the way it comes back from JSON, so saved and current compare equal
+        self.identity = json.loads(json.dumps(identity))
+        # Whether load() found an object (matching or not) to clean up after the result is stored
+        self.found = False
+
+    def save(self, chromagram, onset_env, position):
+        """Write the analysis so far; returns the checkpoint size in bytes"""
+        meta = {'identity': self.identity, 'position': position._asdict()}
+        arrays = {'chromagram': chromagram, 'meta': np.array(json.dumps(meta))}
+        if onset_env is not None:
+            arrays['onset'] = onset_env
+        buffer = io.BytesIO()
+        np.savez_compressed(buffer, **arrays)
+        body = buffer.getvalue()
+        self.s3_client.put_object(Bucket=self.bucket, Key=self.key, Body=body, ContentType='application/octet-stream')
+        logger.info(f"Checkpoint saved: frame {position.next_frame}, {len(body)} bytes to s3://{self.bucket}/{self.key}")
+        return len(body)
+
+    def load(self):
+        """(chromagram, onset envelope or None, StreamPosition) of a matching checkpoint, else None"""
+        try:
+            body = self.s3_client.get_object(Bucket=self.bucket, Key=self.key)['Body'].read()
+        except Exception as e:
+            if is_missing_object(e):
+                return None
+            raise
+        self.found = True
+        with np.load(io.BytesIO(body), allow_pickle=False) as saved:
+            meta = json.loads(str(saved['meta']))
+            if meta['identity'] != self.identity:
+                logger.info(f"Ignoring checkpoint s3://{self.bucket}/{self.key}: made for {meta['identity']}")
+                return None
+            onset_env = saved['onset'] if 'onset' in saved.files else None
+            position = StreamPosition(**meta['position'])
+            logger.info(f"Resuming from checkpoint: frame {position.next_frame}, {position.total_samples} samples decoded")
+            return saved['chromagram'], onset_env, position
+
+    def delete(self):
+        """Remove the checkpoint once the result is stored; failures are logged, not raised"""
+        try:
+            self.s3_client.delete_object(Bucket=self.bucket, Key=self.key)
+        except Exception as e:
+            logger.warning(f"Could not delete checkpoint s3://{self.bucket}/{self.key}: {e}")
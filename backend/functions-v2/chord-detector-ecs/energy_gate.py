@@ -0,0 +1,49 @@
+"""
+Energy gating ahead of the chroma CQT
+A cheap RMS pass finds the spans of a track with signal in them; silent
+edges and long quiet gaps are then skipped by the CQT entirely. Spans are
+on the chroma frame grid, so skipped frames simply stay zero (and match as
+'N') and every timestamp keeps the original timeline.
+"""
+
+import logging
+
+import numpy as np
+import librosa
+
+logger = logging.getLogger()
+
+def active_spans(y, sr, hop_length, top_db, min_gap_samples):
+    """
+    Frame ranges [(first, end)] whose RMS is within `top_db` of the loudest frame
+    Quiet gaps shorter than `min_gap_samples` are kept (skipping them would save
+    less CQT than the context it costs). Returns [] for an all-silent track.
+    """
+    n_frames = 1 + len(y) // hop_length
+    if not len(y):
+        return []
+
+    rms = librosa.feature.rms(y=y, hop_length=hop_length)[0][:n_frames]
+    peak = rms.max()
+    if peak <= 0:
+        return []
+    loud = librosa.amplitude_to_db(rms, ref=peak, top_db=None) > -top_db
+
+    # Run starts/ends of loud frames
+    edges = np.flatnonzero(np.diff(np.concatenate(([0], loud.astype(np.int8), [0]))))
+    starts, ends = edges[::2], edges[1::2]
+
+    min_gap_frames = int(np.ceil(min_gap_samples / hop_length))
+    spans = []
+    for start, end in zip(starts.tolist(), ends.tolist()):
+        if spans and start - spans[-1][1] < min_gap_frames:
+            spans[-1] = (spans[-1][0], end)
+        else:
+            spans.append((start, end))
+    return spans
+
+def gated_fraction(spans, n_frames):
+    """Fraction of frames the gate skips"""
+    if not n_frames:
+        return 0.0
+    return 1.0 - sum(end - first for first, end in spans) / n_frames
@@ -0,0 +1,155 @@
+"""
+Content-addressed chromagram cache
+Keys are a hash of the audio content plus the feature parameters, so retries,
+resubmissions and template/segmentation tweaks skip the CQT entirely.
+Two tiers: a local disk directory with LRU eviction, backed by S3.
+Entries are float16 chromagrams (plus the onset envelope when beat tracking
+needs it) in compressed .npz files.
+"""
+
+import hashlib
+import io
+import json
+import logging
+import os
+
+import numpy as np
+
+logger = logging.getLogger()
+
+# Bump when the chroma computation changes in a way the params don't capture
+CACHE_VERSION = 1
+
+def pcm_digest(y):
+    """Hash of decoded PCM samples"""
+    return 'pcm:' + hashlib.blake2b(np.ascontiguousarray(y).view(np.uint8), digest_size=20).hexdigest()
+
+def file_digest(path, chunk_size=1 << 20):
+    """Hash of the source file bytes (used when the PCM is streamed, not held)"""
+    h = hashlib.blake2b(digest_size=20)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            h.update(chunk)
+    return 'file:' + h.hexdigest()
+
+def cache_key(audio_digest, params):
+    """Combine the audio digest and feature parameters into one cache key"""
+    payload = json.dumps({'v': CACHE_VERSION, 'audio': audio_digest, 'params': params}, sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+def is_missing_key(error):
+    """True for the S3 'object does not exist' ClientError"""
+    code = getattr(error, 'response', {}).get('Error', {}).get('Code')
+    return code in ('NoSuchKey', '404')
+
+def encode_entry(chromagram, duration, onset_env=None):
+    buf = io.BytesIO()
+    arrays = {'chroma': chromagram.astype(np.float16), 'duration': np.float64(duration)}
+    if onset_env is not None:
+        arrays['onset'] = onset_env.astype(np.float16)
+    np.savez_compressed(buf, **arrays)
+    return buf.getvalue()
+
+def decode_entry(data):
+    """Returns (chromagram, duration, onset envelope or None)"""
+    with np.load(io.BytesIO(data)) as npz:
+        onset_env = npz['onset'].astype(np.float32) if 'onset' in npz.files else None
+        return npz['chroma'].astype(np.float32), float(npz['duration']), onset_env
+
+class FeatureCache:
+    """Local LRU directory in front of an optional S3 prefix"""
+
+    def __init__(self, local_dir, max_bytes, s3_bucket='', s3_prefix='feature-cache/', s3_client=None):
+        self.local_dir = local_dir
+        self.max_bytes = max_bytes
+        self.s3_bucket = s3_bucket
+        self.s3_prefix = s3_prefix
+        self.s3_client = s3_client
+        self.stats = {'localHits': 0, 's3Hits': 0, 'misses': 0, 'writes': 0, 'errors': 0}
+        os.makedirs(local_dir, exist_ok=True)
+
+    def _local_path(self, key):
+        return os.path.join(self.local_dir, f'{key}.npz')
+
+    def get(self, key):
+        """Return (chromagram, duration, onset envelope) or None; promotes S3 hits to the local tier"""
+        path = self._local_path(key)
+        try:
+            with open(path, 'rb') as f:
+                entry = decode_entry(f.read())
+            # Touch for LRU ordering
+            os.utime(path)
+            self.stats['localHits'] += 1
+            logger.info(f"Feature cache hit (local): {key[:12]}")
+            return entry
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.warning(f"Dropping unreadable cache entry {path}: {e}")
+            self.stats['errors'] += 1
+            self._remove(path)
+
+        if self.s3_bucket and self.s3_client:
+            try:
+                obj = self.s3_client.get_object(Bucket=self.s3_bucket, Key=f'{self.s3_prefix}{key}.npz')
+                data = obj['Body'].read()
+                entry = decode_entry(data)
+                self._write_local(key, data)
+                self.stats['s3Hits'] += 1
+                logger.info(f"Feature cache hit (s3): {key[:12]}")
+                return entry
+            except Exception as e:
+                if not is_missing_key(e):
+                    logger.warning(f"Feature cache S3 lookup failed: {e}")
+                    self.stats['errors'] += 1
+
+        self.stats['misses'] += 1
+        logger.info(f"Feature cache miss: {key[:12]}")
+        return None
+
+    def put(self, key, chromagram, duration, onset_env=None):
+        """Store an entry in both tiers; cache failures never fail the job"""
+        try:
+            data = encode_entry(chromagram, duration, onset_env)
+            self._write_local(key, data)
+            if self.s3_bucket and self.s3_client:
+                self.s3_client.put_object(Bucket=self.s3_bucket, Key=f'{self.s3_prefix}{key}.npz', Body=data)
+            self.stats['writes'] += 1
+        except Exception as e:
+            logger.warning(f"Feature cache write failed: {e}")
+            self.stats['errors'] += 1
+
+    def _write_local(self, key, data):
+        path = self._local_path(key)
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        self._evict()
+
+    def _evict(self):
+        """Delete least recently used entries until the directory fits max_bytes"""
+        entries = []
+        total = 0
+        for name in os.listdir(self.local_dir):
+            if not name.endswith('.npz'):
+                continue
+            path = os.path.join(self.local_dir, name)
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+            total += st.st_size
+
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            self._remove(path)
+            total -= size
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
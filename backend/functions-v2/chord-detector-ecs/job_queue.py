@@ -0,0 +1,183 @@
+"""
+Job queues for the long-running chord detector worker
+SQS in production; a file-backed queue for local runs, an in-memory one for tests.
+All three hand out visibility-timeout leases: a received job stays hidden
+until it's acked, released, or its lease runs out (then it's redelivered).
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+
+logger = logging.getLogger()
+
+class Lease:
+    """A received job plus the handle needed to ack/extend/release it"""
+
+    def __init__(self, job, handle):
+        self.job = job
+        self.handle = handle
+
+class SQSJobQueue:
+    """Jobs are SQS messages with a JSON body: {"jobId", "bucket", "key"}"""
+
+    def __init__(self, queue_url, visibility_timeout=300, wait_seconds=20, sqs_client=None):
+        import boto3
+        self.queue_url = queue_url
+        self.visibility_timeout = visibility_timeout
+        self.wait_seconds = wait_seconds
+        self.sqs = sqs_client or boto3.client('sqs')
+
+    def receive(self):
+        response = self.sqs.receive_message(
+            QueueUrl=self.queue_url,
+            MaxNumberOfMessages=1,
+            WaitTimeSeconds=self.wait_seconds,
+            VisibilityTimeout=self.visibility_timeout
+        )
+        messages = response.get('Messages', [])
+        if not messages:
+            return None
+        message = messages[0]
+        return Lease(json.loads(message['Body']), message['ReceiptHandle'])
+
+    def extend(self, lease, seconds):
+        self.sqs.change_message_visibility(
+            QueueUrl=self.queue_url, ReceiptHandle=lease.handle, VisibilityTimeout=int(seconds)
+        )
+
+    def ack(self, lease):
+        self.sqs.delete_message(QueueUrl=self.queue_url, ReceiptHandle=lease.handle)
+
+    def release(self, lease):
+        self.extend(lease, 0)
+
+    def send(self, job):
+        self.sqs.send_message(QueueUrl=self.queue_url, MessageBody=json.dumps(job))
+
+class MemoryJobQueue:
+    """In-process queue with the same lease semantics as SQS (tests and benchmarks only)"""
+
+    def __init__(self, visibility_timeout=300, wait_seconds=1):
+        self.visibility_timeout = visibility_timeout
+        self.wait_seconds = wait_seconds
+        self._lock = threading.Condition()
+        # message id -> [job, visible_at]
+        self._messages = {}
+
+    def send(self, job):
+        with self._lock:
+            self._messages[uuid.uuid4().hex] = [job, 0.0]
+            self._lock.notify()
+
+    def receive(self):
+        deadline = time.monotonic() + self.wait_seconds
+        with self._lock:
+            while True:
+                now = time.monotonic()
+                for message_id, entry in self._messages.items():
+                    if entry[1] <= now:
+                        entry[1] = now + self.visibility_timeout
+                        return Lease(entry[0], message_id)
+                if now >= deadline:
+                    return None
+                self._lock.wait(min(deadline - now, 0.1))
+
+    def extend(self, lease, seconds):
+        with self._lock:
+            if lease.handle in self._messages:
+                self._messages[lease.handle][1] = time.monotonic() + seconds
+                self._lock.notify()
+
+    def ack(self, lease):
+        with self._lock:
+            self._messages.pop(lease.handle, None)
+
+    def release(self, lease):
+        self.extend(lease, 0)
+
+class FileJobQueue:
+    """
+    Directory-backed queue: one JSON file per job
+    A lease renames the file to <name>.lease.<deadline>; expired leases are
+    renamed back on the next receive, so jobs survive worker crashes.
+    """
+
+    def __init__(self, directory, visibility_timeout=300, wait_seconds=1, poll_interval=0.2):
+        self.directory = directory
+        self.visibility_timeout = visibility_timeout
+        self.wait_seconds = wait_seconds
+        self.poll_interval = poll_interval
+        os.makedirs(directory, exist_ok=True)
+
+    def send(self, job):
+        name = f"{time.time():.6f}-{uuid.uuid4().hex}.json"
+        tmp_path = os.path.join(self.directory, f".{name}.tmp")
+        with open(tmp_path, 'w') as f:
+            json.dump(job, f)
+        os.replace(tmp_path, os.path.join(self.directory, name))
+
+    def _requeue_expired(self):
+        now = time.time()
+        for name in os.listdir(self.directory):
+            if '.lease.' not in name:
+                continue
+            base, deadline = name.split('.lease.')
+            if float(deadline) <= now:
+                try:
+                    os.rename(os.path.join(self.directory, name), os.path.join(self.directory, base))
+                except FileNotFoundError:
+                    pass
+
+    def _lease_path(self, base):
+        return os.path.join(self.directory, f"{base}.lease.{time.time() + self.visibility_timeout:.3f}")
+
+    def receive(self):
+        deadline = time.monotonic() + self.wait_seconds
+        while True:
+            self._requeue_expired()
+            for name in sorted(os.listdir(self.directory)):
+                if not name.endswith('.json'):
+                    continue
+                lease_path = self._lease_path(name)
+                try:
+                    # rename is atomic, so only one worker wins each job
+                    os.rename(os.path.join(self.directory, name), lease_path)
+                except FileNotFoundError:
+                    continue
+                with open(lease_path) as f:
+                    return Lease(json.load(f), lease_path)
+            if time.monotonic() >= deadline:
+                return None
+            time.sleep(self.poll_interval)
+
+    def extend(self, lease, seconds):
+        base = os.path.basename(lease.handle).split('.lease.')[0]
+        new_path = os.path.join(self.directory, f"{base}.lease.{time.time() + seconds:.3f}")
+        os.rename(lease.handle, new_path)
+        lease.handle = new_path
+
+    def ack(self, lease):
+        try:
+            os.remove(lease.handle)
+        except FileNotFoundError:
+            logger.warning(f"Lease already gone when acking: {lease.handle}")
+
+    def release(self, lease):
+        self.extend(lease, 0)
+
+def queue_from_url(url, visibility_timeout=300):
+    """
+    Build a queue from a URL:
+    https://sqs.<region>.amazonaws.com/... -> SQS, file:///path -> FileJobQueue
+    A MemoryJobQueue only lives inside one process, so it has no URL: the
+    trigger that sends jobs and the worker are separate processes
+    """
+    if url.startswith('file://'):
+        return FileJobQueue(url[len('file://'):], visibility_timeout=visibility_timeout)
+    if url.startswith('memory://'):
+        raise ValueError("memory:// queues can't be shared between processes; use file:///dir for local runs")
+    return SQSJobQueue(url, visibility_timeout=visibility_timeout)
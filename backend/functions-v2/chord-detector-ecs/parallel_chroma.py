@@ -0,0 +1,173 @@
+"""
+Process-pool chroma extraction over overlapping windows
+The decoded signal is placed in shared memory once; each worker attaches to
+it, runs chroma_cqt on its window (core frames plus CQT context each side)
+and returns only its core columns, which stitch back into the same
+chromagram a single chroma_cqt call would produce.
+"""
+
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+import librosa
+
+from streaming import CQT_BINS_PER_OCTAVE, cqt_context_samples
+
+logger = logging.getLogger()
+
+# Don't bother splitting below this many frames of core audio per window
+MIN_WINDOW_FRAMES = 430
+
+_executor = None
+_executor_workers = 0
+
+def available_cpus():
+    """CPUs this process may run on (respects container/cgroup affinity)"""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+def get_executor(n_workers):
+    """Reuse one pool across jobs so warm workers keep librosa imported"""
+    global _executor, _executor_workers
+    if _executor is None or _executor_workers != n_workers:
+        if _executor is not None:
+            _executor.shutdown()
+        _executor = ProcessPoolExecutor(max_workers=n_workers)
+        _executor_workers = n_workers
+    return _executor
+
+def plan_windows(n_samples, hop_length, context, n_windows, spans=None):
+    """
+    Split the frame range (or each of `spans`, [(first, end)] frame ranges)
+    into about `n_windows` core ranges in total
+    Returns [(first_frame, end_frame, window_start_sample, window_end_sample)]
+    """
+    # chroma_cqt (center=True) gives 1 + n // hop frames
+    n_frames = 1 + n_samples // hop_length
+    if spans is None:
+        spans = [(0, n_frames)]
+    total = sum(end - first for first, end in spans)
+    plan = []
+    for span_first, span_end in spans:
+        # Share the windows out by span length, at least one each
+        n_span = max(1, round(n_windows * (span_end - span_first) / max(total, 1)))
+        edges = np.linspace(span_first, span_end, n_span + 1).astype(int)
+        for first, end in zip(edges[:-1], edges[1:]):
+            if end <= first:
+                continue
+            # Context is a whole number of hops, so window starts stay hop-aligned
+            start_sample = max(0, first * hop_length - context)
+            end_sample = min(n_samples, end * hop_length + context)
+            plan.append((int(first), int(end), start_sample, end_sample))
+    return plan
+
+def _window_features(shm_name, n_samples, window, sr, hop_length, tuning, with_onset):
+    """Worker: compute the core chroma (and onset) columns for one window"""
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        y = np.ndarray((n_samples,), dtype=np.float32, buffer=shm.buf)
+        segment = np.array(y[window[2]:window[3]])
+    finally:
+        shm.close()
+    return _segment_features(segment, window, sr, hop_length, tuning, with_onset)
+
+def _segment_features(segment, window, sr, hop_length, tuning, with_onset):
+    """Core chroma (and onset) columns of one window's samples"""
+    first, end, start_sample, _ = window
+    offset = start_sample // hop_length
+    core = slice(first - offset, end - offset)
+    chroma = librosa.feature.chroma_cqt(y=segment, sr=sr, hop_length=hop_length, tuning=tuning)[:, core]
+    onset = None
+    if with_onset:
+        onset = librosa.onset.onset_strength(y=segment, sr=sr, hop_length=hop_length)[core]
+    return chroma, onset
+
+def _estimate_tuning(y, sr, hop_length, spans=None):
+    """Tuning over the whole signal, or over just the audio in `spans`"""
+    if spans is not None:
+        y = np.concatenate([y[first * hop_length:end * hop_length] for first, end in spans])
+    return librosa.estimate_tuning(y=y, sr=sr, bins_per_octave=CQT_BINS_PER_OCTAVE)
+
+def spans_chromagram(y, sr, hop_length, spans, with_onset=False, n_windows=None, on_window=None):
+    """
+    In-process chroma_cqt of only the frames in `spans`; other columns are zero
+    Each span is analyzed with CQT context either side, so its columns match a
+    full-signal chroma_cqt. Tuning is estimated on the spans' audio only.
+    Windows run in time order; see parallel_chromagram for `on_window`.
+    """
+    context = cqt_context_samples(sr, hop_length)
+    n_frames = 1 + len(y) // hop_length
+    chroma = np.zeros((12, n_frames), dtype=np.float32)
+    onset = librosa.onset.onset_strength(y=y, sr=sr, hop_length=hop_length) if with_onset else None
+    if not spans:
+        return chroma, onset
+
+    tuning = _estimate_tuning(y, sr, hop_length, spans)
+    for window in plan_windows(len(y), hop_length, context, n_windows or len(spans), spans):
+        chroma[:, window[0]:window[1]], _ = _segment_features(
+            y[window[2]:window[3]], window, sr, hop_length, tuning, False
+        )
+        if on_window:
+            on_window(chroma, window[1])
+    return chroma, onset
+
+def parallel_chromagram(y, sr, hop_length, n_workers, with_onset=False, spans=None, window_frames=None, on_window=None):
+    """
+    chroma_cqt over `n_workers` processes; returns (chromagram, onset or None)
+    Tuning is estimated once on the whole signal, exactly as chroma_cqt does
+    With `spans` only those frame ranges are analyzed (see spans_chromagram)
+    `window_frames` caps the frames per window, and `on_window(chroma, end_frame)`
+    is called in time order as windows finish, with `chroma` filled up to end_frame
+    """
+    y = np.ascontiguousarray(y, dtype=np.float32)
+    context = cqt_context_samples(sr, hop_length)
+    n_frames = 1 + len(y) // hop_length
+    n_windows = min(n_workers, max(1, n_frames // MIN_WINDOW_FRAMES))
+    if window_frames:
+        active_frames = n_frames if spans is None else sum(end - first for first, end in spans)
+        n_windows = max(n_windows, -(-active_frames // window_frames))
+
+    # An all-silent (gated) track has no spans: spans_chromagram returns zero chroma
+    if n_workers <= 1 or n_frames // MIN_WINDOW_FRAMES <= 1 or spans == []:
+        if spans is not None or on_window:
+            spans = spans if spans is not None else [(0, n_frames)]
+            return spans_chromagram(y, sr, hop_length, spans, with_onset, n_windows, on_window)
+        chroma = librosa.feature.chroma_cqt(y=y, sr=sr, hop_length=hop_length)
+        onset = librosa.onset.onset_strength(y=y, sr=sr, hop_length=hop_length) if with_onset else None
+        return chroma, onset
+
+    tuning = _estimate_tuning(y, sr, hop_length, spans)
+    plan = plan_windows(len(y), hop_length, context, n_windows, spans)
+    logger.info(f"Parallel chroma: {len(plan)} windows on {n_workers} workers, context={context / sr:.2f}s")
+
+    chroma = np.zeros((12, n_frames), dtype=np.float32)
+    onset = np.zeros(n_frames, dtype=np.float32) if with_onset and spans is None else None
+    shm = shared_memory.SharedMemory(create=True, size=y.nbytes)
+    try:
+        np.ndarray(y.shape, dtype=np.float32, buffer=shm.buf)[:] = y
+        executor = get_executor(n_workers)
+        # Onsets of gated tracks come from the whole signal below
+        window_onsets = onset is not None
+        futures = [
+            executor.submit(_window_features, shm.name, len(y), window, sr, hop_length, tuning, window_onsets)
+            for window in plan
+        ]
+        for window, future in zip(plan, futures):
+            columns, onset_columns = future.result()
+            chroma[:, window[0]:window[1]] = columns
+            if window_onsets:
+                onset[window[0]:window[1]] = onset_columns
+            if on_window:
+                on_window(chroma, window[1])
+    finally:
+        shm.close()
+        shm.unlink()
+
+    if with_onset and onset is None:
+        onset = librosa.onset.onset_strength(y=y, sr=sr, hop_length=hop_length)
+    return chroma, onset
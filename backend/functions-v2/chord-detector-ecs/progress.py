@@ -0,0 +1,47 @@
+"""
+Throttled interim results for long chord analyses
+The analysis reports after every window of audio; the reporter decides
+whether enough wall time has passed to be worth a write, so partial chords
+and a finer progress value reach the job record without burning write
+capacity on every block.
+"""
+
+import logging
+import time
+
+logger = logging.getLogger()
+
+class ProgressReporter:
+    """
+    Publish (chord segments, progress) through `write` at most once per `min_interval` seconds
+    Progress moves from `start_progress` to `end_progress` with the analyzed fraction.
+    """
+
+    def __init__(self, write, min_interval, start_progress=70, end_progress=84, clock=time.monotonic):
+        self.write = write
+        self.min_interval = min_interval
+        self.start_progress = start_progress
+        self.end_progress = end_progress
+        self.clock = clock
+        self.writes = 0
+        self._last = clock()
+
+    def due(self):
+        """True when the next report would be published (check before building it)"""
+        return self.clock() - self._last >= self.min_interval
+
+    def progress(self, analyzed_seconds, total_seconds):
+        fraction = min(1.0, analyzed_seconds / total_seconds) if total_seconds > 0 else 0.0
+        return self.start_progress + int((self.end_progress - self.start_progress) * fraction)
+
+    def publish(self, chord_segments, analyzed_seconds, total_seconds):
+        """Write one interim result; failures are logged, never raised"""
+        progress = self.progress(analyzed_seconds, total_seconds)
+        try:
+            self.write(chord_segments, progress, round(analyzed_seconds, 2))
+            self.writes += 1
+            logger.info(f"Published {len(chord_segments)} interim chords at {analyzed_seconds:.0f}s (progress {progress})")
+        except Exception as e:
+            logger.warning(f"Interim result write failed: {e}")
+        # Throttle failed writes too, so a rejected update isn't retried every block
+        self._last = self.clock()
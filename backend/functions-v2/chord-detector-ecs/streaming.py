@@ -0,0 +1,177 @@
+"""
+Block-streaming chroma extraction for long recordings
+Decodes and analyzes audio in overlapping blocks so peak memory is bounded by
+the block size instead of the track length
+"""
+
+import logging
+from collections import namedtuple
+
+import numpy as np
+import librosa
+
+logger = logging.getLogger()
+
+# Chroma CQT defaults used by detect_chords (librosa.feature.chroma_cqt)
+CQT_BINS_PER_OCTAVE = 36
+CQT_N_OCTAVES = 7
+
+# Where stream_chromagram has got to after a block: next frame to emit, global
+# sample its rolling buffer starts at, samples decoded so far, tuning held.
+# Enough to resume the stream with the same output (see checkpoint.py)
+StreamPosition = namedtuple('StreamPosition', ['next_frame', 'buffer_start', 'total_samples', 'tuning'])
+
+def cqt_context_samples(sr, hop_length):
+    """
+    Samples of context each side of a block needed for edge-free CQT frames
+    This is the longest CQT filter (lowest bin) rounded up to a whole hop
+    """
+    freqs = librosa.cqt_frequencies(
+        CQT_BINS_PER_OCTAVE * CQT_N_OCTAVES,
+        fmin=librosa.note_to_hz('C1'),
+        bins_per_octave=CQT_BINS_PER_OCTAVE
+    )
+    lengths, _ = librosa.filters.wavelet_lengths(freqs=freqs, sr=sr)
+    longest = int(np.ceil(lengths.max()))
+    return int(np.ceil(longest / hop_length)) * hop_length
+
+def iter_audio_blocks(audio_path, sr, block_samples):
+    """
+    Yield mono float32 PCM at `sr` in chunks of roughly `block_samples`
+    `audio_path` may also be a readable binary stream
+    Uses the ffmpeg pipe when available (same decoder as the full-load path),
+    otherwise soundfile with a streaming soxr resampler (same output as
+    librosa.load); formats soundfile can't open fall back to a full librosa.load
+    """
+    from audio_decoder import ffmpeg_binary, is_stream, iter_pcm_blocks
+    if ffmpeg_binary():
+        yield from iter_pcm_blocks(audio_path, sr, block_samples)
+        return
+    if is_stream(audio_path):
+        # soundfile needs a seekable source
+        import io
+        audio_path = io.BytesIO(audio_path.read())
+
+    try:
+        import soundfile as sf
+        import soxr
+        info = sf.info(audio_path)
+    except Exception as e:
+        logger.warning(f"Streaming decode unavailable for {audio_path} ({e}), loading whole file")
+        y, _ = librosa.load(audio_path, sr=sr)
+        for start in range(0, len(y), block_samples):
+            yield y[start:start + block_samples]
+        return
+
+    native_sr = info.samplerate
+    resampler = None
+    if native_sr != sr:
+        resampler = soxr.ResampleStream(native_sr, sr, 1, dtype='float32', quality='HQ')
+
+    # Read enough native samples to produce about one block at the target rate
+    native_block = max(1, int(block_samples * native_sr / sr))
+
+    for block in sf.blocks(audio_path, blocksize=native_block, dtype='float32', always_2d=True):
+        mono = block.mean(axis=1)
+        if resampler is not None:
+            mono = resampler.resample_chunk(mono, last=False)
+        if len(mono):
+            yield mono
+
+    if resampler is not None:
+        tail = resampler.resample_chunk(np.zeros(0, dtype=np.float32), last=True)
+        if len(tail):
+            yield tail
+
+def stream_chromagram(blocks, sr, hop_length, block_frames, tuning=None, with_onset=False, resume=None):
+    """
+    Compute chroma_cqt over a stream of PCM chunks in overlapping blocks
+
+    Each analysis window is `block_frames` frames of new audio plus CQT context
+    on both sides; only the frames whose centers fall in the new audio are kept,
+    so the stitched columns line up with a single full-signal chroma_cqt.
+    Tuning is estimated on the first window and held for the rest of the track.
+    With `with_onset`, the onset strength envelope is sliced the same way.
+    `resume` (a StreamPosition from an earlier run over the same audio)
+    skips the frames already emitted: `blocks` is read from the start again,
+    but only to rebuild the buffer the earlier run held at that point.
+
+    Yields (chroma_block, onset_block or None, n_samples_consumed_so_far, StreamPosition)
+    """
+    context = cqt_context_samples(sr, hop_length)
+    block_samples = block_frames * hop_length
+
+    # Rolling buffer covers global samples [buffer_start, buffer_start + len(buffer))
+    buffer = np.zeros(0, dtype=np.float32)
+    buffer_start = 0
+    # Next frame (global index) that hasn't been emitted yet
+    next_frame = 0
+    total_samples = 0
+    exhausted = False
+    blocks = iter(blocks)
+
+    if resume is not None:
+        next_frame, buffer_start, resume_samples, tuning = resume
+        kept = []
+        while total_samples < resume_samples:
+            try:
+                chunk = next(blocks)
+            except StopIteration:
+                raise ValueError(f"Audio ended at sample {total_samples}, before the resume point {resume_samples}")
+            chunk_start = total_samples
+            total_samples += len(chunk)
+            if total_samples > buffer_start:
+                kept.append(chunk[max(0, buffer_start - chunk_start):])
+        if kept:
+            buffer = np.concatenate(kept)
+
+    while True:
+        # Fill until we have the core block plus right-hand context
+        core_start = next_frame * hop_length
+        needed = core_start + block_samples + context
+        while not exhausted and buffer_start + len(buffer) < needed:
+            try:
+                chunk = next(blocks)
+            except StopIteration:
+                exhausted = True
+                break
+            buffer = np.concatenate((buffer, chunk))
+            total_samples += len(chunk)
+
+        if exhausted:
+            # With center=True the full signal has 1 + n // hop frames
+            last_frame = 1 + total_samples // hop_length
+            core_end_frame = min(next_frame + block_frames, last_frame)
+        else:
+            core_end_frame = next_frame + block_frames
+
+        if core_end_frame <= next_frame:
+            break
+
+        window = buffer
+        if tuning is None:
+            tuning = librosa.estimate_tuning(y=window, sr=sr, bins_per_octave=CQT_BINS_PER_OCTAVE)
+            logger.info(f"Streaming chroma: tuning={tuning:.3f}, context={context / sr:.2f}s")
+
+        chroma = librosa.feature.chroma_cqt(y=window, sr=sr, hop_length=hop_length, tuning=tuning)
+
+        # Buffer starts on a hop boundary, so window frame j is global frame offset + j
+        offset = buffer_start // hop_length
+        core = slice(next_frame - offset, core_end_frame - offset)
+        onset = None
+        if with_onset:
+            onset = librosa.onset.onset_strength(y=window, sr=sr, hop_length=hop_length)[core]
+        next_frame = core_end_frame
+
+        # Drop audio no longer needed as left-hand context (keep two filter
+        # lengths so even a short final window is long enough for the lowest octave)
+        keep_from = max(0, next_frame * hop_length - 2 * context)
+        keep_from -= keep_from % hop_length
+        if keep_from > buffer_start:
+            buffer = buffer[keep_from - buffer_start:]
+            buffer_start = keep_from
+
+        yield chroma[:, core], onset, total_samples, StreamPosition(next_frame, buffer_start, total_samples, float(tuning))
+
+        if exhausted and next_frame >= 1 + total_samples // hop_length:
+            break
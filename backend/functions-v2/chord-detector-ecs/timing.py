@@ -0,0 +1,151 @@
+"""
+Per-stage timing and memory spans for chord jobs
+Each span records wall time, CPU time and peak RSS (and optionally the
+tracemalloc peak) of the process. Cheap enough to leave on: a span costs
+two clock reads plus one /proc read and write on Linux.
+"""
+
+import json
+import logging
+import os
+import resource
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+logger = logging.getLogger()
+
+def read_peak_rss_kb():
+    """Peak RSS since the last reset (VmHWM); falls back to the lifetime peak"""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+def reset_peak_rss():
+    """Reset VmHWM to the current RSS (Linux); returns False where unsupported"""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+def cpu_seconds():
+    """CPU time of this process plus its reaped children (the ffmpeg decoder)"""
+    times = os.times()
+    return time.process_time() + times.children_user + times.children_system
+
+class StageTimer:
+    """
+    Collects named spans for one job
+    Spans may nest; a parent's peak RSS includes its children's.
+    Peak RSS, the tracemalloc peak and CPU time are process-wide: pass
+    process_memory=False when other jobs run in the same process at the
+    same time (batch I/O threads), and spans record wall time and the CPU
+    time of their own thread only.
+    """
+
+    def __init__(self, trace_python_memory=False, process_memory=True):
+        self.stages = {}
+        self.process_memory = process_memory
+        self.trace_python_memory = trace_python_memory and process_memory
+        self._open = []
+        self._started = time.perf_counter()
+        if self.trace_python_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def _stage(self, name):
+        stage = {'wallMs': 0.0, 'cpuMs': 0.0, 'calls': 0}
+        if self.process_memory:
+            stage['peakRssMb'] = 0.0
+        return self.stages.setdefault(name, stage)
+
+    @contextmanager
+    def span(self, name):
+        if not self.process_memory:
+            wall = time.perf_counter()
+            cpu = time.thread_time()
+            try:
+                yield
+            finally:
+                stage = self._stage(name)
+                stage['wallMs'] = round(stage['wallMs'] + (time.perf_counter() - wall) * 1000, 1)
+                stage['cpuMs'] = round(stage['cpuMs'] + (time.thread_time() - cpu) * 1000, 1)
+                stage['calls'] += 1
+            return
+
+        # Fold the peak so far into every open span before resetting it
+        peak = read_peak_rss_kb()
+        for entry in self._open:
+            entry['peak_kb'] = max(entry['peak_kb'], peak)
+        reset_peak_rss()
+        if self.trace_python_memory:
+            tracemalloc.reset_peak()
+
+        entry = {'peak_kb': 0}
+        self._open.append(entry)
+        wall = time.perf_counter()
+        cpu = cpu_seconds()
+        try:
+            yield
+        finally:
+            wall = time.perf_counter() - wall
+            cpu = cpu_seconds() - cpu
+            peak = read_peak_rss_kb()
+            for open_entry in self._open:
+                open_entry['peak_kb'] = max(open_entry['peak_kb'], peak)
+            self._open.pop()
+
+            stage = self._stage(name)
+            stage['wallMs'] = round(stage['wallMs'] + wall * 1000, 1)
+            stage['cpuMs'] = round(stage['cpuMs'] + cpu * 1000, 1)
+            stage['peakRssMb'] = max(stage['peakRssMb'], round(entry['peak_kb'] / 1024, 1))
+            stage['calls'] += 1
+            if self.trace_python_memory:
+                traced = round(tracemalloc.get_traced_memory()[1] / (1024 * 1024), 1)
+                stage['peakTracedMb'] = max(stage.get('peakTracedMb', 0.0), traced)
+
+    def merge(self, stages):
+        """
+        Fold in spans recorded elsewhere (another process's StageTimer.stages)
+        Their memory peaks are kept even when this timer records none
+        """
+        for name, other in stages.items():
+            stage = self._stage(name)
+            stage['wallMs'] = round(stage['wallMs'] + other['wallMs'], 1)
+            stage['cpuMs'] = round(stage['cpuMs'] + other['cpuMs'], 1)
+            stage['calls'] += other['calls']
+            for peak in ('peakRssMb', 'peakTracedMb'):
+                if peak in other:
+                    stage[peak] = max(stage.get(peak, 0.0), other[peak])
+
+    def summary(self):
+        return {
+            'totalMs': round((time.perf_counter() - self._started) * 1000, 1),
+            'stages': self.stages
+        }
+
+    def log(self, job_id):
+        """Emit all spans as one structured log record"""
+        logger.info(json.dumps({'event': 'chord_job_timings', 'jobId': job_id, **self.summary()}))
+
+class NullTimer:
+    """Drop-in when no timer is passed (benchmarks, direct calls)"""
+
+    @contextmanager
+    def span(self, name):
+        yield
+
+    def merge(self, stages):
+        pass
+
+    def summary(self):
+        return {}
+
+    def log(self, job_id):
+        pass
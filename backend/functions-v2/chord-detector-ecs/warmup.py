@@ -0,0 +1,92 @@
+"""
+Container warm-up for the chord detector
+The first job in a fresh interpreter pays for numba JIT compilation of
+librosa's kernels, lazy scipy/librosa submodule imports and first-call
+setup of the CQT filter banks. Running the analysis path once on a few
+seconds of synthetic audio moves that cost out of the job:
+  - at image build time (python warmup.py) with NUMBA_CACHE_DIR pointing
+    into the image, so the compiled kernels ship with it for every
+    profile's sr/hop
+  - at container start (app.main, WARMUP_ON_START), in the background
+    while the first job does its S3 and DynamoDB round trips; with the
+    image's numba cache this only loads compiled code and imports modules
+Usage: DYNAMODB_JOBS_TABLE=warmup AWS_DEFAULT_REGION=us-east-1 python warmup.py [profile ...]
+"""
+
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+logger = logging.getLogger()
+
+# Seconds of synthetic audio per profile (split around a silent gap so the energy gate runs too)
+WARMUP_SECONDS = float(os.environ.get('WARMUP_SECONDS', '12'))
+
+# C major triad
+WARMUP_FREQUENCIES = (261.63, 329.63, 392.0)
+
+def warmup_signal(sr, seconds):
+    """A triad, then silence, then the triad again (the gap is long enough for the energy gate to skip)"""
+    t = np.arange(int(sr * seconds / 4)) / sr
+    tone = sum(np.sin(2 * np.pi * f * t) for f in WARMUP_FREQUENCIES) / len(WARMUP_FREQUENCIES)
+    tone = (0.5 * tone).astype(np.float32)
+    return np.concatenate([tone, np.zeros(2 * len(tone), dtype=np.float32), tone])
+
+def warm_up(detector=None, profiles=None, seconds=WARMUP_SECONDS, all_modes=False):
+    """
+    Run detect_chords once per profile on synthetic audio; returns {profile: seconds}
+    `detector` is the app module (imported when not given; app.main passes
+    itself, since it runs as __main__). `all_modes` also compiles beat
+    tracking when ANALYSIS_MODE is not 'beat' (the image build does, so one
+    image serves both modes). Failures are logged, never raised: a job
+    still works cold.
+    """
+    import soundfile as sf
+    import librosa
+
+    if detector is None:
+        import app as detector
+    profiles = profiles or list(detector.ANALYSIS_PROFILES)
+
+    # Keep the synthetic audio out of the feature cache (and its S3 tier)
+    cache_enabled = detector.FEATURE_CACHE_ENABLED
+    detector.FEATURE_CACHE_ENABLED = False
+    elapsed = {}
+    start = time.perf_counter()
+    try:
+        with tempfile.TemporaryDirectory(prefix='warmup-') as tmp:
+            for name in profiles:
+                profile_start = time.perf_counter()
+                sr = detector.ANALYSIS_PROFILES[name]['sampleRate']
+                path = os.path.join(tmp, f'{name}.wav')
+                y = warmup_signal(sr, seconds)
+                sf.write(path, y, sr)
+                detector.detect_chords(path, profile=name)
+                if all_modes and detector.ANALYSIS_MODE != 'beat':
+                    onset_env = librosa.onset.onset_strength(y=y, sr=sr)
+                    librosa.beat.beat_track(onset_envelope=onset_env, sr=sr)
+                elapsed[name] = round(time.perf_counter() - profile_start, 3)
+    except Exception as e:
+        logger.warning(f"Warm-up failed, the first job will run cold: {e}", exc_info=True)
+    finally:
+        detector.FEATURE_CACHE_ENABLED = cache_enabled
+
+    logger.info(json.dumps({
+        'event': 'chord_warmup',
+        'profiles': elapsed,
+        'totalSeconds': round(time.perf_counter() - start, 3),
+        'numbaCacheDir': os.environ.get('NUMBA_CACHE_DIR', '')
+    }))
+    return elapsed
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    import app
+    profiles = sys.argv[1:] or list(app.ANALYSIS_PROFILES)
+    # Fail the image build rather than ship a cache missing a profile
+    sys.exit(0 if len(warm_up(app, profiles, all_modes=True)) == len(profiles) else 1)
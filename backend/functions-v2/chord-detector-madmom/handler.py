@@ -4,33 +4,76 @@ Detects chords using Madmom CNN+CRF model
 Deployed as Docker container
 """
 
+import importlib.util
 import json
-import boto3
 import os
 import logging
 import tempfile
 import numpy as np
 
+from audio_decoder import load_audio
+from job_guard import BUSY, claim_job, find_existing_result, is_condition_failure, result_guard
+from result_store import encode_json_result, offload_result, summarize_chords
+from s3_fetch import BufferReader, fetch_object
+from s3_stream import needs_seekable_input, open_audio_object, spool_to_file
+
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
-# Import Librosa for basic chord detection
-try:
-    import librosa
-    import numpy as np
-    LIBROSA_AVAILABLE = True
-except ImportError:
+# Librosa for basic chord detection, imported on first use (see get_librosa)
+LIBROSA_AVAILABLE = importlib.util.find_spec('librosa') is not None
+if not LIBROSA_AVAILABLE:
     logger.warning("Librosa not available, using mock mode")
-    LIBROSA_AVAILABLE = False
 
 # For now, we'll use mock mode until we can properly install audio libraries
 LIBROSA_AVAILABLE = False
 
-s3_client = boto3.client('s3')
-dynamodb = boto3.resource('dynamodb')
+# Loaded on first use, so a cold start doesn't pay for boto3 (~0.1 s per
+# client) or librosa before the first request needs them
+s3_client = None
+dynamodb = None
+librosa = None
+
+def get_s3_client():
+    """Shared S3 client"""
+    global s3_client
+    if s3_client is None:
+        import boto3
+        s3_client = boto3.client('s3')
+    return s3_client
+
+def get_dynamodb():
+    """Shared DynamoDB resource"""
+    global dynamodb
+    if dynamodb is None:
+        import boto3
+        dynamodb = boto3.resource('dynamodb')
+    return dynamodb
+
+def get_librosa():
+    """The librosa module, imported by the first analysis"""
+    global librosa
+    if librosa is None:
+        import librosa as librosa_module
+        librosa = librosa_module
+    return librosa
 
 JOBS_TABLE = os.environ['DYNAMODB_JOBS_TABLE']
 
+# Objects at least this large are fetched with parallel ranged GETs
+S3_PARALLEL_FETCH_MB = float(os.environ.get('S3_PARALLEL_FETCH_MB', '64'))
+
+# Results larger than this (bytes of JSON) are stored in S3 behind a chordsRef pointer (0 = never)
+RESULT_OFFLOAD_BYTES = int(os.environ.get('RESULT_OFFLOAD_BYTES', '16384'))
+# Bucket for offloaded results, under results/ (must not expire them; the job's audio bucket,
+# the fallback, deletes objects after a day and would leave chordsRef dangling)
+RESULTS_BUCKET = os.environ.get('RESULTS_BUCKET', '')
+
+# Bump when detection changes enough that stored results should be recomputed
+ENGINE_VERSION = os.environ.get('ENGINE_VERSION', '1')
+# A run's lease on a job; a duplicate run waits this long before taking over a silent one
+CLAIM_LEASE_SECONDS = int(os.environ.get('CLAIM_LEASE_SECONDS', '900'))
+
 # Chord mapping
 CHORD_LABELS = ['N', 'C', 'C#', 'D', 'D#', 'E', 'F', 'F#', 'G', 'G#', 'A', 'A#', 'B',
                 'Cm', 'C#m', 'Dm', 'D#m', 'Em', 'Fm', 'F#m', 'Gm', 'G#m', 'Am', 'A#m', 'Bm']
@@ -44,34 +87,75 @@ def lambda_handler(event, context):
         job_id = event['jobId']
         bucket = event['bucket']
         key = event['key']
+        table = get_dynamodb().Table(JOBS_TABLE)
+        engine = engine_version()
         
-        # Update status
-        update_job_status(job_id, 'DETECTING_CHORDS', 70)
+        # Skip work a previous run already finished for this audio and engine
+        etag = get_s3_client().head_object(Bucket=bucket, Key=key).get('ETag', '').strip('"')
+        if find_existing_result(table, job_id, etag, engine):
+            logger.info(f"Job {job_id} already has {engine} chords for etag {etag}, skipping analysis")
+            return {'statusCode': 200, 'body': {'jobId': job_id, 'skipped': True}}
         
-        # Download audio from S3
+        # Update status (and take the job's lease, unless a live duplicate holds it)
+        if claim_job(table, job_id, context.aws_request_id, CLAIM_LEASE_SECONDS, 'DETECTING_CHORDS', 70, 'lambda') == BUSY:
+            return {'statusCode': 409, 'body': {'jobId': job_id, 'error': 'Job is being processed by another run'}}
+        
+        # Stream audio from S3 (containers that need seeking are spooled to /tmp)
         audio_path = f'/tmp/{job_id}.mp3'
-        logger.info(f"Downloading from S3: {bucket}/{key}")
-        s3_client.download_file(bucket, key, audio_path)
+        logger.info(f"Streaming from S3: {bucket}/{key}")
+        audio = open_audio_object(get_s3_client(), bucket, key)
+        audio_source = audio.stream
+        if needs_seekable_input(audio):
+            audio_source = spool_to_file(audio, audio_path)
+        elif (audio.size or 0) >= S3_PARALLEL_FETCH_MB * 1024 * 1024:
+            # Large upload: concurrent ranged GETs into one buffer beat the single body
+            audio.stream.close()
+            fetched = fetch_object(get_s3_client(), bucket, key, size=audio.size, etag=audio.etag)
+            audio_source = BufferReader(fetched.buffer)
         
         # Detect chords
         logger.info("Running chord detection...")
-        chords_data = detect_chords(audio_path)
+        chords_data = detect_chords(audio_source)
         
-        # Update job with chords
-        table = dynamodb.Table(JOBS_TABLE)
-        table.update_item(
-            Key={'jobId': job_id},
-            UpdateExpression='SET chordsData = :chords, #status = :status, progress = :progress, updatedAt = :updated',
-            ExpressionAttributeNames={'#status': 'status'},
-            ExpressionAttributeValues={
-                ':chords': chords_data,
-                ':status': 'CHORDS_DETECTED',
-                ':progress': 85,
-                ':updated': context.request_id
-            }
-        )
+        # Update job with chords (large results go to S3 behind a pointer)
+        chords_attrs = {'chordsData': chords_data}
+        if RESULT_OFFLOAD_BYTES and len(json.dumps(chords_data)) > RESULT_OFFLOAD_BYTES:
+            pointer = offload_result(
+                get_s3_client(), RESULTS_BUCKET or bucket, job_id, 'chords', encode_json_result(chords_data), 'json.gz'
+            )
+            chords_attrs = {'chordsRef': pointer, 'chordsSummary': summarize_chords(chords_data)}
+        stale_attrs = [name for name in ('chordsBin', 'chordsData', 'chordsRef', 'chordsSummary') if name not in chords_attrs]
+        
+        # Tagged with the audio etag/engine, and only while this run holds the lease
+        guard_set, guard_remove, guard_condition, guard_values = result_guard(context.aws_request_id, etag, engine)
+        update_expr = 'SET #status = :status, progress = :progress, updatedAt = :updated, ' + guard_set
+        expr_values = {
+            ':status': 'CHORDS_DETECTED',
+            ':progress': 85,
+            ':updated': context.aws_request_id,
+            **guard_values
+        }
+        for name, value in chords_attrs.items():
+            update_expr += f', {name} = :{name}'
+            expr_values[f':{name}'] = value
+        
+        try:
+            table.update_item(
+                Key={'jobId': job_id},
+                UpdateExpression=update_expr + ' REMOVE ' + ', '.join(stale_attrs + guard_remove),
+                ConditionExpression=guard_condition,
+                ExpressionAttributeNames={'#status': 'status'},
+                ExpressionAttributeValues=expr_values
+            )
+        except Exception as e:
+            if not is_condition_failure(e):
+                raise
+            logger.warning(f"Lost the lease on job {job_id}; keeping the other run's result")
+            audio.stream.close()
+            return {'statusCode': 409, 'body': {'jobId': job_id, 'error': 'Job was taken over by another run'}}
         
         # Clean up
+        audio.stream.close()
         if os.path.exists(audio_path):
             os.remove(audio_path)
         
@@ -91,10 +175,15 @@ def lambda_handler(event, context):
             'body': {'error': str(e)}
         }
 
-def detect_chords(audio_path):
+def engine_version():
+    """Identity of the results this handler produces; a stored result is reused only on a match"""
+    return f"{'librosa-basic' if LIBROSA_AVAILABLE else 'mock'}@{ENGINE_VERSION}"
+
+def detect_chords(audio_source):
     """
     Detect chords using Librosa (basic implementation)
     For production, replace with Madmom CNN+CRF
+    `audio_source` is a local path or a readable stream (S3 object body)
     Returns timestamped chord progressions
     """
     
@@ -104,11 +193,11 @@ def detect_chords(audio_path):
     
     try:
         # Load audio
-        logger.info(f"Loading audio file: {audio_path}")
-        y, sr = librosa.load(audio_path, sr=22050)
+        logger.info("Loading audio")
+        y, sr = load_audio(audio_source, sr=22050)
         
         # Get chroma features
-        chroma = librosa.feature.chroma_cqt(y=y, sr=sr, hop_length=512)
+        chroma = get_librosa().feature.chroma_cqt(y=y, sr=sr, hop_length=512)
         
         # Simple chord detection based on chroma
         chord_list = []
@@ -199,7 +288,7 @@ def get_mock_chords():
 def update_job_status(job_id, status, progress, error=None):
     """Update job status in DynamoDB"""
     try:
-        table = dynamodb.Table(JOBS_TABLE)
+        table = get_dynamodb().Table(JOBS_TABLE)
         update_expr = 'SET #status = :status, progress = :progress, updatedAt = :updated'
         expr_values = {
             ':status': status,
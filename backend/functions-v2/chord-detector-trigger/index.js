@@ -2,10 +2,12 @@
 // Triggers ECS Fargate task for chord detection
 
 const { ECSClient, RunTaskCommand } = require('@aws-sdk/client-ecs');
+const { SQSClient, SendMessageCommand } = require('@aws-sdk/client-sqs');
 const { DynamoDBClient } = require('@aws-sdk/client-dynamodb');
 const { DynamoDBDocumentClient, UpdateCommand } = require('@aws-sdk/lib-dynamodb');
 
 const ecsClient = new ECSClient({});
+const sqsClient = new SQSClient({});
 const dynamoClient = new DynamoDBClient({});
 const docClient = DynamoDBDocumentClient.from(dynamoClient);
 
@@ -14,12 +16,15 @@ const TASK_DEFINITION = process.env.TASK_DEFINITION || process.env.ECS_TASK_DEFI
 const SUBNET_IDS = process.env.SUBNET_IDS?.split(',') || [process.env.SUBNET_1, process.env.SUBNET_2].filter(Boolean);
 const SECURITY_GROUP = process.env.SECURITY_GROUP || 'sg-0ef0ddb8feae020c5'; // ChordScout VPC default security group
 const JOBS_TABLE = process.env.DYNAMODB_JOBS_TABLE;
+// When set, jobs go to the long-running worker pool instead of one task per job
+const JOB_QUEUE_URL = process.env.JOB_QUEUE_URL;
 
 exports.handler = async (event) => {
   console.log('Event:', JSON.stringify(event, null, 2));
   
   try {
-    const { jobId, bucket, key } = event;
+    // profile (optional): fast | balanced | accurate analysis profile
+    const { jobId, bucket, key, profile } = event;
     
     if (!jobId || !bucket || !key) {
       throw new Error('Missing required parameters: jobId, bucket, or key');
@@ -28,6 +33,26 @@ exports.handler = async (event) => {
     // Update job status
     await updateJobStatus(jobId, 'DETECTING_CHORDS', 70);
     
+    if (JOB_QUEUE_URL) {
+      console.log('Queueing job for chord detector workers...');
+      
+      const sendResponse = await sqsClient.send(new SendMessageCommand({
+        QueueUrl: JOB_QUEUE_URL,
+        MessageBody: JSON.stringify({ jobId, bucket, key, ...(profile && { profile }) })
+      }));
+      
+      console.log('Job queued:', sendResponse.MessageId);
+      
+      return {
+        statusCode: 200,
+        body: {
+          jobId,
+          messageId: sendResponse.MessageId,
+          message: 'Chord detection job queued'
+        }
+      };
+    }
+    
     console.log('Starting ECS task for chord detection...');
     
     // Run ECS task
@@ -50,7 +75,8 @@ exports.handler = async (event) => {
               { name: 'JOB_ID', value: jobId },
               { name: 'AUDIO_BUCKET', value: bucket },
               { name: 'AUDIO_KEY', value: key },
-              { name: 'DYNAMODB_JOBS_TABLE', value: JOBS_TABLE }
+              { name: 'DYNAMODB_JOBS_TABLE', value: JOBS_TABLE },
+              ...(profile ? [{ name: 'JOB_PROFILE', value: profile }] : [])
             ]
           }
         ]
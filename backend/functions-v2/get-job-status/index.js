@@ -1,11 +1,16 @@
 // Lambda: Get Job Status
 // API endpoint for frontend to poll job status
+// A result offloaded to S3 (chordsRef) is only fetched for ?full=1; other
+// polls get its summary and a fingerprint of it
 
 const { DynamoDBClient } = require('@aws-sdk/client-dynamodb');
+const { S3Client } = require('@aws-sdk/client-s3');
 const { DynamoDBDocumentClient, GetCommand } = require('@aws-sdk/lib-dynamodb');
+const { decodeChords, resolveChordsData } = require('./chord-codec');
 
 const dynamoClient = new DynamoDBClient({});
 const docClient = DynamoDBDocumentClient.from(dynamoClient);
+const s3Client = new S3Client({});
 
 const JOBS_TABLE = process.env.DYNAMODB_JOBS_TABLE;
 
@@ -14,6 +19,7 @@ exports.handler = async (event) => {
   
   try {
     const jobId = event.pathParameters?.jobId || event.jobId;
+    const full = ['1', 'true'].includes(String(event.queryStringParameters?.full ?? event.full));
     
     if (!jobId) {
       return {
@@ -45,6 +51,20 @@ exports.handler = async (event) => {
     
     const job = result.Item;
     
+    // Inline results are decoded in place; an offloaded one costs an S3 read, so only when asked for
+    let chordsData;
+    let chordsError;
+    if (!job.chordsRef || full) {
+      // A stored result that can't be read (e.g. its S3 object is gone) must not fail every poll
+      try {
+        chordsData = await resolveChordsData(job, s3Client);
+      } catch (error) {
+        console.error(`Could not resolve chords for job ${jobId}:`, error);
+        chordsData = job.chordsSummary;
+        chordsError = 'Chord result is unavailable';
+      }
+    }
+    
     // Return job status
     return {
       statusCode: 200,
@@ -56,6 +76,15 @@ exports.handler = async (event) => {
         jobId: job.jobId,
         status: job.status,
         progress: job.progress || 0,
+        // Interim chords while a long analysis is still running (chordsBin-encoded unless stored as maps)
+        partialChords: job.partialChordsBin ? decodeChords(job.partialChordsBin).chords : job.partialChords,
+        analyzedSeconds: job.analyzedSeconds,
+        // Final chords, expanded from chordsBin, or fetched from S3 (chordsRef) for ?full=1
+        chordsData,
+        chordsError,
+        // Offloaded result: key, duration, ... and the hash that changes with it (fetch with ?full=1)
+        chordsSummary: job.chordsRef ? job.chordsSummary : undefined,
+        chordsRef: job.chordsRef ? { sha256: job.chordsRef.sha256, bytes: job.chordsRef.bytes } : undefined,
         videoTitle: job.videoTitle,
         youtubeUrl: job.youtubeUrl,
         pdfUrl: job.pdfUrl,
@@ -5,6 +5,7 @@ const { S3Client, PutObjectCommand } = require('@aws-sdk/client-s3');
 const { DynamoDBClient } = require('@aws-sdk/client-dynamodb');
 const { DynamoDBDocumentClient, GetCommand, UpdateCommand } = require('@aws-sdk/lib-dynamodb');
 const { jsPDF } = require('jspdf');
+const { resolveChordsData } = require('./chord-codec');
 
 const s3Client = new S3Client({});
 const dynamoClient = new DynamoDBClient({});
@@ -33,7 +34,8 @@ exports.handler = async (event) => {
       throw new Error('Job not found');
     }
     
-    const { lyricsData, chordsData, videoTitle } = job;
+    const { lyricsData, videoTitle } = job;
+    const chordsData = await resolveChordsData(job, s3Client);
     
     console.log('Generating PDF...');
     console.log('Video title:', videoTitle);
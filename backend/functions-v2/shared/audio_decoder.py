@@ -0,0 +1,235 @@
+"""
+Audio decoder: ffmpeg pipe to mono float32 PCM at the analysis rate
+Spawns ffmpeg once per file so decode, downmix and resample happen in a single
+native pass; falls back to librosa.load when ffmpeg isn't installed
+Sources are file paths or readable binary streams (e.g. an S3 object body),
+which are fed to ffmpeg's stdin as they arrive
+"""
+
+import logging
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+logger = logging.getLogger()
+
+FFMPEG_PATH = os.environ.get('FFMPEG_PATH', 'ffmpeg')
+
+# Bytes per float32 sample
+SAMPLE_BYTES = 4
+
+# Chunk size when copying a source stream into ffmpeg's stdin
+FEED_CHUNK_BYTES = 1 << 16
+
+# Kill a decode that runs longer than this (0 = no limit); a streamed decode
+# counts only the time spent waiting on ffmpeg, not on the consumer
+DECODE_TIMEOUT_SECONDS = float(os.environ.get('DECODE_TIMEOUT_SECONDS', '600'))
+
+# ffmpeg's error output is spooled to a temp file; this much of its end goes in the exception
+STDERR_TAIL_BYTES = 4096
+
+_ffmpeg_binary = None
+
+def ffmpeg_binary():
+    """Resolve the ffmpeg executable once, or return None if it isn't installed"""
+    global _ffmpeg_binary
+    if _ffmpeg_binary is None:
+        _ffmpeg_binary = shutil.which(FFMPEG_PATH) or ''
+        if not _ffmpeg_binary:
+            logger.warning(f"ffmpeg not found ({FFMPEG_PATH}), decoding with librosa")
+    return _ffmpeg_binary or None
+
+def ffmpeg_command(source, sr):
+    """ffmpeg invocation emitting raw mono float32 little-endian PCM on stdout"""
+    return [
+        ffmpeg_binary(), '-nostdin', '-hide_banner', '-loglevel', 'error',
+        '-i', source,
+        '-vn', '-ac', '1', '-ar', str(sr),
+        '-f', 'f32le', '-acodec', 'pcm_f32le', 'pipe:1'
+    ]
+
+def is_stream(source):
+    """True for file-like sources (anything with .read), False for paths"""
+    return hasattr(source, 'read')
+
+def _feed_stdin(stream, stdin):
+    """Copy a source stream into ffmpeg's stdin until EOF (or ffmpeg stops reading)"""
+    try:
+        while True:
+            chunk = stream.read(FEED_CHUNK_BYTES)
+            if not chunk:
+                break
+            stdin.write(chunk)
+    except (BrokenPipeError, ValueError):
+        # ffmpeg exited (error or consumer stopped early); its exit code reports why
+        pass
+    except Exception as e:
+        logger.error(f"Reading the audio source failed: {e}")
+    finally:
+        try:
+            stdin.close()
+        except OSError:
+            pass
+
+def start_ffmpeg(source, sr, stderr=subprocess.PIPE):
+    """
+    Start ffmpeg on a path or stream; returns (process, feeder thread or None)
+    Streams are copied to stdin on a thread so stdout can be drained concurrently
+    """
+    if not is_stream(source):
+        return subprocess.Popen(ffmpeg_command(source, sr), stdout=subprocess.PIPE, stderr=stderr), None
+
+    proc = subprocess.Popen(
+        ffmpeg_command('pipe:0', sr), stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=stderr
+    )
+    feeder = threading.Thread(target=_feed_stdin, args=(source, proc.stdin), daemon=True)
+    feeder.start()
+    return proc, feeder
+
+def read_pcm(stream, initial_samples):
+    """Read float32 PCM from a pipe straight into a growing NumPy buffer"""
+    buffer = np.empty(max(1, initial_samples), dtype=np.float32)
+    filled = 0
+    while True:
+        if filled == buffer.nbytes:
+            buffer = np.resize(buffer, len(buffer) * 2)
+        view = memoryview(buffer).cast('B')
+        n = stream.readinto(view[filled:])
+        if not n:
+            break
+        filled += n
+    return buffer[:filled // SAMPLE_BYTES]
+
+def read_tail(f, n_bytes):
+    """The last `n_bytes` of a file object, decoded as text"""
+    size = f.seek(0, os.SEEK_END)
+    f.seek(max(0, size - n_bytes))
+    return f.read().decode(errors='replace')
+
+def decode_with_ffmpeg(source, sr, timeout=None):
+    """
+    Decode a whole file (or stream) through one ffmpeg process
+    stderr goes to a temp file rather than a pipe: a damaged file can log
+    more than a pipe buffer holds while stdout is still being drained.
+    ffmpeg is killed after `timeout` seconds (DECODE_TIMEOUT_SECONDS)
+    """
+    timeout = DECODE_TIMEOUT_SECONDS if timeout is None else timeout
+    with tempfile.TemporaryFile() as errors:
+        proc, feeder = start_ffmpeg(source, sr, stderr=errors)
+        timed_out = threading.Event()
+        
+        def kill():
+            timed_out.set()
+            proc.kill()
+        
+        watchdog = threading.Timer(timeout, kill) if timeout > 0 else None
+        if watchdog:
+            watchdog.daemon = True
+            watchdog.start()
+        try:
+            # Start with a five minute buffer; it doubles as needed
+            y = read_pcm(proc.stdout, 300 * sr)
+        finally:
+            proc.stdout.close()
+            returncode = proc.wait()
+            if watchdog:
+                watchdog.cancel()
+            if feeder and not timed_out.is_set():
+                # After a timeout the source itself may be stuck; the daemon feeder ends with it
+                feeder.join()
+        stderr = read_tail(errors, STDERR_TAIL_BYTES)
+
+    if timed_out.is_set():
+        raise TimeoutError(f"ffmpeg decode took over {timeout:g}s")
+    if returncode != 0:
+        raise RuntimeError(f"ffmpeg exited with {returncode}: {stderr.strip()}")
+    return y
+
+def load_audio(source, sr=22050):
+    """
+    Decode audio to mono float32 at `sr`
+    Drop-in replacement for librosa.load(source, sr=sr); returns (y, sr)
+    `source` is a path or a readable binary stream; a stream is consumed as it
+    is decoded, so there is no librosa retry if ffmpeg fails on one
+    """
+    if ffmpeg_binary():
+        try:
+            return decode_with_ffmpeg(source, sr), sr
+        except TimeoutError:
+            # librosa would only take longer
+            raise
+        except Exception as e:
+            if is_stream(source):
+                # The stream is spent; there is nothing left to retry with
+                raise
+            logger.warning(f"ffmpeg decode failed, falling back to librosa: {e}")
+
+    import librosa
+    if is_stream(source):
+        # No ffmpeg: audioread only decodes files (m4a, webm, ...), not an
+        # in-memory copy, so spool the stream to a temp file first
+        with tempfile.NamedTemporaryFile() as spooled:
+            shutil.copyfileobj(source, spooled, FEED_CHUNK_BYTES)
+            spooled.flush()
+            return librosa.load(spooled.name, sr=sr)
+    return librosa.load(source, sr=sr)
+
+def iter_pcm_blocks(source, sr, block_samples, timeout=None):
+    """
+    Yield mono float32 PCM at `sr` from one ffmpeg process, `block_samples` at a time
+    stderr is spooled and ffmpeg killed as in decode_with_ffmpeg, except that
+    `timeout` only counts the time spent waiting for blocks: the consumer may
+    take as long as it likes over each one
+    """
+    timeout = DECODE_TIMEOUT_SECONDS if timeout is None else timeout
+    with tempfile.TemporaryFile() as errors:
+        proc, feeder = start_ffmpeg(source, sr, stderr=errors)
+        timed_out = threading.Event()
+        
+        def kill():
+            timed_out.set()
+            proc.kill()
+        
+        waited = 0.0
+        finished = False
+        try:
+            block_bytes = block_samples * SAMPLE_BYTES
+            while True:
+                watchdog = threading.Timer(max(0.0, timeout - waited), kill) if timeout > 0 else None
+                if watchdog:
+                    watchdog.daemon = True
+                    watchdog.start()
+                started = time.monotonic()
+                try:
+                    chunk = proc.stdout.read(block_bytes)
+                finally:
+                    waited += time.monotonic() - started
+                    if watchdog:
+                        watchdog.cancel()
+                if not chunk:
+                    finished = True
+                    break
+                # Drop a trailing partial sample, if any
+                chunk = chunk[:len(chunk) - len(chunk) % SAMPLE_BYTES]
+                yield np.frombuffer(chunk, dtype=np.float32)
+        finally:
+            proc.stdout.close()
+            if not finished:
+                # Consumer stopped early
+                proc.kill()
+            returncode = proc.wait()
+            if feeder and not timed_out.is_set():
+                # After a timeout the source itself may be stuck; the daemon feeder ends with it
+                feeder.join()
+        stderr = read_tail(errors, STDERR_TAIL_BYTES)
+
+    if timed_out.is_set():
+        raise TimeoutError(f"ffmpeg decode took over {timeout:g}s")
+    if returncode != 0:
+        source_name = 'stream' if is_stream(source) else source
+        raise RuntimeError(f"ffmpeg exited with {returncode} while streaming {source_name}: {stderr.strip()}")
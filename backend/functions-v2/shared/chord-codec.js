@@ -0,0 +1,98 @@
+// Decoder for the compact chordsBin attribute written by the chord detector
+// (format documented in chord-detector-ecs/chord_codec.py), and resolver for
+// results offloaded to S3 behind a chordsRef pointer (result_store.py)
+
+const crypto = require('crypto');
+const zlib = require('zlib');
+
+const MAGIC = 'CHRD';
+const FORMAT_VERSION = 1;
+const FLAG_CONFIDENCE = 1;
+const FLAG_BEAT = 2;
+
+function decodeChords(blob) {
+  // DocumentClient returns binary attributes as Uint8Array; wrap without copying
+  const buffer = Buffer.isBuffer(blob) ? blob : Buffer.from(blob.buffer, blob.byteOffset, blob.byteLength);
+  if (buffer.toString('latin1', 0, 4) !== MAGIC) {
+    throw new Error('Not an encoded chord timeline');
+  }
+  const version = buffer.readUInt8(4);
+  const flags = buffer.readUInt8(5);
+  if (version !== FORMAT_VERSION) {
+    throw new Error(`Unsupported chord timeline version ${version}`);
+  }
+  const payload = zlib.inflateSync(buffer.subarray(6));
+
+  let offset = 0;
+  const readLength = () => {
+    const value = payload.readUInt32LE(offset);
+    offset += 4;
+    return value;
+  };
+  const readText = () => {
+    const length = readLength();
+    const text = payload.toString('utf8', offset, offset + length);
+    offset += length;
+    return text;
+  };
+
+  const meta = JSON.parse(readText());
+  const labelText = readText();
+  const labels = labelText ? labelText.split('\n') : [];
+  const n = readLength();
+
+  const ids = payload.subarray(offset, offset + n);
+  offset += n;
+  const starts = offset;
+  offset += 4 * n;
+  const durations = offset;
+  offset += 4 * n;
+  const confidence = flags & FLAG_CONFIDENCE ? offset : -1;
+  if (confidence >= 0) offset += n;
+  const beats = flags & FLAG_BEAT ? offset : -1;
+
+  const chords = new Array(n);
+  for (let i = 0; i < n; i++) {
+    const start = payload.readUInt32LE(starts + 4 * i);
+    const duration = payload.readUInt32LE(durations + 4 * i);
+    const segment = {
+      chord: labels[ids[i]],
+      start: start / 1000,
+      end: (start + duration) / 1000,
+      duration: duration / 1000
+    };
+    if (confidence >= 0) segment.confidence = Math.round(payload[confidence + i] / 255 * 1000) / 1000;
+    if (beats >= 0) segment.beat = payload.readUInt32LE(beats + 4 * i);
+    chords[i] = segment;
+  }
+
+  return { chords, ...meta };
+}
+
+// chordsData of a job item as plain JSON, whichever way it was stored
+function expandChordsData(job) {
+  if (job.chordsBin) {
+    return decodeChords(job.chordsBin);
+  }
+  return job.chordsData;
+}
+
+// chordsData of a job item as plain JSON, fetching it from S3 when the item holds a chordsRef pointer
+async function resolveChordsData(job, s3Client) {
+  const pointer = job.chordsRef;
+  if (!pointer) {
+    return expandChordsData(job);
+  }
+  const { GetObjectCommand } = require('@aws-sdk/client-s3');
+  const result = await s3Client.send(new GetObjectCommand({ Bucket: pointer.bucket, Key: pointer.key }));
+  const body = Buffer.from(await result.Body.transformToByteArray());
+  if (crypto.createHash('sha256').update(body).digest('hex') !== pointer.sha256) {
+    throw new Error(`Result s3://${pointer.bucket}/${pointer.key} does not match its pointer`);
+  }
+  if (pointer.encoding === 'chordsBin') {
+    return decodeChords(body);
+  }
+  return JSON.parse(zlib.gunzipSync(body).toString('utf8'));
+}
+
+module.exports = { decodeChords, expandChordsData, resolveChordsData };
@@ -0,0 +1,123 @@
+"""
+Compact binary encoding of chordsData for the job record
+A chord timeline is stored as one compressed binary attribute instead of
+thousands of nested DynamoDB maps: a label table plus per-segment uint8
+chord ids, uint32 millisecond starts and durations, and optional uint8
+confidences / uint32 beat indices. Everything else in chordsData (key,
+model, duration, ...) rides along as a small JSON header.
+
+Layout (little-endian), version 1:
+  b'CHRD' | uint8 version | uint8 flags | zlib(payload)
+  payload: uint32 meta length, meta JSON,
+           uint32 labels length, labels joined by '\\n',
+           uint32 segment count n,
+           uint8[n] chord ids, uint32[n] start ms, uint32[n] duration ms,
+           [uint8[n] confidence * 255 if flags & 1], [uint32[n] beat if flags & 2]
+The JavaScript decoder is chord-codec.js next to this file; shared/sync.sh
+copies each into the functions that use it.
+"""
+
+import json
+import struct
+import zlib
+
+import numpy as np
+
+MAGIC = b'CHRD'
+FORMAT_VERSION = 1
+
+FLAG_CONFIDENCE = 1
+FLAG_BEAT = 2
+
+# Chord ids are one byte (the extended vocabulary has 181 labels)
+MAX_LABELS = 256
+
+def encode_chords(chords_data, level=6):
+    """Encode a chordsData dict ({'chords': [...], ...}) to bytes"""
+    segments = chords_data.get('chords', [])
+    meta = {name: value for name, value in chords_data.items() if name != 'chords'}
+
+    labels = []
+    label_ids = {}
+    for segment in segments:
+        if segment['chord'] not in label_ids:
+            label_ids[segment['chord']] = len(labels)
+            labels.append(segment['chord'])
+    if len(labels) > MAX_LABELS:
+        raise ValueError(f"{len(labels)} distinct chord labels; the format holds {MAX_LABELS}")
+
+    ids = np.array([label_ids[segment['chord']] for segment in segments], dtype='<u1')
+    starts = np.array([round(segment['start'] * 1000) for segment in segments], dtype='<u4')
+    ends = np.array([round(segment['end'] * 1000) for segment in segments], dtype='<u4')
+
+    flags = 0
+    columns = [ids, starts, ends - starts]
+    if segments and all('confidence' in segment for segment in segments):
+        flags |= FLAG_CONFIDENCE
+        confidence = np.clip([float(segment['confidence']) for segment in segments], 0.0, 1.0)
+        columns.append(np.round(confidence * 255).astype('<u1'))
+    if segments and all('beat' in segment for segment in segments):
+        flags |= FLAG_BEAT
+        columns.append(np.array([segment['beat'] for segment in segments], dtype='<u4'))
+
+    meta_bytes = json.dumps(meta, separators=(',', ':'), default=float).encode()
+    label_bytes = '\n'.join(labels).encode()
+    payload = b''.join([
+        struct.pack('<I', len(meta_bytes)), meta_bytes,
+        struct.pack('<I', len(label_bytes)), label_bytes,
+        struct.pack('<I', len(segments)),
+        *(column.tobytes() for column in columns)
+    ])
+    return MAGIC + struct.pack('<BB', FORMAT_VERSION, flags) + zlib.compress(payload, level)
+
+def decode_chords(blob):
+    """Decode bytes from encode_chords back to a chordsData dict (times at millisecond precision)"""
+    blob = bytes(blob)
+    if blob[:4] != MAGIC:
+        raise ValueError("Not an encoded chord timeline")
+    version, flags = struct.unpack_from('<BB', blob, 4)
+    if version != FORMAT_VERSION:
+        raise ValueError(f"Unsupported chord timeline version {version}")
+    payload = zlib.decompress(blob[6:])
+
+    offset = 0
+    def take(n):
+        nonlocal offset
+        chunk = payload[offset:offset + n]
+        offset += n
+        return chunk
+
+    meta = json.loads(take(struct.unpack('<I', take(4))[0]))
+    label_bytes = take(struct.unpack('<I', take(4))[0])
+    labels = label_bytes.decode().split('\n') if label_bytes else []
+    n = struct.unpack('<I', take(4))[0]
+
+    ids = np.frombuffer(take(n), dtype='<u1')
+    starts = np.frombuffer(take(4 * n), dtype='<u4')
+    durations = np.frombuffer(take(4 * n), dtype='<u4')
+    confidence = np.round(np.frombuffer(take(n), dtype='<u1') / 255, 3).tolist() if flags & FLAG_CONFIDENCE else None
+    beats = np.frombuffer(take(4 * n), dtype='<u4').tolist() if flags & FLAG_BEAT else None
+
+    segments = []
+    for i, (chord_id, start, duration) in enumerate(zip(ids.tolist(), starts.tolist(), durations.tolist())):
+        segment = {
+            'chord': labels[chord_id],
+            'start': start / 1000,
+            'end': (start + duration) / 1000,
+            'duration': duration / 1000
+        }
+        if confidence is not None:
+            segment['confidence'] = confidence[i]
+        if beats is not None:
+            segment['beat'] = beats[i]
+        segments.append(segment)
+
+    return {'chords': segments, **meta}
+
+def expand_chords_data(item):
+    """chordsData of a job item as plain JSON, whichever way it was stored"""
+    if item.get('chordsBin') is not None:
+        blob = item['chordsBin']
+        # boto3 hands binary attributes back as boto3.dynamodb.types.Binary
+        return decode_chords(getattr(blob, 'value', blob))
+    return item.get('chordsData')
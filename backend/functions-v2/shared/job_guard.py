@@ -0,0 +1,153 @@
+"""
+Idempotency guard for chord jobs
+Step Functions retries and duplicate task launches can run one job more than
+once. Before analysing, a run reads the job with a small projection and skips
+the work when a result for the same audio ETag and engine version is already
+stored. Otherwise it takes a lease on the job (a conditional write), so a
+concurrent duplicate stops before burning CPU, and the final result is
+written on condition that the lease is still held. A LeaseKeeper renews the
+lease while a long analysis runs, so it isn't taken over half way.
+"""
+
+import logging
+import threading
+import time
+
+logger = logging.getLogger()
+
+# Claim outcomes
+CLAIMED = 'claimed'
+BUSY = 'busy'
+
+# Attributes written with a result so later runs can recognise it
+RESULT_ETAG = 'chordsAudioEtag'
+RESULT_ENGINE = 'chordsEngine'
+
+def is_condition_failure(error):
+    """True for a DynamoDB ConditionalCheckFailedException (botocore ClientError)"""
+    response = getattr(error, 'response', None) or {}
+    return response.get('Error', {}).get('Code') == 'ConditionalCheckFailedException'
+
+def find_existing_result(table, job_id, etag, engine):
+    """The job's {status, etag, engine} when it already holds a result for this audio and engine, else None"""
+    item = table.get_item(
+        Key={'jobId': job_id},
+        ProjectionExpression='#status, #etag, #engine',
+        ExpressionAttributeNames={'#status': 'status', '#etag': RESULT_ETAG, '#engine': RESULT_ENGINE},
+        ConsistentRead=True
+    ).get('Item')
+    if item and etag and item.get(RESULT_ETAG) == etag and item.get(RESULT_ENGINE) == engine:
+        return item
+    return None
+
+def claim_job(table, job_id, run_id, lease_seconds, status, progress, updated_by):
+    """
+    Set the job to `status` and take its lease for `lease_seconds`
+    Succeeds when nobody holds the lease, it expired, it is ours, or the job
+    FAILED; returns BUSY when another live run holds it.
+    """
+    now = int(time.time())
+    try:
+        table.update_item(
+            Key={'jobId': job_id},
+            UpdateExpression='SET #status = :status, progress = :progress, updatedAt = :updated, '
+                             'chordsClaim = :run, chordsClaimExpires = :expires',
+            ConditionExpression='attribute_not_exists(chordsClaim) OR chordsClaim = :run '
+                                'OR chordsClaimExpires < :now OR #status = :failed',
+            ExpressionAttributeNames={'#status': 'status'},
+            ExpressionAttributeValues={
+                ':status': status,
+                ':progress': progress,
+                ':updated': updated_by,
+                ':run': run_id,
+                ':expires': now + int(lease_seconds),
+                ':now': now,
+                ':failed': 'FAILED'
+            }
+        )
+    except Exception as e:
+        if is_condition_failure(e):
+            logger.info(f"Job {job_id} is already being processed by another run")
+            return BUSY
+        raise
+    return CLAIMED
+
+def release_job(table, job_id, run_id):
+    """Drop this run's lease (it stopped early), so a relaunch can claim the job without waiting it out"""
+    try:
+        table.update_item(
+            Key={'jobId': job_id},
+            UpdateExpression='REMOVE chordsClaim, chordsClaimExpires',
+            ConditionExpression='chordsClaim = :run',
+            ExpressionAttributeValues={':run': run_id}
+        )
+    except Exception as e:
+        if not is_condition_failure(e):
+            raise
+        logger.info(f"Job {job_id} lease was already taken over")
+
+def renew_lease(table, job_id, run_id, lease_seconds):
+    """Push this run's lease out to `lease_seconds` from now; returns False once the run no longer holds it"""
+    try:
+        table.update_item(
+            Key={'jobId': job_id},
+            UpdateExpression='SET chordsClaimExpires = :expires',
+            ConditionExpression='chordsClaim = :run',
+            ExpressionAttributeValues={':run': run_id, ':expires': int(time.time()) + int(lease_seconds)}
+        )
+    except Exception as e:
+        if not is_condition_failure(e):
+            raise
+        logger.warning(f"Job {job_id} lease is no longer held by this run, no longer renewing it")
+        return False
+    return True
+
+class LeaseKeeper:
+    """
+    Renews the leases of the jobs a process holds, from one background
+    thread, at a third of `lease_seconds`: a run that is still working never
+    lets its lease run out, and one that dies stops renewing it
+    """
+
+    def __init__(self, lease_seconds):
+        self.lease_seconds = lease_seconds
+        # job id -> (table, run id)
+        self._held = {}
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def add(self, table, job_id, run_id):
+        with self._lock:
+            self._held[job_id] = (table, run_id)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._renew_forever, name='lease-keeper', daemon=True)
+                self._thread.start()
+
+    def remove(self, job_id):
+        with self._lock:
+            self._held.pop(job_id, None)
+
+    def _renew_forever(self):
+        while True:
+            time.sleep(self.lease_seconds / 3)
+            with self._lock:
+                held = list(self._held.items())
+            for job_id, (table, run_id) in held:
+                try:
+                    if not renew_lease(table, job_id, run_id, self.lease_seconds):
+                        self.remove(job_id)
+                except Exception as e:
+                    # Retried at the next round, well before the lease runs out
+                    logger.error(f"Failed to renew the lease on job {job_id}: {e}")
+
+def result_guard(run_id, etag, engine):
+    """
+    Pieces for the final result write: (SET clause, REMOVE names, condition, values)
+    The write records the ETag/engine, drops the lease, and only lands while this run holds it
+    """
+    return (
+        f'{RESULT_ETAG} = :resultEtag, {RESULT_ENGINE} = :resultEngine',
+        ['chordsClaim', 'chordsClaimExpires'],
+        'chordsClaim = :run',
+        {':resultEtag': etag or '', ':resultEngine': engine, ':run': run_id}
+    )
@@ -0,0 +1,67 @@
+"""
+Large job results offloaded to S3 behind a pointer in the jobs table
+Results over a size threshold are stored as compressed objects keyed by job
+and content hash; the job item keeps a small pointer map plus summary fields,
+so the item stays far from the 400 KB limit and later updates to it are
+billed for a small item. Readers resolve the pointer with load_chords_data
+(Python) or resolveChordsData in chord-codec.js (Node).
+"""
+
+import gzip
+import hashlib
+import json
+import logging
+
+from chord_codec import decode_chords, expand_chords_data
+
+logger = logging.getLogger()
+
+# S3 key prefix for offloaded results
+RESULTS_PREFIX = 'results'
+
+# chordsData fields copied into the item next to the pointer
+SUMMARY_FIELDS = ('key', 'keyConfidence', 'totalChords', 'duration', 'model')
+
+def result_key(job_id, name, body):
+    """Key by job and content hash, so a retried write of the same result is a no-op overwrite"""
+    return f'{RESULTS_PREFIX}/{job_id}/{name}-{hashlib.sha256(body).hexdigest()[:16]}.bin'
+
+def offload_result(s3_client, bucket, job_id, name, body, encoding):
+    """
+    Put `body` (already compressed) in S3; returns the pointer map for the item
+    `encoding` tells readers how to decode it: 'chordsBin' (chord_codec) or 'json.gz'
+    """
+    key = result_key(job_id, name, body)
+    s3_client.put_object(Bucket=bucket, Key=key, Body=body, ContentType='application/octet-stream')
+    logger.info(f"Offloaded {name} for job {job_id}: {len(body)} bytes to s3://{bucket}/{key}")
+    return {
+        'bucket': bucket,
+        'key': key,
+        'bytes': len(body),
+        'sha256': hashlib.sha256(body).hexdigest(),
+        'encoding': encoding
+    }
+
+def encode_json_result(data):
+    """gzip'd compact JSON (Decimals as numbers) for results stored without chord_codec"""
+    return gzip.compress(json.dumps(data, separators=(',', ':'), default=float).encode())
+
+def summarize_chords(chords_data):
+    return {name: chords_data[name] for name in SUMMARY_FIELDS if name in chords_data}
+
+def fetch_result(s3_client, pointer):
+    """Bytes behind a pointer map, checked against its content hash"""
+    body = s3_client.get_object(Bucket=pointer['bucket'], Key=pointer['key'])['Body'].read()
+    if hashlib.sha256(body).hexdigest() != pointer['sha256']:
+        raise ValueError(f"Result s3://{pointer['bucket']}/{pointer['key']} does not match its pointer")
+    return body
+
+def load_chords_data(item, s3_client):
+    """chordsData of a job item as plain JSON, whether inline, chordsBin or offloaded (chordsRef)"""
+    pointer = item.get('chordsRef')
+    if not pointer:
+        return expand_chords_data(item)
+    body = fetch_result(s3_client, pointer)
+    if pointer['encoding'] == 'chordsBin':
+        return decode_chords(body)
+    return json.loads(gzip.decompress(body))
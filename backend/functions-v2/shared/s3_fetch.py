@@ -0,0 +1,149 @@
+"""
+Parallel ranged S3 GET for large audio objects
+The object is split into `part_size` byte ranges fetched on a thread pool;
+each part is read straight into its slice of one preallocated buffer (in
+memory, or a memory-mapped file when a path is given), so there is no
+reassembly copy. Fetched objects can be kept in a small in-process LRU keyed
+by ETag, so later stages (and retries on a warm worker) reuse them without
+another fetch.
+"""
+
+import logging
+import os
+import threading
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+logger = logging.getLogger()
+
+# Range size and number of concurrent GETs
+S3_FETCH_PART_MB = float(os.environ.get('S3_FETCH_PART_MB', '8'))
+S3_FETCH_CONCURRENCY = int(os.environ.get('S3_FETCH_CONCURRENCY', '8'))
+
+# Bytes copied from a part's body per read
+READ_CHUNK_BYTES = 1 << 20
+
+# `buffer` is a writable memoryview over the whole object (np.memmap-backed when `path` is set)
+FetchedObject = namedtuple('FetchedObject', ['buffer', 'size', 'etag', 'path'])
+
+def part_size_bytes():
+    return max(1, int(S3_FETCH_PART_MB * 1024 * 1024))
+
+def plan_ranges(size, part_size):
+    """Inclusive (first, last) byte ranges covering `size` bytes"""
+    return [(start, min(size, start + part_size) - 1) for start in range(0, size, part_size)]
+
+def _read_into(body, view):
+    """Fill `view` from a streaming body; returns the bytes read"""
+    filled = 0
+    try:
+        while filled < len(view):
+            chunk = body.read(min(READ_CHUNK_BYTES, len(view) - filled))
+            if not chunk:
+                break
+            view[filled:filled + len(chunk)] = chunk
+            filled += len(chunk)
+    finally:
+        body.close()
+    return filled
+
+def fetch_object(s3_client, bucket, key, size=None, etag=None, path=None, part_size=None, concurrency=None):
+    """
+    Fetch a whole object with concurrent ranged GETs
+    `size`/`etag` skip the HeadObject call when the caller already has them;
+    the ETag is pinned with IfMatch so parts can't mix two versions.
+    With `path`, parts land in a memory-mapped file there (for decoders that
+    need a seekable file) instead of process memory.
+    """
+    part_size = part_size or part_size_bytes()
+    concurrency = concurrency or S3_FETCH_CONCURRENCY
+    if size is None or etag is None:
+        head = s3_client.head_object(Bucket=bucket, Key=key)
+        size = head['ContentLength']
+        etag = head.get('ETag', '').strip('"')
+
+    if path:
+        mapped = np.memmap(path, dtype=np.uint8, mode='w+', shape=(max(size, 1),))
+        buffer = memoryview(mapped)[:size]
+    else:
+        buffer = memoryview(bytearray(size))
+
+    def fetch_part(byte_range):
+        first, last = byte_range
+        request = {'Bucket': bucket, 'Key': key, 'Range': f'bytes={first}-{last}'}
+        if etag:
+            request['IfMatch'] = f'"{etag}"'
+        body = s3_client.get_object(**request)['Body']
+        n = _read_into(body, buffer[first:last + 1])
+        if n != last + 1 - first:
+            raise IOError(f"Short read on s3://{bucket}/{key} bytes {first}-{last}: {n} bytes")
+
+    ranges = plan_ranges(size, part_size)
+    if len(ranges) <= 1 or concurrency <= 1:
+        for byte_range in ranges:
+            fetch_part(byte_range)
+    else:
+        with ThreadPoolExecutor(max_workers=min(concurrency, len(ranges))) as pool:
+            # list() surfaces the first part failure
+            list(pool.map(fetch_part, ranges))
+
+    if path:
+        mapped.flush()
+    logger.info(f"Fetched s3://{bucket}/{key}: {size} bytes in {len(ranges)} parts")
+    return FetchedObject(buffer, size, etag, path)
+
+class BufferReader:
+    """Readable binary stream over a fetched object's buffer (io.BytesIO would copy it)"""
+
+    def __init__(self, buffer):
+        self.buffer = buffer
+        self.position = 0
+
+    def read(self, n=-1):
+        end = len(self.buffer) if n is None or n < 0 else min(len(self.buffer), self.position + n)
+        data = bytes(self.buffer[self.position:end])
+        self.position = end
+        return data
+
+    def tell(self):
+        return self.position
+
+    def close(self):
+        pass
+
+class HotObjectCache:
+    """In-process LRU of fetched objects keyed by (bucket, key, etag), bounded by total bytes"""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, bucket, key, etag):
+        with self._lock:
+            fetched = self._entries.get((bucket, key, etag))
+            if fetched is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end((bucket, key, etag))
+            self.hits += 1
+            return fetched
+
+    def put(self, bucket, key, fetched):
+        """Keep an in-memory object (file-backed ones live on disk already)"""
+        if fetched.path or fetched.size > self.max_bytes:
+            return
+        with self._lock:
+            entry = (bucket, key, fetched.etag)
+            if entry in self._entries:
+                return
+            self._entries[entry] = fetched
+            self.total_bytes += fetched.size
+            while self.total_bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.total_bytes -= evicted.size
@@ -0,0 +1,76 @@
+"""
+S3 objects as decoder input without a /tmp copy
+The GetObject body is handed to the decoder as a stream, so decoding starts
+on the first bytes. MP4-family containers (m4a/mp4/mov) usually keep their
+index at the end and can't be decoded from a pipe; those are spooled to a
+local file instead, exactly like the old download path.
+"""
+
+import logging
+import shutil
+from collections import namedtuple
+
+logger = logging.getLogger()
+
+# ISO base media (m4a/mp4/mov) files carry 'ftyp' at byte offset 4
+SEEKABLE_ONLY_MARKER = b'ftyp'
+
+# An S3 object opened for streaming: `stream` is a PeekableStream over the body
+S3AudioObject = namedtuple('S3AudioObject', ['stream', 'size', 'etag', 'key'])
+
+class PeekableStream:
+    """File-like wrapper over a non-seekable body that can look at its first bytes"""
+
+    def __init__(self, raw):
+        self.raw = raw
+        self._peeked = b''
+        self._position = 0
+
+    def peek(self, n):
+        """Return up to `n` leading bytes without consuming them"""
+        while len(self._peeked) < n:
+            chunk = self.raw.read(n - len(self._peeked))
+            if not chunk:
+                break
+            self._peeked += chunk
+        return self._peeked[:n]
+
+    def read(self, n=-1):
+        if self._peeked:
+            if n is None or n < 0:
+                data = self._peeked + self.raw.read()
+                self._peeked = b''
+            else:
+                data = self._peeked[:n]
+                self._peeked = self._peeked[n:]
+        else:
+            data = self.raw.read() if n is None or n < 0 else self.raw.read(n)
+        self._position += len(data)
+        return data
+
+    def tell(self):
+        """Bytes consumed so far"""
+        return self._position
+
+    def close(self):
+        self.raw.close()
+
+def open_audio_object(s3_client, bucket, key):
+    """GetObject and wrap its body for streaming decode"""
+    obj = s3_client.get_object(Bucket=bucket, Key=key)
+    return S3AudioObject(
+        PeekableStream(obj['Body']),
+        obj.get('ContentLength'),
+        obj.get('ETag', '').strip('"'),
+        key
+    )
+
+def needs_seekable_input(audio_object):
+    """True for containers that can't be decoded from a pipe"""
+    return audio_object.stream.peek(12)[4:8] == SEEKABLE_ONLY_MARKER
+
+def spool_to_file(audio_object, path, chunk_size=1 << 20):
+    """Copy the rest of the body to `path` (fallback for seekable-only containers)"""
+    with open(path, 'wb') as f:
+        shutil.copyfileobj(audio_object.stream, f, chunk_size)
+    return path
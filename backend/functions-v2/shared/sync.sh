@@ -0,0 +1,33 @@
+#!/bin/bash
+
+# Copy the modules kept once in backend/functions-v2/shared into the Lambda
+# functions and container images that use them; the deploy scripts run this
+# before zipping or building, and it is needed once before running a
+# function locally (the benchmarks find them here on their own)
+
+SHARED_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
+FUNCTIONS_DIR="$(dirname "$SHARED_DIR")"
+
+# module:function (one line per copy)
+SHARED_MODULES=(
+    "chord-codec.js:get-job-status"
+    "chord-codec.js:pdf-generator"
+    "audio_decoder.py:chord-detector-ecs"
+    "audio_decoder.py:chord-detector-madmom"
+    "chord_codec.py:chord-detector-ecs"
+    "chord_codec.py:chord-detector-madmom"
+    "job_guard.py:chord-detector-ecs"
+    "job_guard.py:chord-detector-madmom"
+    "result_store.py:chord-detector-ecs"
+    "result_store.py:chord-detector-madmom"
+    "s3_fetch.py:chord-detector-ecs"
+    "s3_fetch.py:chord-detector-madmom"
+    "s3_stream.py:chord-detector-ecs"
+    "s3_stream.py:chord-detector-madmom"
+)
+
+for ENTRY in "${SHARED_MODULES[@]}"; do
+    MODULE="${ENTRY%%:*}"
+    FUNC="${ENTRY#*:}"
+    cp "$SHARED_DIR/$MODULE" "$FUNCTIONS_DIR/$FUNC/$MODULE"
+done
@@ -4,13 +4,28 @@ AWS Lambda handler for chord detection using Spotify's Basic Pitch
 import json
 import os
 import tempfile
-import boto3
-from basic_pitch.inference import predict
-from basic_pitch import ICASSP_2022_MODEL_PATH
-import pretty_midi
-from chord_utils import extract_chords_from_midi, format_chord_progression
 
-s3_client = boto3.client('s3')
+# Loaded on first use, so a bad request is rejected without importing
+# TensorFlow (Basic Pitch) or building a boto3 client
+s3_client = None
+basic_pitch = None
+
+def get_s3_client():
+    """Shared S3 client"""
+    global s3_client
+    if s3_client is None:
+        import boto3
+        s3_client = boto3.client('s3')
+    return s3_client
+
+def get_basic_pitch():
+    """(predict, model path) from Basic Pitch; the first call imports TensorFlow"""
+    global basic_pitch
+    if basic_pitch is None:
+        from basic_pitch.inference import predict
+        from basic_pitch import ICASSP_2022_MODEL_PATH
+        basic_pitch = (predict, ICASSP_2022_MODEL_PATH)
+    return basic_pitch
 
 def lambda_handler(event, context):
     """
@@ -43,12 +58,13 @@ def lambda_handler(event, context):
         print(f"Downloading audio from s3://{bucket}/{key}")
         with tempfile.NamedTemporaryFile(suffix='.mp3', delete=False) as audio_file:
             audio_path = audio_file.name
-            s3_client.download_file(bucket, key, audio_path)
+            get_s3_client().download_file(bucket, key, audio_path)
         
         print(f"Audio downloaded to {audio_path}")
         
         # Run Basic Pitch inference
         print("Running Basic Pitch inference...")
+        predict, ICASSP_2022_MODEL_PATH = get_basic_pitch()
         model_output, midi_data, note_events = predict(
             audio_path,
             ICASSP_2022_MODEL_PATH
@@ -58,6 +74,7 @@ def lambda_handler(event, context):
         
         # Extract chords from MIDI
         print("Extracting chords from MIDI data...")
+        from chord_utils import extract_chords_from_midi, format_chord_progression
         chords_data = extract_chords_from_midi(midi_data, segment_duration=2.0)
         
         print(f"Detected key: {chords_data['key']} {chords_data['mode']}")
@@ -71,7 +88,7 @@ def lambda_handler(event, context):
         with tempfile.NamedTemporaryFile(suffix='.mid', delete=False) as midi_file:
             midi_path = midi_file.name
             midi_data.write(midi_path)
-            s3_client.upload_file(midi_path, bucket, midi_key)
+            get_s3_client().upload_file(midi_path, bucket, midi_key)
             print(f"MIDI saved to s3://{bucket}/{midi_key}")
             os.unlink(midi_path)
         
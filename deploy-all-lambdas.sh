@@ -3,6 +3,9 @@
 echo "🚀 Deploying all Lambda functions..."
 echo ""
 
+# Copy shared modules (backend/functions-v2/shared) into the functions that use them
+bash backend/functions-v2/shared/sync.sh
+
 # Array of Lambda functions to deploy
 FUNCTIONS=("create-job" "get-job-status" "lyrics-transcriber" "chord-detector-trigger" "pdf-generator")
 
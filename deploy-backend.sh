@@ -160,6 +160,9 @@ echo ""
 echo "📦 Deploying Lambda function code..."
 echo ""
 
+# Copy shared modules (backend/functions-v2/shared) into the functions that use them
+bash backend/functions-v2/shared/sync.sh
+
 LAMBDA_FUNCTIONS=(
     "create-job"
     "get-job-status"
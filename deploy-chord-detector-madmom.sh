@@ -18,6 +18,8 @@ AWS_PROFILE="chordscout"
 ECR_IMAGE="${AWS_ACCOUNT_ID}.dkr.ecr.${AWS_REGION}.amazonaws.com/${ECR_REPOSITORY}:${IMAGE_TAG}"
 
 echo "📦 Building Docker image..."
+# Copy shared modules (backend/functions-v2/shared) into the image context
+bash backend/functions-v2/shared/sync.sh
 cd backend/functions-v2/chord-detector-ecs
 docker build -t ${ECR_REPOSITORY}:${IMAGE_TAG} .
 
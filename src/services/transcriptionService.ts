@@ -60,6 +60,29 @@ export async function startTranscription(
   }
 }
 
+// Full chord results stored in S3 are only sent for ?full=1; keep each one
+// by its hash so polling doesn't fetch it again
+const fullChordsCache = new Map<string, { sha256: string; chords: any }>();
+
+async function getFullChords(jobId: string, sha256: string): Promise<any> {
+  const cached = fullChordsCache.get(jobId);
+  if (cached?.sha256 === sha256) {
+    return cached.chords;
+  }
+  const response = await fetch(`${API_BASE_URL}/jobs/${jobId}?full=1`, {
+    method: 'GET',
+    headers: {
+      'Content-Type': 'application/json',
+    },
+  });
+  if (!response.ok) {
+    throw new Error('Failed to get chord result');
+  }
+  const chords = (await response.json()).chordsData;
+  fullChordsCache.set(jobId, { sha256, chords });
+  return chords;
+}
+
 /**
  * Get the status of a transcription job via Music Transcription App V2 API
  */
@@ -89,19 +112,26 @@ export async function getJobStatus(jobId: string): Promise<TranscriptionJob | nu
 
     const data = await response.json();
     
+    // An offloaded result comes as a summary plus its hash; fetch the chords once it is final
+    const status = mapBackendStatus(data.status);
+    let chords = data.chordsData ?? data.chordsSummary;
+    if (data.chordsRef && status === 'COMPLETE') {
+      chords = await getFullChords(jobId, data.chordsRef.sha256);
+    }
+    
     // Map backend response to frontend format
     return {
       id: data.jobId,
       youtubeUrl: data.youtubeUrl,
       title: data.videoTitle || 'Processing...',
-      status: mapBackendStatus(data.status),
+      status,
       currentStep: getStepDescription(data.status),
       progress: data.progress || 0,
       createdAt: data.createdAt,
       updatedAt: data.updatedAt,
       completedAt: data.completedAt,
       lyrics: data.lyricsData?.text,
-      chords: data.chordsData,
+      chords,
       pdfUrl: data.pdfUrl,
       sheetMusicUrl: data.pdfUrl, // Use PDF URL as sheet music
       error: data.errorMessage,